@@ -0,0 +1,89 @@
+import hashlib
+import json
+import logging
+
+from flasgger import Swagger
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Top-level extension of a prebuilt spec identifying the docstrings it was built from
+DIGEST_KEY = 'x-docstrings-sha1'
+
+
+def docstrings_digest(app):
+    """
+    Hashes the rules and docstrings of every documented view, without parsing
+    the YAML, to tell whether a prebuilt spec still matches the routes.
+
+    Args:
+        app: Flask application
+
+    Returns:
+        str hex digest
+    """
+    digest = hashlib.sha1()
+    for rule in sorted(app.url_map.iter_rules(), key=lambda rule: (rule.rule, rule.endpoint)):
+        doc = getattr(app.view_functions.get(rule.endpoint), '__doc__', None) or ''
+        if '---' not in doc or rule.endpoint.startswith('flasgger.'):
+            continue
+        digest.update(f"{rule.rule}\0{rule.endpoint}\0{sorted(rule.methods)}\0{doc}\0".encode())
+    return digest.hexdigest()
+
+
+def build_apispec(app):
+    """
+    Parses the YAML docstrings of every route into the OpenAPI spec that flasgger
+    serves at /apispec_1.json. Must be called within an application context.
+
+    Args:
+        app: Flask application with all routes registered
+
+    Returns:
+        dict spec, including the docstrings digest
+    """
+    builder = Swagger()
+    builder.app = app
+    spec = json.loads(json.dumps(builder.get_apispecs()))
+    spec[DIGEST_KEY] = docstrings_digest(app)
+    return spec
+
+
+def init_swagger(app):
+    """
+    Registers the Swagger UI at /apidocs and its spec at /apispec_1.json.
+
+    By default flasgger parses the route docstrings on the first spec request
+    of every worker. With SWAGGER_SPEC_FILE the spec written by `flask build-apispec`
+    is served instead and no docstring is parsed. A spec file that is missing or was
+    built from other docstrings is ignored with a warning.
+
+    Args:
+        app: Flask application with all routes registered
+
+    Returns:
+        flasgger.Swagger
+    """
+    spec = _load_prebuilt(app, Config.SWAGGER_SPEC_FILE) if Config.SWAGGER_SPEC_FILE else None
+    if spec is None:
+        return Swagger(app)
+
+    config = Swagger.DEFAULT_CONFIG.copy()
+    config['specs'] = [
+        # The paths come from the template, no rule is documented from its docstring
+        dict(config['specs'][0], rule_filter=lambda rule: False, model_filter=lambda tag: False)
+    ]
+    return Swagger(app, config=config, template=spec)
+
+
+def _load_prebuilt(app, path):
+    try:
+        with open(path) as f:
+            spec = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning("Prebuilt API spec %s could not be read (%s), parsing docstrings instead", path, e)
+        return None
+    if spec.pop(DIGEST_KEY, None) != docstrings_digest(app):
+        logger.warning("Prebuilt API spec %s is outdated, run `flask build-apispec`; parsing docstrings instead", path)
+        return None
+    return spec
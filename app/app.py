@@ -1,12 +1,46 @@
 from flask import Flask
 from routes.api import api_bp
-from flasgger import Swagger
+from routes.admin import admin_bp
+from apispec import init_swagger
+from commands import register_commands
+from instrumentation import init_request_timing
+from instrumentation.metrics import init_metrics, metrics_response
+from config import Config
 
 # Main Flask application
 app = Flask(__name__)
 
+# Time request phases (Server-Timing, JSON access log, ?profile=1, Prometheus metrics) when enabled
+init_request_timing(app)
+init_metrics(app)
+
 # Register API routes blueprint
 app.register_blueprint(api_bp)
 
-# Initialize automatic Swagger documentation at /apidocs
-swagger = Swagger(app)
+# Register operational endpoints (not proxied by nginx)
+app.register_blueprint(admin_bp)
+
+# Prometheus metrics of all workers (not proxied by nginx)
+if Config.METRICS:
+    @app.route('/metrics', methods=['GET'])
+    def get_metrics():
+        """
+        Get Prometheus metrics
+        ---
+        tags:
+          - Admin
+        summary: Get request, database pool and cache metrics in the Prometheus text format
+        description: Per-endpoint request counts, latency and response size histograms, SQL latency, error counts, pool utilization and cache lookups, aggregated over all gunicorn workers
+        produces:
+          - text/plain
+        responses:
+          200:
+            description: Prometheus exposition format
+        """
+        return metrics_response(app.response_class)
+
+# Initialize Swagger documentation at /apidocs, from the prebuilt spec if configured
+swagger = init_swagger(app)
+
+# Register maintenance CLI commands
+register_commands(app)
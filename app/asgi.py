@@ -0,0 +1,186 @@
+from contextlib import AsyncExitStack, asynccontextmanager
+
+from psycopg_pool import AsyncConnectionPool
+from starlette.applications import Starlette
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Route
+from werkzeug.datastructures import MIMEAccept, MultiDict
+from werkzeug.http import parse_accept_header
+from config import Config
+from formats import MEDIA_TYPES, STREAMING_FORMATS, FormatError, dump_json, encode_body, negotiate_format
+from formats.rows import describe
+from routes.api import DYNAMIC_QUERY_ROUTES, QUERY_ROUTES, country_clubs_query, row_encoder
+from routes.query import build_query, normalize_query_args, pagination_headers
+
+# Asynchronous counterpart of app.py serving the /api routes.
+# Run with: uvicorn asgi:app --workers 4 --port 8000
+#
+# Every worker runs a single event loop; a request waiting for PostgreSQL only
+# holds a pooled connection, not the worker, so one worker serves up to
+# ASYNC_DB_POOL_MAX_SIZE queries concurrently. Queries are built by the same
+# QuerySpec definitions and build_query() as the Flask routes; responses are
+# not cached by the process (use the nginx cache in front of it).
+
+pool = AsyncConnectionPool(
+    kwargs={
+        'dbname': Config.DB_NAME,
+        'user': Config.DB_READ_ONLY_USER,
+        'password': Config.DB_READ_ONLY_USER_PASSWORD,
+        'host': Config.DB_HOST,
+        'port': Config.DB_PORT,
+        'autocommit': True,
+        'options': f'-c statement_timeout={Config.STATEMENT_TIMEOUT_MS}' if Config.STATEMENT_TIMEOUT_MS else None,
+    },
+    min_size=Config.DB_POOL_MIN_SIZE,
+    max_size=Config.ASYNC_DB_POOL_MAX_SIZE,
+    timeout=Config.DB_POOL_TIMEOUT,
+    max_lifetime=Config.DB_POOL_MAX_LIFETIME,
+    check=AsyncConnectionPool.check_connection,
+    open=False
+)
+
+
+def error_response(message, status):
+    return Response(dump_json({"error": message}), status_code=status, media_type=MEDIA_TYPES['json'])
+
+
+async def stream_query_results(sql, params, fmt):
+    """
+    Executes a query through a server-side cursor and streams the rows in batches
+    of STREAM_BATCH_SIZE, see routes.api.stream_query_results().
+
+    The query is executed before the response starts, so that database errors
+    are still reported with a 500 status. The pooled connection is returned once
+    the response is sent or the client disconnects.
+
+    Returns:
+        StreamingResponse
+    """
+    stack = AsyncExitStack()
+    try:
+        conn = await stack.enter_async_context(pool.connection())
+        # Server-side cursors only exist inside a transaction
+        await stack.enter_async_context(conn.transaction())
+        cur = await stack.enter_async_context(conn.cursor(name='api_stream'))
+        await cur.execute(sql, params)
+    except Exception as e:
+        await stack.__aexit__(type(e), e, e.__traceback__)
+        raise
+
+    async def generate():
+        async with stack:
+            separator = b'\n' if fmt == 'ndjson' else b','
+            encoder = row_encoder(describe(cur.description))
+            first = True
+            if fmt == 'json':
+                yield b'['
+            while True:
+                rows = await cur.fetchmany(Config.STREAM_BATCH_SIZE)
+                if not rows:
+                    break
+                chunk = separator.join(encoder.to_json_lines(rows))
+                if fmt == 'ndjson':
+                    yield chunk + b'\n'
+                else:
+                    yield chunk if first else b',' + chunk
+                first = False
+            if fmt == 'json':
+                # Same bytes as buffered and WSGI-streamed bodies
+                yield b']\n'
+
+    return StreamingResponse(generate(), media_type=MEDIA_TYPES[fmt])
+
+
+async def handle_get_request(request, query):
+    """
+    Executes the query of an API route, see routes.api.handle_get_request().
+    Supports the same filtering, sorting, null exclusion, pagination (including
+    keyset cursors), response formats and streaming.
+
+    Args:
+        request: Starlette request
+        query:   QuerySpec describing the route's base query
+
+    Returns:
+        Response with data (camelCase keys) in the negotiated format or JSON error message
+    """
+    args = MultiDict(request.query_params.multi_items())
+    sql, params, error, status = build_query(query, args)
+    if error:
+        return error_response(error, status)
+
+    try:
+        fmt = negotiate_format(args, parse_accept_header(request.headers.get('accept'), MIMEAccept))
+    except FormatError as e:
+        return error_response(str(e), e.status)
+
+    streaming = fmt == 'ndjson' or args.get('stream', 'false').lower() == 'true'
+    if streaming and fmt not in STREAMING_FORMATS:
+        return error_response(f"Streaming supports formats: {list(STREAMING_FORMATS)}", 400)
+
+    try:
+        if streaming:
+            return await stream_query_results(sql, params, fmt)
+
+        async with pool.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(sql, params)
+                data = await cur.fetchall()
+                encoder = row_encoder(describe(cur.description))
+        headers = pagination_headers(
+            data, encoder.names, normalize_query_args(query, args), query.key_fields, request.url.path, args
+        )
+        body = encode_body(encoder.to_dicts(data), encoder.columns, fmt)
+        return Response(body, media_type=MEDIA_TYPES[fmt], headers=headers)
+    except FormatError as e:
+        return error_response(str(e), e.status)
+    except Exception as e:
+        return error_response(str(e), 500)
+
+
+def query_endpoint(query):
+    """Creates the endpoint of a route with a fixed QuerySpec."""
+    async def endpoint(request):
+        return await handle_get_request(request, query)
+    return endpoint
+
+
+def dynamic_query_endpoint(build):
+    """Creates the endpoint of a route whose QuerySpec is built from the request arguments."""
+    async def endpoint(request):
+        query, error = build(MultiDict(request.query_params.multi_items()))
+        if error:
+            return error_response(error, 400)
+        return await handle_get_request(request, query)
+    return endpoint
+
+
+async def country_clubs_endpoint(request):
+    """Endpoint of /api/country/{national_team_id}/clubs, see routes.api.get_country_clubs()."""
+    args = MultiDict(request.query_params.multi_items())
+    query, error = country_clubs_query(request.path_params['national_team_id'], args)
+    if error:
+        return error_response(error, 400)
+    return await handle_get_request(request, query)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    await pool.open()
+    try:
+        yield
+    finally:
+        await pool.close()
+
+
+routes = [
+    Route(f'/api{rule}', query_endpoint(query), methods=['GET'])
+    for rule, query in QUERY_ROUTES.items()
+]
+routes += [
+    Route(f'/api{rule}', dynamic_query_endpoint(build), methods=['GET'])
+    for rule, build in DYNAMIC_QUERY_ROUTES.items()
+]
+routes.append(Route('/api/country/{national_team_id:int}/clubs', country_clubs_endpoint, methods=['GET']))
+
+app = Starlette(routes=routes, lifespan=lifespan)
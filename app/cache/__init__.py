@@ -0,0 +1,219 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from cache.shared import SharedMemoryCache
+from config import Config
+
+
+class LRUCache:
+    """
+    In-process cache bounded by number of entries.
+    Least recently used entries are evicted first, expired entries are dropped on access.
+
+    Args:
+        max_entries: Maximum number of stored entries
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()   # key -> (value, expires_at)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisCache:
+    """
+    Cache shared between processes and hosts, stored in Redis.
+    Requires the optional `redis` package.
+
+    Args:
+        url:    Redis connection URL, e.g. redis://localhost:6379/0
+        prefix: Namespace prepended to every key
+    """
+
+    def __init__(self, url, prefix='football-api:'):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("CACHE_BACKEND=redis requires the 'redis' package") from e
+        self._client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        return self._client.get(self.prefix + key)
+
+    def set(self, key, value, ttl=None):
+        self._client.set(self.prefix + key, value, ex=int(ttl) if ttl else None)
+
+    def clear(self):
+        for key in self._client.scan_iter(match=self.prefix + '*'):
+            self._client.delete(key)
+
+
+class NullCache:
+    """Cache backend that stores nothing, used when caching is disabled."""
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl=None):
+        pass
+
+    def clear(self):
+        pass
+
+
+# Registry of available backends, selected with Config.CACHE_BACKEND
+BACKENDS = {
+    'lru': lambda: LRUCache(max_entries=Config.CACHE_MAX_ENTRIES),
+    'redis': lambda: RedisCache(url=Config.CACHE_REDIS_URL),
+    'shm': lambda: SharedMemoryCache(
+        path=Config.CACHE_SHM_PATH,
+        max_entries=Config.CACHE_MAX_ENTRIES,
+        size=Config.CACHE_SHM_SIZE_MB * 1024 * 1024
+    ),
+    'none': NullCache,
+}
+
+
+class ResponseCache:
+    """
+    Cache of serialized API responses.
+
+    Keys combine the dataset version token, the endpoint name and the normalized
+    query arguments, so bumping the version in the `data_version` table makes every
+    previously cached entry unreachable at once. Backends that live in this process
+    are cleared as soon as a new version is observed, the shared memory backend
+    starts a new generation when the first worker observes it.
+
+    Args:
+        backend: Object implementing get(key), set(key, value, ttl) and clear()
+        ttl:     Default time to live of entries in seconds
+    """
+
+    def __init__(self, backend, ttl):
+        self.backend = backend
+        self.ttl = ttl
+        self._version = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """
+        Returns:
+            tuple: (body, headers) of the cached response, None on a miss
+        """
+        value = self.backend.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return self._unpack(value)
+
+    def set(self, key, body, headers=None, ttl=None):
+        """
+        Stores a response body together with response headers that depend
+        on its content (e.g. the pagination cursor).
+        """
+        self.backend.set(key, self._pack(body, headers or {}), ttl if ttl is not None else self.ttl)
+
+    def make_key(self, version, endpoint, params):
+        """
+        Builds a cache key for a request.
+
+        Args:
+            version:  Data version token
+            endpoint: Flask endpoint name, e.g. 'api.get_club_info'
+            params:   Normalized query arguments (JSON serializable)
+
+        Returns:
+            str
+        """
+        self._observe_version(version)
+        digest = hashlib.sha1(
+            json.dumps(params, sort_keys=True, separators=(',', ':')).encode()
+        ).hexdigest()
+        return f"{version}:{endpoint}:{digest}"
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'backend': type(self.backend).__name__,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / total, 4) if total else 0.0,
+            'entries': len(self.backend) if hasattr(self.backend, '__len__') else None,
+        }
+
+    @staticmethod
+    def _pack(body, headers):
+        # Backends store plain bytes: a JSON header line followed by the body
+        return json.dumps(headers, separators=(',', ':')).encode() + b'\n' + body
+
+    @staticmethod
+    def _unpack(value):
+        header_line, _, body = value.partition(b'\n')
+        return body, json.loads(header_line)
+
+    def _observe_version(self, version):
+        if version == self._version:
+            return
+        with self._lock:
+            if version != self._version:
+                if isinstance(self.backend, SharedMemoryCache):
+                    self.backend.use_version(version)
+                elif self._version is not None and isinstance(self.backend, LRUCache):
+                    self.backend.clear()
+                self._version = version
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """
+    Returns the process-wide response cache configured by CACHE_BACKEND.
+
+    Returns:
+        ResponseCache
+    """
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                backend_factory = BACKENDS.get(Config.CACHE_BACKEND)
+                if backend_factory is None:
+                    raise ValueError(f"Unknown CACHE_BACKEND: {Config.CACHE_BACKEND}")
+                _cache = ResponseCache(backend=backend_factory(), ttl=Config.CACHE_TTL)
+    return _cache
@@ -0,0 +1,215 @@
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:     # not available on Windows, CACHE_BACKEND=shm is then unavailable
+    fcntl = None
+
+# File layout: header, index of fixed-size slots, data area used as a ring buffer
+MAGIC = b'FBCACHE1'
+# magic, slots, data_size, generation, version_hash, head
+HEADER = struct.Struct('<8sQQQQQ')
+INDEX_OFFSET = 64
+# seq, generation, key digest, offset, length, crc32, expires_at, accessed_at
+SLOT = struct.Struct('<QQ16sQIIdd')
+SEQ = struct.Struct('<Q')
+ACCESSED = struct.Struct('<d')
+ACCESSED_OFFSET = 56
+# Slots a key can occupy; a full bucket evicts its least recently used entry
+WAYS = 8
+
+
+class SharedMemoryCache:
+    """
+    Cache shared by the processes of a host (gunicorn workers), stored in an
+    mmap()-ed file, preferably on tmpfs (/dev/shm).
+
+    - Lookups take no lock: slots are written like a seqlock (odd sequence number
+      while being written) and a reader discards an entry whose sequence number
+      changed while its body was copied, or whose checksum does not match
+    - Writers serialize with flock() on the file and a thread lock
+    - The index is set-associative: a key is stored in one of WAYS slots of its
+      bucket, a full bucket evicts its least recently read entry
+    - Bodies are appended to a ring buffer, entries whose bodies are overwritten
+      when it wraps around are invalidated first
+    - Every slot carries the generation it was written in; bumping the generation
+      in the header (use_version(), clear()) invalidates all entries at once
+
+    A file created by another configuration is reused with its own layout.
+
+    Args:
+        path:        Cache file
+        max_entries: Number of index slots, rounded up to a multiple of WAYS
+        size:        Bytes of the data area; bodies over a quarter of it are not cached
+    """
+
+    def __init__(self, path, max_entries, size):
+        if fcntl is None:
+            raise RuntimeError("CACHE_BACKEND=shm requires fcntl (Unix)")
+        self.path = path
+        self.slots = -(-max_entries // WAYS) * WAYS
+        self.data_size = size
+        self._lock = threading.Lock()
+        self._pid = None
+        self._fd = None
+        self._map = None
+
+    def get(self, key):
+        mm = self._mapping()
+        digest = _digest(key)
+        generation = HEADER.unpack_from(mm, 0)[3]
+        now = time.time()
+        for slot in self._bucket(digest):
+            position = INDEX_OFFSET + slot * SLOT.size
+            seq, slot_generation, slot_digest, offset, length, crc, expires_at, _ = SLOT.unpack_from(mm, position)
+            if seq & 1 or slot_generation != generation or slot_digest != digest:
+                continue
+            if expires_at and expires_at <= now:
+                return None
+            start = self._data_offset + offset
+            value = mm[start:start + length]
+            if SEQ.unpack_from(mm, position)[0] != seq or zlib.crc32(value) != crc:
+                return None
+            # Unsynchronized on purpose, a lost update only affects eviction order
+            ACCESSED.pack_into(mm, position + ACCESSED_OFFSET, now)
+            return value
+        return None
+
+    def set(self, key, value, ttl=None):
+        digest = _digest(key)
+        with self._write_lock() as mm:
+            if len(value) > self.data_size // 4:
+                return
+            _, _, _, generation, _, head = HEADER.unpack_from(mm, 0)
+            if head + len(value) > self.data_size:
+                head = 0
+            self._evict_range(mm, head, head + len(value))
+            start = self._data_offset + head
+            mm[start:start + len(value)] = value
+
+            now = time.time()
+            slot = self._choose_slot(mm, digest, generation, now)
+            self._write_slot(
+                mm, slot, generation, digest, head, len(value),
+                zlib.crc32(value), now + ttl if ttl else 0.0, now
+            )
+            self._write_header(mm, head=head + len(value))
+
+    def use_version(self, version):
+        """
+        Starts a new generation when the data version differs from the one the
+        cache was last used with. Workers switch once when they first see a new
+        version, so entries stored for it by other workers are kept.
+        """
+        version_hash = int.from_bytes(_digest(str(version))[:8], 'little')
+        if HEADER.unpack_from(self._mapping(), 0)[4] == version_hash:
+            return
+        with self._write_lock() as mm:
+            _, _, _, generation, current_hash, _ = HEADER.unpack_from(mm, 0)
+            if current_hash != version_hash:
+                self._write_header(mm, generation=generation + 1, version_hash=version_hash)
+
+    def clear(self):
+        with self._write_lock() as mm:
+            generation = HEADER.unpack_from(mm, 0)[3]
+            self._write_header(mm, generation=generation + 1, head=0)
+
+    def __len__(self):
+        mm = self._mapping()
+        generation = HEADER.unpack_from(mm, 0)[3]
+        index = mm[INDEX_OFFSET:INDEX_OFFSET + self.slots * SLOT.size]
+        return sum(1 for fields in SLOT.iter_unpack(index) if fields[1] == generation)
+
+    @property
+    def _data_offset(self):
+        return INDEX_OFFSET + self.slots * SLOT.size
+
+    def _bucket(self, digest):
+        first = int.from_bytes(digest[:8], 'little') % (self.slots // WAYS) * WAYS
+        return range(first, first + WAYS)
+
+    def _choose_slot(self, mm, digest, generation, now):
+        # The slot of the same key, else a free or stale one, else the least recently read
+        candidates = []
+        for slot in self._bucket(digest):
+            _, slot_generation, slot_digest, _, _, _, expires_at, accessed_at = SLOT.unpack_from(
+                mm, INDEX_OFFSET + slot * SLOT.size
+            )
+            if slot_generation == generation and slot_digest == digest:
+                return slot
+            stale = slot_generation != generation or (expires_at and expires_at <= now)
+            candidates.append((not stale, accessed_at, slot))
+        return min(candidates)[2]
+
+    def _evict_range(self, mm, start, end):
+        index = mm[INDEX_OFFSET:INDEX_OFFSET + self.slots * SLOT.size]
+        for slot, (_, slot_generation, _, offset, length, _, _, _) in enumerate(SLOT.iter_unpack(index)):
+            if slot_generation and offset < end and start < offset + length:
+                self._write_slot(mm, slot, 0, bytes(16), 0, 0, 0, 0.0, 0.0)
+
+    @staticmethod
+    def _write_slot(mm, slot, generation, digest, offset, length, crc, expires_at, accessed_at):
+        position = INDEX_OFFSET + slot * SLOT.size
+        seq = SEQ.unpack_from(mm, position)[0]
+        # Odd while the slot is inconsistent, readers skip it
+        SEQ.pack_into(mm, position, seq + 1)
+        SLOT.pack_into(mm, position, seq + 1, generation, digest, offset, length, crc, expires_at, accessed_at)
+        SEQ.pack_into(mm, position, seq + 2)
+
+    def _write_header(self, mm, **fields):
+        values = dict(zip(
+            ('magic', 'slots', 'data_size', 'generation', 'version_hash', 'head'),
+            HEADER.unpack_from(mm, 0)
+        ))
+        values.update(fields)
+        HEADER.pack_into(mm, 0, *values.values())
+
+    @contextmanager
+    def _write_lock(self):
+        # The thread lock excludes writers of this process, flock() those of other processes
+        mm = self._mapping()
+        with self._lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                yield mm
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _mapping(self):
+        """Returns the mapping of the cache file, opened once per process."""
+        if self._pid == os.getpid():
+            return self._map
+        with self._lock:
+            if self._pid != os.getpid():
+                # A descriptor inherited through fork shares its flock() with the parent
+                self._open()
+                self._pid = os.getpid()
+            return self._map
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            header = os.pread(fd, HEADER.size, 0)
+            if len(header) == HEADER.size and HEADER.unpack(header)[0] == MAGIC:
+                _, self.slots, self.data_size, _, _, _ = HEADER.unpack(header)
+            else:
+                os.ftruncate(fd, 0)
+                os.ftruncate(fd, INDEX_OFFSET + self.slots * SLOT.size + self.data_size)
+                os.pwrite(fd, HEADER.pack(MAGIC, self.slots, self.data_size, 1, 0, 0), 0)
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        self._fd = fd
+        self._map = mmap.mmap(fd, INDEX_OFFSET + self.slots * SLOT.size + self.data_size)
+
+
+def _digest(key):
+    return hashlib.blake2b(key.encode(), digest_size=16).digest()
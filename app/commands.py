@@ -0,0 +1,219 @@
+import gzip
+import json
+import os
+import shutil
+import sys
+import time
+
+import click
+from werkzeug.datastructures import MultiDict
+from apispec import build_apispec
+from config import Config
+from db import UNKNOWN_VERSION, get_conn, get_data_version, release_conn
+from db.embedded import ANALYSIS_DIR, build_parquet
+from routes.api import QUERY_ROUTES
+from routes.query import build_query
+from warmup import CacheWarmer
+
+# Filter values used when planning filtered route queries.
+# Only the plan shape matters, the values do not have to exist.
+SAMPLE_FILTERS = {
+    'national_team_id': 3262,
+    'team_id': 3,
+    'year': 2020,
+}
+
+# Plan nodes that read a table through an index
+INDEX_NODES = ('Index Scan', 'Index Only Scan', 'Bitmap Index Scan')
+
+try:
+    import brotli
+except ImportError:     # optional, export-static then writes no .br files
+    brotli = None
+
+
+def _plan_nodes(plan):
+    """Yields every node of an EXPLAIN (FORMAT JSON) plan tree."""
+    yield plan
+    for child in plan.get('Plans', []):
+        yield from _plan_nodes(child)
+
+
+def explain_filters():
+    """
+    Plans every route query filtered by each of its key columns and checks that
+    the filter is answered with an index rather than a full scan.
+    Sequential scans are disabled for the session, so an index that is missing
+    or unusable (e.g. a filter applied above an aggregate) still shows up as a
+    sequential scan.
+
+    Returns:
+        list of (rule, field, used_indexes) tuples, used_indexes is empty on failure
+    """
+    results = []
+    conn = get_conn()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SET enable_seqscan = off")
+            try:
+                for rule, query in QUERY_ROUTES.items():
+                    for field, value in SAMPLE_FILTERS.items():
+                        if field not in query.fields:
+                            continue
+                        sql, params, error, _ = build_query(query, MultiDict({field: value}))
+                        if error:
+                            raise click.ClickException(f"{rule}?{field}={value}: {error}")
+                        cur.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+                        plan = cur.fetchone()['QUERY PLAN']
+                        if isinstance(plan, str):
+                            plan = json.loads(plan)
+                        used_indexes = sorted({
+                            node.get('Index Name', node['Node Type'])
+                            for node in _plan_nodes(plan[0]['Plan'])
+                            if node['Node Type'] in INDEX_NODES
+                        })
+                        results.append((rule, field, used_indexes))
+            finally:
+                cur.execute("RESET enable_seqscan")
+    finally:
+        release_conn(conn)
+    return results
+
+
+def export_static(app, output, keep):
+    """
+    Renders every parameterless GET route of the `api` blueprint with its default
+    parameters and writes the JSON body next to its gzip and brotli encodings
+    (`<output>/versions/<version>/api/<route>.json[.gz|.br]`).
+    The `<output>/current` symlink is then switched to the new version atomically,
+    so nginx never serves a partially written export.
+
+    Args:
+        app:    Flask application
+        output: Export directory
+        keep:   Number of exported versions to keep, including the new one
+
+    Returns:
+        tuple: (version_directory, exported_rules, skipped), skipped holds
+               (rule, status) of routes that did not answer with 200
+    """
+    version = get_data_version()
+    name = time.strftime('%Y%m%d-%H%M%S')
+    if version != UNKNOWN_VERSION:
+        name = f"{version.token}-{name}"
+    versions = os.path.join(output, 'versions')
+    target = os.path.join(versions, name)
+    staging = target + '.tmp'
+    shutil.rmtree(staging, ignore_errors=True)
+
+    client = app.test_client()
+    exported, skipped = [], []
+    for rule in sorted(app.url_map.iter_rules(), key=lambda rule: rule.rule):
+        if rule.endpoint.split('.')[0] != 'api' or rule.arguments or 'GET' not in rule.methods:
+            continue
+        response = client.get(rule.rule, headers={'Accept': 'application/json'})
+        if response.status_code != 200:
+            skipped.append((rule.rule, response.status_code))
+            continue
+        body = response.get_data()
+        path = os.path.join(staging, rule.rule.lstrip('/') + '.json')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _write_file(path, body)
+        _write_file(path + '.gz', gzip.compress(body, compresslevel=9, mtime=0))
+        if brotli is not None:
+            _write_file(path + '.br', brotli.compress(body, quality=11))
+        exported.append(rule.rule)
+
+    if get_data_version() != version:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise click.ClickException("The data version changed during the export, run it again")
+
+    os.rename(staging, target)
+    link = os.path.join(output, 'current')
+    staging_link = link + '.tmp'
+    if os.path.lexists(staging_link):
+        os.remove(staging_link)
+    os.symlink(os.path.join('versions', name), staging_link)
+    os.replace(staging_link, link)
+
+    # Older versions may still be read by requests that resolved the previous link
+    previous = sorted(
+        (entry for entry in os.listdir(versions) if entry != name and not entry.endswith('.tmp')),
+        key=lambda entry: os.path.getmtime(os.path.join(versions, entry)),
+        reverse=True
+    )
+    for entry in previous[max(keep - 1, 0):]:
+        shutil.rmtree(os.path.join(versions, entry), ignore_errors=True)
+    return target, exported, skipped
+
+
+def _write_file(path, data):
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def register_commands(app):
+    """
+    Registers maintenance commands with the Flask CLI (`flask --app app <command>`).
+
+    Args:
+        app: Flask application
+    """
+
+    @app.cli.command('explain-filters')
+    def explain_filters_command():
+        """Check that filtered route queries use indexes."""
+        failed = 0
+        for rule, field, used_indexes in explain_filters():
+            if used_indexes:
+                click.echo(f"ok    {rule}?{field}=  {', '.join(used_indexes)}")
+            else:
+                failed += 1
+                click.echo(f"FAIL  {rule}?{field}=  no index scan")
+        if failed:
+            click.echo(f"{failed} filtered queries do not use an index", err=True)
+            sys.exit(1)
+
+    @app.cli.command('export-static')
+    @click.option('--output', default=Config.STATIC_EXPORT_DIR, show_default=True, help='Export directory')
+    @click.option('--keep', default=Config.STATIC_EXPORT_KEEP, show_default=True,
+                  help='Exported versions to keep')
+    def export_static_command(output, keep):
+        """Pre-render the API routes as static files for nginx."""
+        if brotli is None:
+            click.echo("brotli is not installed, .br files are not written", err=True)
+        target, exported, skipped = export_static(app, output, keep)
+        for rule, status in skipped:
+            click.echo(f"skip  {rule}  ({status})")
+        click.echo(f"{len(exported)} routes exported to {target}")
+
+    @app.cli.command('build-parquet')
+    @click.option('--analysis', default=ANALYSIS_DIR, show_default=True, help='Directory of the analysis JSON files')
+    @click.option('--output', default=Config.EMBEDDED_DATA_DIR, show_default=True, help='Parquet dataset directory')
+    def build_parquet_command(analysis, output):
+        """Build the Parquet dataset served with DB_BACKEND=duckdb."""
+        os.makedirs(output, exist_ok=True)
+        version = build_parquet(analysis, output)
+        click.echo(f"Dataset {version.token} written to {os.path.join(output, version.token)}")
+
+    @app.cli.command('build-apispec')
+    @click.option('--output', default=Config.SWAGGER_SPEC_FILE or 'apispec.json', show_default=True,
+                  help='Spec file, served when SWAGGER_SPEC_FILE points to it')
+    def build_apispec_command(output):
+        """Compile the route docstrings into a static OpenAPI spec."""
+        spec = build_apispec(app)
+        with open(output + '.tmp', 'w') as f:
+            json.dump(spec, f, sort_keys=True)
+        os.replace(output + '.tmp', output)
+        click.echo(f"{len(spec['paths'])} paths written to {output}")
+
+    @app.cli.command('warm-cache')
+    @click.option('--concurrency', default=Config.WARMUP_CONCURRENCY, show_default=True,
+                  help='Requests running at once')
+    @click.option('--access-log', default=Config.WARMUP_ACCESS_LOG, help='JSON access log to take frequent requests from')
+    @click.option('--top', default=Config.WARMUP_TOP_REQUESTS, show_default=True, help='Frequent requests to warm')
+    def warm_cache_command(concurrency, access_log, top):
+        """Precompute the default and most frequent API responses into the cache."""
+        stats = CacheWarmer(app, concurrency, access_log, top).run()
+        click.echo(f"{stats['warmed']} of {stats['urls']} responses warmed in {stats['seconds']} s, "
+                   f"{stats['failed']} failed")
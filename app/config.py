@@ -1,4 +1,5 @@
-from os import getenv
+from os import getenv, path
+from tempfile import gettempdir
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -8,16 +9,124 @@ class Config:
     """
     Configuration class for database credentials.
     Values are read from environment variables.
-    
-    Required .env variables:
+
+    Required .env variables (not used with DB_BACKEND=duckdb):
     - DB_NAME: Database name
     - DB_READ_ONLY_USER: Read-only username
     - DB_READ_ONLY_USER_PASSWORD: Read-only user password
     - DB_HOST: Database host address
     - DB_PORT: Database port
+
+    Optional .env variables:
+    - DB_POOL_MIN_SIZE: Connections opened per worker at startup (default 1)
+    - DB_POOL_MAX_SIZE: Maximum connections per worker (default 10)
+    - DB_POOL_TIMEOUT: Seconds to wait for a free connection (default 30)
+    - DB_POOL_CHECK_INTERVAL: Idle seconds after which a connection is pinged on checkout (default 30)
+    - DB_POOL_MAX_LIFETIME: Seconds after which a connection is recycled (default 3600)
+    - ASYNC_DB_POOL_MAX_SIZE: Maximum connections per worker of the ASGI server (default 50)
+    - CACHE_BACKEND: Response cache backend, one of lru, redis, shm (shared by the workers of the host), none (default lru)
+    - CACHE_MAX_ENTRIES: Maximum number of responses kept by the lru and shm backends (default 1024)
+    - CACHE_TTL: Seconds a cached response stays valid (default 3600)
+    - CACHE_REDIS_URL: Redis URL used by the redis backend (default redis://localhost:6379/0)
+    - CACHE_SHM_PATH: File mapped by the shm backend (default /dev/shm/football-api-cache, <tmp> without /dev/shm)
+    - CACHE_SHM_SIZE_MB: Size of the response bodies area of the shm backend (default 256)
+    - DATA_VERSION_CHECK_INTERVAL: Seconds between reads of the data_version table (default 5)
+    - HTTP_CACHE_MAX_AGE: max-age sent in Cache-Control of API responses (default 60)
+    - STREAM_BATCH_SIZE: Rows fetched per round trip when streaming responses (default 2000)
+    - SINGLEFLIGHT: Coalescing of identical concurrent queries: off, process (per worker)
+      or host (also across the workers of the host, default host)
+    - SINGLEFLIGHT_DIR: Lock and result files of host-wide coalescing, a directory private to the server user
+      (mode 0700, default <tmp>/football-api-singleflight)
+    - SINGLEFLIGHT_WAIT_TIMEOUT: Seconds to wait for another worker's identical query (default 30)
+    - REQUEST_TIMING: Add a Server-Timing header with per-phase durations to responses (default false)
+    - ACCESS_LOG: Write one JSON line per request with phase durations and row counts to stderr (default false)
+    - PROFILING: Allow ?profile=1 to profile a request with cProfile (default false)
+    - METRICS: Record Prometheus metrics and serve them at /metrics (default true); set
+      PROMETHEUS_MULTIPROC_DIR to aggregate them over gunicorn workers (see gunicorn.conf.py)
+    - QUERY_BACKEND: Source of buffered API responses, sql or snapshot (in-memory NumPy copy, default sql)
+    - SNAPSHOT_MAX_FRAMES: Base query results the snapshot backend keeps in memory, least recently
+      used ones are dropped (default 64)
+    - STATIC_EXPORT_DIR: Output directory of `flask export-static` (default /var/www/api-static)
+    - STATIC_EXPORT_KEEP: Exported versions kept by `flask export-static` (default 3)
+    - DB_BACKEND: Storage backend of the API queries, postgres or duckdb (embedded DuckDB over the
+      Parquet files written by `flask build-parquet`, no database server required; default postgres)
+    - EMBEDDED_DATA_DIR: Parquet dataset directory of the duckdb backend (default <repository>/parquet)
+    - SWAGGER_SPEC_FILE: OpenAPI spec written by `flask build-apispec`, served at /apispec_1.json
+      instead of parsing the route docstrings in every worker (default unset)
+    - ADMISSION: Limit the requests of each route running database work at once, over all workers
+      of the host; requests beyond the limit wait in a bounded queue (default true)
+    - ADMISSION_MAX_CONCURRENCY: Requests of a route running at once on the host (default 4)
+    - ADMISSION_QUEUE_SIZE: Requests of a route waiting for a slot; further ones get 503 with Retry-After (default 16)
+    - ADMISSION_QUEUE_TIMEOUT: Seconds a request waits for a slot before 503 (default 5)
+    - ADMISSION_DIR: Slot lock files of admission control, a directory private to the server user
+      (mode 0700, default <tmp>/football-api-admission)
+    - STATEMENT_TIMEOUT_MS: statement_timeout of API database connections, 0 for none (default 30000)
+    - ROUTE_LIMITS: Per-route overrides, comma-separated <endpoint>:<max_concurrency>:<statement_timeout_ms>,
+      empty fields keep the default, e.g. api.get_aggregate:2:10000 (default unset)
+    - SLOW_QUERY_MS: Record API statements running at least this long, 0 to disable (default 500)
+    - SLOW_QUERY_LOG: JSON lines file of the slow-query log, shared by the workers (default <tmp>/football-api-slow-queries.log)
+    - SLOW_QUERY_LOG_MAX_MB: Size at which the slow-query log is rotated (default 10)
+    - SLOW_QUERY_LOG_BACKUPS: Rotated slow-query logs kept (default 3)
+    - SLOW_QUERY_EXPLAIN_SAMPLE: Fraction of slow statements run again with EXPLAIN (ANALYZE, BUFFERS)
+      to log their plan, between 0 and 1 (default 0)
+    - SLOW_QUERY_EXPLAIN_TIMEOUT_MS: statement_timeout of these EXPLAIN runs (default 10000)
+    - WARMUP: Precompute cached responses on worker boot and after a data version change (default true)
+    - WARMUP_CONCURRENCY: Warm-up requests running at once per worker (default 2)
+    - WARMUP_ACCESS_LOG: File collecting the ACCESS_LOG output; its most frequent requests are also warmed (default unset)
+    - WARMUP_TOP_REQUESTS: Number of frequent requests from WARMUP_ACCESS_LOG to warm (default 50)
     """
     DB_NAME = getenv('DB_NAME')
     DB_READ_ONLY_USER = getenv('DB_READ_ONLY_USER')
     DB_READ_ONLY_USER_PASSWORD = getenv('DB_READ_ONLY_USER_PASSWORD')
     DB_HOST = getenv('DB_HOST')
     DB_PORT = getenv('DB_PORT')
+
+    DB_POOL_MIN_SIZE = int(getenv('DB_POOL_MIN_SIZE', '1'))
+    DB_POOL_MAX_SIZE = int(getenv('DB_POOL_MAX_SIZE', '10'))
+    DB_POOL_TIMEOUT = float(getenv('DB_POOL_TIMEOUT', '30'))
+    DB_POOL_CHECK_INTERVAL = float(getenv('DB_POOL_CHECK_INTERVAL', '30'))
+    DB_POOL_MAX_LIFETIME = float(getenv('DB_POOL_MAX_LIFETIME', '3600'))
+    ASYNC_DB_POOL_MAX_SIZE = int(getenv('ASYNC_DB_POOL_MAX_SIZE', '50'))
+
+    CACHE_BACKEND = getenv('CACHE_BACKEND', 'lru')
+    CACHE_MAX_ENTRIES = int(getenv('CACHE_MAX_ENTRIES', '1024'))
+    CACHE_TTL = float(getenv('CACHE_TTL', '3600'))
+    CACHE_REDIS_URL = getenv('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+    CACHE_SHM_PATH = getenv('CACHE_SHM_PATH', path.join(
+        '/dev/shm' if path.isdir('/dev/shm') else gettempdir(), 'football-api-cache'
+    ))
+    CACHE_SHM_SIZE_MB = int(getenv('CACHE_SHM_SIZE_MB', '256'))
+    DATA_VERSION_CHECK_INTERVAL = float(getenv('DATA_VERSION_CHECK_INTERVAL', '5'))
+    HTTP_CACHE_MAX_AGE = int(getenv('HTTP_CACHE_MAX_AGE', '60'))
+    STREAM_BATCH_SIZE = int(getenv('STREAM_BATCH_SIZE', '2000'))
+    SINGLEFLIGHT = getenv('SINGLEFLIGHT', 'host')
+    SINGLEFLIGHT_DIR = getenv('SINGLEFLIGHT_DIR', path.join(gettempdir(), 'football-api-singleflight'))
+    SINGLEFLIGHT_WAIT_TIMEOUT = float(getenv('SINGLEFLIGHT_WAIT_TIMEOUT', '30'))
+    REQUEST_TIMING = getenv('REQUEST_TIMING', 'false').lower() == 'true'
+    ACCESS_LOG = getenv('ACCESS_LOG', 'false').lower() == 'true'
+    PROFILING = getenv('PROFILING', 'false').lower() == 'true'
+    METRICS = getenv('METRICS', 'true').lower() == 'true'
+    QUERY_BACKEND = getenv('QUERY_BACKEND', 'sql')
+    SNAPSHOT_MAX_FRAMES = int(getenv('SNAPSHOT_MAX_FRAMES', '64'))
+    STATIC_EXPORT_DIR = getenv('STATIC_EXPORT_DIR', '/var/www/api-static')
+    STATIC_EXPORT_KEEP = int(getenv('STATIC_EXPORT_KEEP', '3'))
+    DB_BACKEND = getenv('DB_BACKEND', 'postgres')
+    EMBEDDED_DATA_DIR = getenv('EMBEDDED_DATA_DIR', path.join(path.dirname(path.abspath(__file__)), '..', 'parquet'))
+    SWAGGER_SPEC_FILE = getenv('SWAGGER_SPEC_FILE')
+    ADMISSION = getenv('ADMISSION', 'true').lower() == 'true'
+    ADMISSION_MAX_CONCURRENCY = int(getenv('ADMISSION_MAX_CONCURRENCY', '4'))
+    ADMISSION_QUEUE_SIZE = int(getenv('ADMISSION_QUEUE_SIZE', '16'))
+    ADMISSION_QUEUE_TIMEOUT = float(getenv('ADMISSION_QUEUE_TIMEOUT', '5'))
+    ADMISSION_DIR = getenv('ADMISSION_DIR', path.join(gettempdir(), 'football-api-admission'))
+    STATEMENT_TIMEOUT_MS = int(getenv('STATEMENT_TIMEOUT_MS', '30000'))
+    ROUTE_LIMITS = getenv('ROUTE_LIMITS', '')
+    SLOW_QUERY_MS = float(getenv('SLOW_QUERY_MS', '500'))
+    SLOW_QUERY_LOG = getenv('SLOW_QUERY_LOG', path.join(gettempdir(), 'football-api-slow-queries.log'))
+    SLOW_QUERY_LOG_MAX_MB = int(getenv('SLOW_QUERY_LOG_MAX_MB', '10'))
+    SLOW_QUERY_LOG_BACKUPS = int(getenv('SLOW_QUERY_LOG_BACKUPS', '3'))
+    SLOW_QUERY_EXPLAIN_SAMPLE = float(getenv('SLOW_QUERY_EXPLAIN_SAMPLE', '0'))
+    SLOW_QUERY_EXPLAIN_TIMEOUT_MS = int(getenv('SLOW_QUERY_EXPLAIN_TIMEOUT_MS', '10000'))
+    WARMUP = getenv('WARMUP', 'true').lower() == 'true'
+    WARMUP_CONCURRENCY = int(getenv('WARMUP_CONCURRENCY', '2'))
+    WARMUP_ACCESS_LOG = getenv('WARMUP_ACCESS_LOG')
+    WARMUP_TOP_REQUESTS = int(getenv('WARMUP_TOP_REQUESTS', '50'))
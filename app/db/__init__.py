@@ -1,22 +1,300 @@
+import os
+import threading
+import time
+
 import psycopg2
+import psycopg2.extensions
 import psycopg2.extras
 from config import Config
+from db.version import DataVersion, UNKNOWN_VERSION, get_data_version
 
 
-def get_conn():
+class PoolTimeout(Exception):
+    """Raised when no pooled connection becomes available within DB_POOL_TIMEOUT."""
+
+
+def _connect():
     """
-    Creates a PostgreSQL database connection with read-only privileges.
+    Opens a new PostgreSQL connection with read-only privileges.
     Uses RealDictCursor to return query results as key-value pairs instead of tuples.
-    Caller is responsible for closing the connection.
+    Connections run in autocommit mode so that idle pooled connections
+    never hold an open transaction. Statements are cancelled after
+    STATEMENT_TIMEOUT_MS, so a slow query cannot hold a worker indefinitely.
 
     Returns:
         psycopg2.extensions.connection
     """
-    return psycopg2.connect(
+    conn = psycopg2.connect(
         database=Config.DB_NAME,
         user=Config.DB_READ_ONLY_USER,
         password=Config.DB_READ_ONLY_USER_PASSWORD,
         host=Config.DB_HOST,
         port=Config.DB_PORT,
-        cursor_factory=psycopg2.extras.RealDictCursor
+        cursor_factory=psycopg2.extras.RealDictCursor,
+        options=f'-c statement_timeout={Config.STATEMENT_TIMEOUT_MS}' if Config.STATEMENT_TIMEOUT_MS else None
     )
+    conn.autocommit = True
+    return conn
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of long-lived PostgreSQL connections.
+
+    - Keeps between min_size and max_size connections open
+    - Blocks up to `timeout` seconds when every connection is checked out
+    - Pings connections that were idle longer than `check_interval` on checkout
+    - Replaces broken connections and connections older than `max_lifetime`
+    - Records checkout wait times and in-use counts for sizing
+
+    Args:
+        min_size:       Connections opened eagerly when the pool is created
+        max_size:       Upper bound on simultaneously open connections
+        timeout:        Seconds to wait for a free connection before PoolTimeout
+        check_interval: Idle seconds after which a connection is pinged on checkout
+        max_lifetime:   Seconds after which a connection is closed and reopened
+    """
+
+    def __init__(self, min_size, max_size, timeout, check_interval, max_lifetime):
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.check_interval = check_interval
+        self.max_lifetime = max_lifetime
+        self.pid = os.getpid()
+
+        self._cond = threading.Condition()
+        self._idle = []          # [(conn, created_at, returned_at)], most recently used last
+        self._created = {}       # id(conn) -> created_at for checked out connections
+        self._size = 0
+        self._in_use = 0
+
+        self._checkouts = 0
+        self._timeouts = 0
+        self._discarded = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+        for _ in range(min_size):
+            conn = _connect()
+            now = time.monotonic()
+            self._idle.append((conn, now, now))
+            self._size += 1
+
+    def getconn(self):
+        """
+        Checks a healthy connection out of the pool.
+
+        Returns:
+            psycopg2.extensions.connection
+
+        Raises:
+            PoolTimeout: No connection became available within `timeout` seconds
+        """
+        started = time.monotonic()
+        deadline = started + self.timeout
+        with self._cond:
+            while not self._idle and self._size >= self.max_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout(
+                        f"No database connection available within {self.timeout}s "
+                        f"({self._in_use}/{self.max_size} in use)"
+                    )
+                self._cond.wait(remaining)
+
+            if self._idle:
+                conn, created_at, returned_at = self._idle.pop()
+            else:
+                # Reserve a slot, the connection itself is opened outside the lock
+                conn, created_at, returned_at = None, None, None
+                self._size += 1
+            self._in_use += 1
+
+            waited = time.monotonic() - started
+            self._checkouts += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+
+        try:
+            if conn is not None and not self._is_healthy(conn, created_at, returned_at):
+                self._close(conn)
+                conn = None
+            if conn is None:
+                conn = _connect()
+                created_at = time.monotonic()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+        with self._cond:
+            self._created[id(conn)] = created_at
+        return conn
+
+    def putconn(self, conn, discard=False):
+        """
+        Returns a connection to the pool.
+        Closed connections, connections left inside a transaction and
+        connections past `max_lifetime` are discarded instead of reused.
+
+        Args:
+            conn:    Connection previously obtained from getconn()
+            discard: Close the connection instead of returning it to the pool
+        """
+        with self._cond:
+            created_at = self._created.pop(id(conn), None)
+        if created_at is None:
+            return
+
+        if not discard and not conn.closed:
+            status = conn.info.transaction_status
+            if status == psycopg2.extensions.TRANSACTION_STATUS_INERROR:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    discard = True
+            elif status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                discard = True
+
+        now = time.monotonic()
+        if discard or conn.closed or now - created_at > self.max_lifetime:
+            self._close(conn)
+            with self._cond:
+                self._size -= 1
+                self._in_use -= 1
+                self._discarded += 1
+                self._cond.notify()
+            return
+
+        with self._cond:
+            self._idle.append((conn, created_at, now))
+            self._in_use -= 1
+            self._cond.notify()
+
+    def stats(self):
+        """
+        Returns a snapshot of pool utilization and checkout wait times.
+
+        Returns:
+            dict with sizes, in-use count, checkout counters and wait times in milliseconds
+        """
+        with self._cond:
+            return {
+                'pid': self.pid,
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'size': self._size,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'checkouts': self._checkouts,
+                'timeouts': self._timeouts,
+                'discarded': self._discarded,
+                'wait_ms_total': round(self._wait_total * 1000, 3),
+                'wait_ms_avg': round(self._wait_total * 1000 / self._checkouts, 3) if self._checkouts else 0.0,
+                'wait_ms_max': round(self._wait_max * 1000, 3),
+            }
+
+    def _is_healthy(self, conn, created_at, returned_at):
+        now = time.monotonic()
+        if conn.closed or now - created_at > self.max_lifetime:
+            return False
+        if now - returned_at < self.check_interval:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            return True
+        except psycopg2.Error:
+            return False
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+
+_pool = None
+_pool_lock = threading.Lock()
+# Pools created before a fork (e.g. gunicorn --preload) share sockets with the
+# parent process. They are kept referenced but never used or closed in the child,
+# otherwise closing them would terminate the parent's server sessions.
+_inherited_pools = []
+
+
+def get_pool():
+    """
+    Returns the connection pool of the current process, creating it on first use.
+    A pool inherited from a parent process after fork is abandoned and replaced,
+    so every gunicorn worker owns its own connections.
+
+    Returns:
+        ConnectionPool
+    """
+    global _pool
+    pool = _pool
+    if pool is not None and pool.pid == os.getpid():
+        return pool
+    with _pool_lock:
+        if _pool is not None and _pool.pid != os.getpid():
+            _inherited_pools.append(_pool)
+            _pool = None
+        if _pool is None:
+            _pool = ConnectionPool(
+                min_size=Config.DB_POOL_MIN_SIZE,
+                max_size=Config.DB_POOL_MAX_SIZE,
+                timeout=Config.DB_POOL_TIMEOUT,
+                check_interval=Config.DB_POOL_CHECK_INTERVAL,
+                max_lifetime=Config.DB_POOL_MAX_LIFETIME
+            )
+        return _pool
+
+
+def get_conn():
+    """
+    Checks out a pooled PostgreSQL connection with read-only privileges.
+    Uses RealDictCursor to return query results as key-value pairs instead of tuples;
+    pass cursor_factory=psycopg2.extensions.cursor to cursor() for plain tuples.
+    Caller is responsible for returning the connection with release_conn().
+
+    Returns:
+        psycopg2.extensions.connection
+    """
+    return get_pool().getconn()
+
+
+def release_conn(conn, discard=False):
+    """
+    Returns a connection obtained from get_conn() to the pool.
+
+    Args:
+        conn:    Pooled connection
+        discard: Close the connection instead of reusing it
+    """
+    get_pool().putconn(conn, discard=discard)
+
+
+def pool_stats(create=True):
+    """
+    Returns utilization statistics of the current process' connection pool.
+
+    With DB_BACKEND=duckdb no connections are opened and the statistics of
+    an empty pool are returned.
+
+    Args:
+        create: Create the pool (and connect) if this process has none yet,
+                otherwise the statistics of an empty pool are returned
+
+    Returns:
+        dict, see ConnectionPool.stats()
+    """
+    pool = _pool
+    if Config.DB_BACKEND == 'duckdb' or (not create and (pool is None or pool.pid != os.getpid())):
+        return ConnectionPool(0, 0, 0, 0, 0).stats()
+    return get_pool().stats()
+
@@ -0,0 +1,320 @@
+import math
+import os
+import threading
+import time
+from collections import namedtuple
+
+try:
+    import fcntl
+except ImportError:     # not available on Windows, requests are then admitted without limits
+    fcntl = None
+
+from config import Config
+from db.lockdir import private_directory
+
+RouteLimits = namedtuple('RouteLimits', ['max_concurrency', 'statement_timeout_ms'])
+
+
+class Overloaded(Exception):
+    """
+    Raised when a request is shed because the wait queue of its route is full
+    or no execution slot became free within the queue timeout.
+
+    Args:
+        message:     Error message
+        retry_after: Seconds after which a retry is likely to be admitted
+    """
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def parse_route_limits(value):
+    """
+    Parses ROUTE_LIMITS, comma-separated `<endpoint>:<max_concurrency>:<statement_timeout_ms>`
+    entries, e.g. `api.get_aggregate:2:10000,api.get_club_info::5000`.
+    An empty field keeps the default of ADMISSION_MAX_CONCURRENCY or STATEMENT_TIMEOUT_MS.
+
+    Args:
+        value: ROUTE_LIMITS string, may be empty
+
+    Returns:
+        dict: endpoint -> RouteLimits, None for fields left empty
+
+    Raises:
+        ValueError: Malformed entry
+    """
+    limits = {}
+    for entry in filter(None, (entry.strip() for entry in (value or '').split(','))):
+        fields = entry.split(':')
+        if len(fields) != 3 or not fields[0]:
+            raise ValueError(f"ROUTE_LIMITS entry {entry!r} is not <endpoint>:<max_concurrency>:<statement_timeout_ms>")
+        endpoint, concurrency, timeout = fields
+        limits[endpoint] = RouteLimits(
+            max_concurrency=int(concurrency) if concurrency else None,
+            statement_timeout_ms=int(timeout) if timeout else None
+        )
+    return limits
+
+
+class _RouteStats:
+    """Counters of one route in this process."""
+
+    def __init__(self):
+        self.admitted = 0
+        self.queued = 0
+        self.queue_full = 0
+        self.queue_timeout = 0
+        self.in_flight = 0
+        self.wait_total = 0.0
+        self.service_avg = None
+
+
+class Ticket:
+    """
+    Execution slot of an admitted request. Released when the request's
+    database work is done, as a context manager or with release().
+    """
+
+    def __init__(self, control, route, fd):
+        self._control = control
+        self._route = route
+        self._fd = fd
+        self._started = time.monotonic()
+        self._released = False
+
+    def release(self):
+        if self._released:
+            return
+        self._released = True
+        if self._fd is not None:
+            # Closing the slot file releases its lock
+            os.close(self._fd)
+        self._control._finished(self._route, time.monotonic() - self._started)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+class AdmissionControl:
+    """
+    Limits how many requests of each API route run database work at once.
+
+    Every route has `max_concurrency` execution slots and `queue_size` wait slots.
+    Slots are lock files in `lock_dir` held with flock(), so the limits apply to
+    all gunicorn workers and threads of the host together, and the slots of a
+    worker that crashed are freed by the kernel.
+
+    A request takes a free execution slot, or else a wait slot from which it
+    polls for an execution slot for up to `queue_timeout` seconds. When every
+    wait slot is taken or the timeout expires, Overloaded is raised and the
+    request is answered with 503 instead of piling up on the database.
+
+    Args:
+        lock_dir:        Directory of the slot files, private to the current user (see
+                         db.lockdir.private_directory()), None to admit every request
+        max_concurrency: Execution slots of a route without an entry in `route_limits`
+        queue_size:      Wait slots per route
+        queue_timeout:   Seconds a request waits for an execution slot
+        route_limits:    endpoint -> RouteLimits, see parse_route_limits()
+    """
+
+    # Bounds of the interval between attempts of a waiting request, doubled after every attempt
+    POLL_INTERVAL = (0.002, 0.05)
+    # Upper bound of the Retry-After estimate
+    MAX_RETRY_AFTER = 60
+
+    def __init__(self, lock_dir, max_concurrency, queue_size, queue_timeout, route_limits=None):
+        self.lock_dir = lock_dir if fcntl is not None else None
+        self.max_concurrency = max_concurrency
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.route_limits = route_limits or {}
+        self.pid = os.getpid()
+        self._lock = threading.Lock()
+        self._routes = {}
+
+        # Another user holding the slot files would have every request shed
+        if self.lock_dir and not private_directory(self.lock_dir, 'ADMISSION_DIR', 'admitting every request'):
+            self.lock_dir = None
+
+    def concurrency(self, route):
+        limits = self.route_limits.get(route)
+        if limits is None or limits.max_concurrency is None:
+            return self.max_concurrency
+        return limits.max_concurrency
+
+    def admit(self, route):
+        """
+        Takes an execution slot of a route, waiting in its queue if all are taken.
+
+        Args:
+            route: Flask endpoint of the request
+
+        Returns:
+            Ticket, to be released once the database work is done
+
+        Raises:
+            Overloaded: The queue is full or no slot became free within `queue_timeout`
+        """
+        stats = self._stats(route)
+        if self.lock_dir is None:
+            with self._lock:
+                stats.admitted += 1
+                stats.in_flight += 1
+            return Ticket(self, route, None)
+
+        started = time.monotonic()
+        limit = self.concurrency(route)
+        fd = self._try_slots(route, 'run', limit)
+        queued = fd is None
+        if queued:
+            wait_fd = self._try_slots(route, 'wait', self.queue_size)
+            if wait_fd is None:
+                self._reject(route, 'queue_full')
+                raise Overloaded(f"Too many concurrent requests to {route}", self._retry_after(route, limit))
+            try:
+                deadline = started + self.queue_timeout
+                interval = self.POLL_INTERVAL[0]
+                while fd is None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._reject(route, 'queue_timeout')
+                        raise Overloaded(
+                            f"No capacity for {route} within {self.queue_timeout}s", self._retry_after(route, limit)
+                        )
+                    time.sleep(min(interval, remaining))
+                    interval = min(interval * 2, self.POLL_INTERVAL[1])
+                    fd = self._try_slots(route, 'run', limit)
+            finally:
+                os.close(wait_fd)
+
+        waited = time.monotonic() - started
+        with self._lock:
+            stats.admitted += 1
+            stats.queued += queued
+            stats.in_flight += 1
+            stats.wait_total += waited
+        return Ticket(self, route, fd)
+
+    def stats(self):
+        """
+        Returns the admission counters of this process.
+
+        Returns:
+            dict with totals and per-route counters, service times in milliseconds
+        """
+        with self._lock:
+            routes = {
+                route: {
+                    'max_concurrency': self.concurrency(route),
+                    'in_flight': stats.in_flight,
+                    'admitted': stats.admitted,
+                    'queued': stats.queued,
+                    'rejected_queue_full': stats.queue_full,
+                    'rejected_queue_timeout': stats.queue_timeout,
+                    'wait_ms_total': round(stats.wait_total * 1000, 3),
+                    'service_ms_avg': round(stats.service_avg * 1000, 3) if stats.service_avg is not None else None,
+                }
+                for route, stats in self._routes.items()
+            }
+        return {
+            'pid': os.getpid(),
+            'host_wide': self.lock_dir is not None,
+            'queue_size': self.queue_size,
+            'queue_timeout': self.queue_timeout,
+            'rejected_queue_full': sum(route['rejected_queue_full'] for route in routes.values()),
+            'rejected_queue_timeout': sum(route['rejected_queue_timeout'] for route in routes.values()),
+            'routes': routes,
+        }
+
+    def _stats(self, route):
+        stats = self._routes.get(route)
+        if stats is None:
+            with self._lock:
+                stats = self._routes.setdefault(route, _RouteStats())
+        return stats
+
+    def _try_slots(self, route, kind, count):
+        """
+        Returns a descriptor of the first free slot file, locked, None if all are taken.
+        Every acquisition opens its own file description, since flock() does not
+        exclude holders of the same one; the caller closes it to release the slot.
+        """
+        for slot in range(count):
+            fd = os.open(os.path.join(self.lock_dir, f"{route}.{kind}.{slot}"), os.O_CREAT | os.O_RDWR, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return fd
+            except BlockingIOError:
+                os.close(fd)
+            except BaseException:
+                os.close(fd)
+                raise
+        return None
+
+    def _reject(self, route, reason):
+        stats = self._stats(route)
+        with self._lock:
+            setattr(stats, reason, getattr(stats, reason) + 1)
+
+    def _retry_after(self, route, limit):
+        # Time for the slots to work off a full queue at the average service time of the route
+        service = self._stats(route).service_avg or 0.0
+        estimate = service * (self.queue_size + limit) / max(limit, 1)
+        return min(max(math.ceil(estimate), 1), self.MAX_RETRY_AFTER)
+
+    def _finished(self, route, seconds):
+        stats = self._stats(route)
+        with self._lock:
+            stats.in_flight -= 1
+            # Exponentially weighted, recent executions count most
+            stats.service_avg = seconds if stats.service_avg is None else 0.8 * stats.service_avg + 0.2 * seconds
+
+
+_admission = None
+_admission_lock = threading.Lock()
+_route_limits = parse_route_limits(Config.ROUTE_LIMITS)
+
+
+def statement_timeout(route):
+    """
+    Returns the statement timeout configured for a route in ROUTE_LIMITS.
+
+    Args:
+        route: Flask endpoint
+
+    Returns:
+        int milliseconds, None when the route uses the connection default (STATEMENT_TIMEOUT_MS)
+    """
+    limits = _route_limits.get(route)
+    return limits.statement_timeout_ms if limits else None
+
+
+def get_admission_control():
+    """
+    Returns the admission control of the current process, see AdmissionControl.
+    An instance inherited through fork is replaced, since its slot files
+    would share their locks with the parent process.
+
+    Returns:
+        AdmissionControl, admitting every request when ADMISSION is disabled
+    """
+    global _admission
+    admission = _admission
+    if admission is not None and admission.pid == os.getpid():
+        return admission
+    with _admission_lock:
+        if _admission is None or _admission.pid != os.getpid():
+            _admission = AdmissionControl(
+                lock_dir=Config.ADMISSION_DIR if Config.ADMISSION else None,
+                max_concurrency=Config.ADMISSION_MAX_CONCURRENCY,
+                queue_size=Config.ADMISSION_QUEUE_SIZE,
+                queue_timeout=Config.ADMISSION_QUEUE_TIMEOUT,
+                route_limits=_route_limits
+            )
+        return _admission
@@ -0,0 +1,362 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+from datetime import datetime, timezone
+
+from config import Config
+from db.version import UNKNOWN_VERSION, DataVersion
+
+try:
+    import duckdb
+except ImportError:     # optional, only required with DB_BACKEND=duckdb
+    duckdb = None
+
+REPOSITORY_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+ANALYSIS_DIR = os.path.join(REPOSITORY_DIR, 'analysis')
+DERIVED_TABLES_SQL = os.path.join(REPOSITORY_DIR, 'json_to_postgresql', 'derived_tables.sql')
+
+# Tables loaded by json_to_postgresql/psql_database.ipynb: (analysis file, [(JSON key, column, type)])
+NATIONAL_TEAMS = ('country_info/country_info.json', [
+    ('NationalTeamID', 'national_team_id', 'INTEGER'),
+    ('NationalTeamName', 'national_team_name', 'VARCHAR'),
+])
+TEAMS = ('club_info/club_info.json', [
+    ('TeamID', 'team_id', 'INTEGER'),
+    ('Team_name', 'team_name', 'VARCHAR'),
+    ('NumberOfCups', 'number_of_cups', 'INTEGER'),
+    ('ImageLink', 'image_link', 'VARCHAR'),
+    ('NationalTeamID', 'national_team_id', 'INTEGER'),
+])
+# Teams of this file without a club_info entry are added to teams, see build_parquet()
+TEAMS_MERGED = 'average_points/average_points_per_team.json'
+# team_yearly_stats is the outer join of these files on (TeamID, Year),
+# in the column order of the PostgreSQL table: (analysis file, JSON key, column, type)
+TEAM_YEARLY_STATS = [
+    ('average_points/average_points_per_team.json', 'AveragePoints', 'average_points', 'DECIMAL(3,2)'),
+    ('average_age/average_age_per_team.json', 'AverageAge', 'average_age', 'DECIMAL(3,1)'),
+    ('club_titles/club_titles.json', 'NumberOfTitlesThisYear', 'number_of_titles_this_year', 'INTEGER'),
+    ('total_team_cost/total_team_cost.json', 'TeamCost', 'team_cost', 'INTEGER'),
+    ('team_size_ratio/team_size_ratio.json', 'TeamSizeRatio', 'team_size_ratio', 'DECIMAL(4,2)'),
+    ('players_in_national_teams/clubs_and_national_players.json', 'PlayersInNationalTeam',
+     'players_in_national_team', 'INTEGER'),
+    ('legionnaires/legionnaires_per_team.json', 'Legioners', 'legionnaires', 'INTEGER'),
+    ('transfer_balance/transfer_balance.json', 'TransferBalance', 'transfer_balance', 'INTEGER'),
+]
+# Derived tables are created from DERIVED_TABLES_SQL
+TABLES = ['national_teams', 'teams', 'team_yearly_stats', 'country_yearly_stats', 'aggregate_cube']
+
+MANIFEST = 'manifest.json'
+# Part of the dataset token, increased when build_parquet() changes how tables are built
+DATASET_LAYOUT = 2
+
+# Session settings that make DuckDB evaluate the API's SQL like PostgreSQL:
+# `/` on integers truncates, NULLs sort last ascending and first descending
+SESSION_SETTINGS = [
+    "SET integer_division = true",
+    "SET default_null_order = 'nulls_last_on_asc_first_on_desc'",
+]
+
+# PostgreSQL type OIDs reported for DuckDB column types, so that formats.rows
+# and the snapshot engine handle results of both backends alike.
+# DuckDB sums integers as HUGEINT where PostgreSQL returns bigint.
+TYPE_OIDS = {
+    'BOOLEAN': 16,
+    'SMALLINT': 21,
+    'INTEGER': 23,
+    'BIGINT': 20,
+    'HUGEINT': 20,
+    'FLOAT': 700,
+    'DOUBLE': 701,
+    'VARCHAR': 25,
+    'DATE': 1082,
+    'TIMESTAMP': 1114,
+    'TIMESTAMP WITH TIME ZONE': 1184,
+    'INTEGER[]': 1007,
+    'BIGINT[]': 1016,
+    'VARCHAR[]': 1009,
+}
+NUMERIC_TYPE = 1700
+
+# psycopg2 placeholders: %s is a parameter, %% a literal percent sign
+_PLACEHOLDER_RE = re.compile(r'%([s%])')
+
+
+class EmbeddedDataMissing(Exception):
+    """Raised when DB_BACKEND=duckdb but no Parquet dataset has been built"""
+
+
+def _require_duckdb():
+    if duckdb is None:
+        raise RuntimeError("DB_BACKEND=duckdb requires the duckdb package")
+
+
+def _configure(conn):
+    # Settings such as integer_division are per connection, cursors do not inherit them
+    for statement in SESSION_SETTINGS:
+        conn.execute(statement)
+    return conn
+
+
+def _connect():
+    return _configure(duckdb.connect(':memory:'))
+
+
+def _quote(path):
+    return "'" + path.replace("'", "''") + "'"
+
+
+def _derived_table_statements(sql):
+    """
+    Translates derived_tables.sql to DuckDB: materialized views become plain tables,
+    indexes are dropped since the tables are exported to Parquet.
+    """
+    sql = '\n'.join(line for line in sql.splitlines() if not line.lstrip().startswith('--'))
+    for statement in sql.split(';'):
+        statement = statement.strip()
+        if statement.startswith('CREATE MATERIALIZED VIEW IF NOT EXISTS'):
+            yield statement.replace('CREATE MATERIALIZED VIEW IF NOT EXISTS', 'CREATE TABLE', 1)
+
+
+def _input_files(analysis_dir):
+    files = [NATIONAL_TEAMS[0], TEAMS[0]] + [source[0] for source in TEAM_YEARLY_STATS]
+    return [os.path.join(analysis_dir, name) for name in files]
+
+
+def _dataset_token(paths):
+    """Hash of the inputs, so an unchanged dataset keeps its version (and cached responses)."""
+    digest = hashlib.sha1(str(DATASET_LAYOUT).encode())
+    for path in paths:
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+def build_parquet(analysis_dir, output_dir, keep=2):
+    """
+    Recreates the database tables from the `analysis/*/*.json` outputs the way
+    psql_database.ipynb does, derives country_yearly_stats and aggregate_cube with
+    derived_tables.sql and writes every table as a Parquet file
+    (`<output_dir>/<version>/<table>.parquet`).
+
+    `<output_dir>/manifest.json` is then replaced atomically, so running
+    servers switch to the new dataset on their next data version check.
+
+    Args:
+        analysis_dir: Directory holding the analysis JSON files
+        output_dir:   Dataset directory (EMBEDDED_DATA_DIR)
+        keep:         Number of dataset versions to keep, including the new one
+
+    Returns:
+        DataVersion of the written dataset
+    """
+    _require_duckdb()
+    inputs = _input_files(analysis_dir) + [DERIVED_TABLES_SQL]
+    token = _dataset_token(inputs)
+    target = os.path.join(output_dir, token)
+
+    if not os.path.isdir(target):
+        staging = target + '.tmp'
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+
+        conn = _connect()
+        try:
+            for table, (name, columns) in (('national_teams', NATIONAL_TEAMS), ('club_info', TEAMS)):
+                select = ', '.join(f'CAST("{key}" AS {kind}) AS {column}' for key, column, kind in columns)
+                conn.execute(
+                    f"CREATE TABLE {table} AS SELECT {select} "
+                    f"FROM read_json_auto({_quote(os.path.join(analysis_dir, name))}, format = 'array')"
+                )
+            # Like the notebook, teams is the outer merge of club_info and the teams of
+            # average_points, so clubs without a club_info entry are kept with NULL details
+            columns = ', '.join(column for _, column, _ in TEAMS[1])
+            conn.execute(
+                f"CREATE TABLE teams AS SELECT {columns} FROM club_info FULL OUTER JOIN ("
+                f'SELECT DISTINCT CAST("TeamID" AS INTEGER) AS team_id '
+                f"FROM read_json_auto({_quote(os.path.join(analysis_dir, TEAMS_MERGED))}, format = 'array')"
+                f") USING (team_id) ORDER BY team_id"
+            )
+
+            sources = [
+                f'{column} AS (SELECT CAST("TeamID" AS INTEGER) AS team_id, CAST("Year" AS INTEGER) AS year, '
+                f'CAST("{key}" AS {kind}) AS {column} '
+                f"FROM read_json_auto({_quote(os.path.join(analysis_dir, name))}, format = 'array'))"
+                for name, key, column, kind in TEAM_YEARLY_STATS
+            ]
+            keys = ' UNION '.join(f'SELECT team_id, year FROM {source[2]}' for source in TEAM_YEARLY_STATS)
+            joins = ' '.join(f'LEFT JOIN {source[2]} USING (team_id, year)' for source in TEAM_YEARLY_STATS)
+            values = ', '.join(f'{source[2]}.{source[2]}' for source in TEAM_YEARLY_STATS)
+            conn.execute(
+                f"CREATE TABLE team_yearly_stats AS WITH {', '.join(sources)}, keys AS ({keys}) "
+                f"SELECT keys.team_id, keys.year, {values} FROM keys {joins}"
+            )
+
+            with open(DERIVED_TABLES_SQL) as f:
+                for statement in _derived_table_statements(f.read()):
+                    conn.execute(statement)
+
+            for table in TABLES:
+                # Parquet has no 128-bit integers, sums are stored as bigint like in PostgreSQL
+                columns = ', '.join(
+                    f'CAST({name} AS BIGINT) AS {name}' if kind == 'HUGEINT' else name
+                    for name, kind in conn.execute(
+                        f"SELECT column_name, column_type FROM (DESCRIBE {table})"
+                    ).fetchall()
+                )
+                path = os.path.join(staging, f'{table}.parquet')
+                conn.execute(f"COPY (SELECT {columns} FROM {table}) TO {_quote(path)} (FORMAT PARQUET)")
+        finally:
+            conn.close()
+        os.rename(staging, target)
+
+    version = DataVersion(token=token, updated_at=datetime.now(timezone.utc))
+    manifest = os.path.join(output_dir, MANIFEST)
+    with open(manifest + '.tmp', 'w') as f:
+        json.dump({'version': token, 'updated_at': version.updated_at.isoformat(), 'tables': TABLES}, f)
+    os.replace(manifest + '.tmp', manifest)
+
+    # Older versions may still be loading in servers that read the previous manifest
+    previous = sorted(
+        (entry for entry in os.listdir(output_dir)
+         if entry != token and not entry.endswith('.tmp') and os.path.isdir(os.path.join(output_dir, entry))),
+        key=lambda entry: os.path.getmtime(os.path.join(output_dir, entry)),
+        reverse=True
+    )
+    for entry in previous[max(keep - 1, 0):]:
+        shutil.rmtree(os.path.join(output_dir, entry), ignore_errors=True)
+    return version
+
+
+def read_manifest(directory):
+    """
+    Returns:
+        dict with `version`, `updated_at` and `tables`, None if no dataset was built
+    """
+    try:
+        with open(os.path.join(directory, MANIFEST)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _type_oid(column_type):
+    name = str(column_type)
+    if name.startswith('DECIMAL'):
+        return NUMERIC_TYPE
+    return TYPE_OIDS.get(name, 0)
+
+
+class EmbeddedDatabase:
+    """
+    In-process DuckDB database serving the API's SQL from the Parquet dataset in
+    `directory` (see build_parquet()), without a database server.
+
+    - The tables are copied into memory when the dataset is first used and
+      reloaded when its manifest names a new version (see version())
+    - Queries use psycopg2 placeholders and return tuples with a description
+      of PostgreSQL type OIDs, like execute_query() on PostgreSQL
+    - Every query runs on its own cursor, so the database is shared by all
+      threads of the process
+
+    Args:
+        directory: Dataset directory (EMBEDDED_DATA_DIR)
+    """
+
+    def __init__(self, directory):
+        _require_duckdb()
+        self.directory = directory
+        self.pid = os.getpid()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._version = UNKNOWN_VERSION
+
+    def version(self):
+        """
+        Reads the manifest and loads its dataset if the version changed.
+        Called through db.get_data_version(), i.e. at most once per
+        DATA_VERSION_CHECK_INTERVAL seconds per process.
+
+        Returns:
+            DataVersion, UNKNOWN_VERSION if no dataset was built
+        """
+        manifest = read_manifest(self.directory)
+        if manifest is None:
+            return self._version
+        if manifest['version'] != self._version.token:
+            with self._lock:
+                if manifest['version'] != self._version.token:
+                    self._conn = self._load(manifest)
+                    self._version = DataVersion(
+                        token=manifest['version'],
+                        updated_at=datetime.fromisoformat(manifest['updated_at'])
+                    )
+        return self._version
+
+    def execute(self, sql, params=()):
+        """
+        Returns:
+            tuple: (rows, description), rows are tuples, description holds
+                   the (name, type_code) pair of every column
+        """
+        relation = self._query(sql, params)
+        return relation.fetchall(), _describe(relation)
+
+    def stream(self, sql, params=()):
+        """
+        Runs a query whose rows are fetched incrementally with fetchmany().
+
+        Returns:
+            tuple: (relation, description)
+        """
+        relation = self._query(sql, params)
+        return relation, _describe(relation)
+
+    def _query(self, sql, params):
+        conn = self._conn
+        if conn is None:
+            self.version()
+            conn = self._conn
+            if conn is None:
+                raise EmbeddedDataMissing(
+                    f"No Parquet dataset in {self.directory}, run `flask build-parquet` first"
+                )
+        sql = _PLACEHOLDER_RE.sub(lambda match: '?' if match.group(1) == 's' else '%', sql)
+        return _configure(conn.cursor()).sql(sql, params=list(params) or None)
+
+    def _load(self, manifest):
+        conn = _connect()
+        dataset = os.path.join(self.directory, manifest['version'])
+        for table in manifest['tables']:
+            path = os.path.join(dataset, f'{table}.parquet')
+            conn.execute(f"CREATE TABLE {table} AS SELECT * FROM read_parquet({_quote(path)})")
+        return conn
+
+
+def _describe(relation):
+    return tuple((name, _type_oid(column_type)) for name, column_type in zip(relation.columns, relation.types))
+
+
+_database = None
+_database_lock = threading.Lock()
+
+
+def get_embedded_database():
+    """
+    Returns the embedded database of the current process, created on first use.
+    A database inherited from a parent process after fork is replaced,
+    so every gunicorn worker loads its own copy.
+
+    Returns:
+        EmbeddedDatabase
+    """
+    global _database
+    database = _database
+    if database is not None and database.pid == os.getpid():
+        return database
+    with _database_lock:
+        if _database is None or _database.pid != os.getpid():
+            _database = EmbeddedDatabase(Config.EMBEDDED_DATA_DIR)
+        return _database
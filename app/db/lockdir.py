@@ -0,0 +1,34 @@
+import logging
+import os
+import stat
+
+logger = logging.getLogger(__name__)
+
+
+def private_directory(path, setting, fallback):
+    """
+    Creates `path` with mode 0700, or checks that an existing one is a directory
+    owned by the current user and inaccessible to others. The flock()-ed files
+    (and stored results) in host-wide coordination directories are trusted,
+    another user must not be able to create or hold them.
+
+    Args:
+        path:     Directory
+        setting:  Name of the configuration variable, for the warning
+        fallback: What happens instead when the directory can't be used, for the warning
+
+    Returns:
+        bool, False (with a warning) if the directory can't be used
+    """
+    try:
+        os.makedirs(path, mode=0o700, exist_ok=True)
+        info = os.lstat(path)
+    except OSError as e:
+        logger.warning("%s %s is not usable (%s), %s", setting, path, e, fallback)
+        return False
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+        logger.warning(
+            "%s %s must be a directory owned by uid %d with mode 0700, %s", setting, path, os.getuid(), fallback
+        )
+        return False
+    return True
@@ -0,0 +1,277 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from decimal import Decimal
+
+try:
+    import fcntl
+except ImportError:     # not available on Windows, coalescing stays within the process
+    fcntl = None
+
+from config import Config
+from db.lockdir import private_directory
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    """Execution shared by concurrent identical requests of one process."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent executions of the same query.
+
+    Within a process, the first caller of a key (the leader) runs the query while
+    later callers with the same key wait for it and receive the same result.
+    With `lock_dir` set, leaders of different processes on the host (gunicorn
+    workers) also coordinate through an flock()-ed file per key: one worker runs
+    the query, workers that have to wait for the lock mark the key as awaited,
+    and for awaited keys the result is stored next to the lock file as JSON,
+    so that the waiting workers read it instead of querying again.
+
+    `lock_dir` must be private to the user of the server, it is created with
+    mode 0700; an existing directory owned by another user or accessible by
+    others is refused and coalescing stays within the process.
+
+    Args:
+        lock_dir:     Directory of lock and result files, None to coalesce within the process only
+        wait_timeout: Seconds to wait for another worker before running the query anyway
+    """
+
+    # Result files older than this are never read; they and lock files unused
+    # for this long are eventually removed
+    RESULT_MAX_AGE = 60
+
+    def __init__(self, lock_dir=None, wait_timeout=30):
+        self.lock_dir = lock_dir if fcntl is not None else None
+        self.wait_timeout = wait_timeout
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._swept_at = time.monotonic()
+
+        self.executions = 0
+        self.coalesced = 0
+        self.coalesced_across_workers = 0
+
+        fallback = 'coalescing within the worker only'
+        if self.lock_dir and not private_directory(self.lock_dir, 'SINGLEFLIGHT_DIR', fallback):
+            self.lock_dir = None
+
+    @staticmethod
+    def make_key(version, sql, params):
+        """
+        Builds the coalescing key of a query: the data version and a digest of the
+        whitespace-normalized SQL and its parameters.
+
+        Returns:
+            str, safe to use as a file name
+        """
+        normalized = ' '.join(sql.split())
+        payload = json.dumps([normalized, params], default=str, separators=(',', ':'))
+        return f"{version}-{hashlib.sha1(payload.encode()).hexdigest()}"
+
+    def do(self, key, fn):
+        """
+        Runs fn() unless an identical call is already in flight, and returns its result.
+        Exceptions of the shared execution are raised in every waiting caller.
+
+        Args:
+            key: Coalescing key, see make_key()
+            fn:  Callable executing the query, returning (rows, description); results
+                 that cannot be stored as JSON are not shared with other workers
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            with self._lock:
+                self.coalesced += 1
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._run(key, fn)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pid': os.getpid(),
+                'cross_worker': self.lock_dir is not None,
+                'in_flight': len(self._calls),
+                'executions': self.executions,
+                'coalesced': self.coalesced,
+                'coalesced_across_workers': self.coalesced_across_workers,
+            }
+
+    def _run(self, key, fn):
+        if self.lock_dir is None:
+            return self._execute(fn)
+
+        path = os.path.join(self.lock_dir, key)
+        fd = os.open(path + '.lock', os.O_CREAT | os.O_RDWR, 0o600)
+        try:
+            started = time.time()
+            acquired, waited = self._acquire(fd, path)
+            if not acquired:
+                # Another worker kept the lock for too long, do not wait any further
+                return self._execute(fn)
+            try:
+                # Keeps the lock file from being swept while the key is in use
+                os.utime(fd)
+                if waited:
+                    # Another worker ran the query meanwhile: use its result if it finished after we started waiting
+                    result = self._read_result(path, started)
+                    if result is not None:
+                        with self._lock:
+                            self.coalesced_across_workers += 1
+                        return result
+                result = self._execute(fn)
+                if _remove(path + '.waiting'):
+                    # Only stored when another worker is waiting for it
+                    self._write_result(path, result)
+                return result
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+            self._sweep()
+
+    def _execute(self, fn):
+        with self._lock:
+            self.executions += 1
+        return fn()
+
+    def _acquire(self, fd, path):
+        """
+        Returns:
+            tuple: (acquired, waited), waited is True if another process held the lock
+        """
+        deadline = time.monotonic() + self.wait_timeout
+        waited = False
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return True, waited
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    return False, waited
+                if not waited:
+                    # Asks the worker holding the lock to store its result
+                    os.close(os.open(path + '.waiting', os.O_CREAT | os.O_WRONLY, 0o600))
+                    waited = True
+                time.sleep(0.005)
+
+    def _read_result(self, path, since):
+        try:
+            if os.stat(path + '.result').st_mtime < since - 0.01:
+                return None
+            with open(path + '.result') as f:
+                rows, description = json.load(f, object_hook=_decode_value)
+        except (OSError, ValueError):
+            return None
+        return [tuple(row) for row in rows], tuple(tuple(column) for column in description)
+
+    def _write_result(self, path, result):
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, 'w') as f:
+                json.dump(result, f, default=_encode_value, separators=(',', ':'))
+            os.replace(tmp, path + '.result')
+        except (OSError, TypeError, ValueError):
+            _remove(tmp)
+
+    def _sweep(self):
+        now = time.monotonic()
+        if now - self._swept_at < self.RESULT_MAX_AGE:
+            return
+        self._swept_at = now
+        expired = time.time() - self.RESULT_MAX_AGE
+        for name in os.listdir(self.lock_dir):
+            file = os.path.join(self.lock_dir, name)
+            try:
+                if os.stat(file).st_mtime >= expired:
+                    continue
+                if name.endswith('.lock'):
+                    _remove_unlocked(file)
+                else:
+                    os.remove(file)
+            except OSError:
+                pass
+
+
+def _remove(path):
+    """Returns True if the file existed and was removed."""
+    try:
+        os.remove(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def _remove_unlocked(path):
+    # A lock file is only removed while nobody holds it
+    fd = os.open(path, os.O_RDWR)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        os.remove(path)
+    except BlockingIOError:
+        pass
+    finally:
+        os.close(fd)
+
+
+# Result values JSON has no type for, see _write_result()
+def _encode_value(value):
+    if isinstance(value, Decimal):
+        return {'$decimal': str(value)}
+    raise TypeError(f"{type(value).__name__} is not shared between workers")
+
+
+def _decode_value(obj):
+    if obj.keys() == {'$decimal'}:
+        return Decimal(obj['$decimal'])
+    return obj
+
+
+_single_flight = None
+_single_flight_lock = threading.Lock()
+
+
+def get_single_flight():
+    """
+    Returns the process-wide query coalescer configured by SINGLEFLIGHT.
+
+    Returns:
+        SingleFlight, None when coalescing is disabled
+    """
+    global _single_flight
+    if Config.SINGLEFLIGHT == 'off':
+        return None
+    if _single_flight is None:
+        with _single_flight_lock:
+            if _single_flight is None:
+                lock_dir = Config.SINGLEFLIGHT_DIR if Config.SINGLEFLIGHT == 'host' else None
+                _single_flight = SingleFlight(lock_dir=lock_dir, wait_timeout=Config.SINGLEFLIGHT_WAIT_TIMEOUT)
+    return _single_flight
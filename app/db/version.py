@@ -0,0 +1,70 @@
+import threading
+import time
+from collections import namedtuple
+
+import psycopg2
+from config import Config
+
+
+# Token identifying the currently loaded dataset.
+# `token` changes whenever json_to_postgresql/psql_database.ipynb reloads the tables,
+# `updated_at` is the time of that reload (None if unknown).
+DataVersion = namedtuple('DataVersion', ['token', 'updated_at'])
+
+UNKNOWN_VERSION = DataVersion(token='unknown', updated_at=None)
+
+_lock = threading.Lock()
+_current = None
+_checked_at = 0.0
+
+
+def get_data_version():
+    """
+    Returns the version of the loaded dataset from the `data_version` table
+    (with DB_BACKEND=duckdb, from the manifest of the Parquet dataset).
+    The value is re-read at most once per DATA_VERSION_CHECK_INTERVAL seconds
+    per process, so calling this on every request is cheap.
+
+    When no pooled connection becomes free in time, the last version read
+    is kept, so a saturated pool does not disable caching for every request.
+
+    Returns:
+        DataVersion, UNKNOWN_VERSION if the table is missing or unreachable
+    """
+    global _current, _checked_at
+    now = time.monotonic()
+    if _current is not None and now - _checked_at < Config.DATA_VERSION_CHECK_INTERVAL:
+        return _current
+
+    with _lock:
+        if _current is not None and now - _checked_at < Config.DATA_VERSION_CHECK_INTERVAL:
+            return _current
+        _current = _read_data_version(_current or UNKNOWN_VERSION)
+        _checked_at = time.monotonic()
+        return _current
+
+
+def _read_data_version(previous):
+    if Config.DB_BACKEND == 'duckdb':
+        from db.embedded import get_embedded_database
+        return get_embedded_database().version()
+
+    # Imported here to avoid a circular import with db/__init__.py
+    from db import PoolTimeout, get_conn, release_conn
+
+    conn = None
+    try:
+        conn = get_conn()
+        with conn.cursor() as cur:
+            cur.execute("SELECT version, updated_at FROM data_version")
+            row = cur.fetchone()
+        if row is None:
+            return UNKNOWN_VERSION
+        return DataVersion(token=str(row['version']), updated_at=row['updated_at'])
+    except PoolTimeout:
+        return previous
+    except psycopg2.Error:
+        return UNKNOWN_VERSION
+    finally:
+        if conn is not None:
+            release_conn(conn)
@@ -0,0 +1,184 @@
+import json
+
+from flask import current_app, request
+
+try:
+    import orjson
+except ImportError:     # optional, the standard library encoder is used instead
+    orjson = None
+
+# Response formats selectable with ?format=<name> or the Accept header.
+# Row-oriented JSON is the default.
+#   json     - list of objects, one per row
+#   columns  - one JSON object mapping every field to the list of its values
+#   msgpack  - MessagePack encoding of the column-oriented layout
+#   arrow    - Apache Arrow IPC stream of a single record batch
+#   ndjson   - one JSON object per line, always streamed
+MEDIA_TYPES = {
+    'json': 'application/json',
+    'columns': 'application/vnd.football.columns+json',
+    'msgpack': 'application/msgpack',
+    'arrow': 'application/vnd.apache.arrow.stream',
+    'ndjson': 'application/x-ndjson',
+}
+
+# Formats that can be written incrementally row by row
+STREAMING_FORMATS = ('json', 'ndjson')
+
+# Additional Accept values recognized for a format
+_ACCEPT_ALIASES = {
+    'application/x-msgpack': 'msgpack',
+    'application/vnd.apache.arrow.file': 'arrow',
+}
+
+
+class FormatError(Exception):
+    """Raised when the requested format is unknown or cannot be produced."""
+
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.status = status
+
+
+def negotiate_format(args=None, accept_mimetypes=None):
+    """
+    Determines the response format of a request.
+    An explicit `format` query parameter takes precedence over the Accept header.
+
+    Args:
+        args:             Request arguments, defaults to those of the current Flask request
+        accept_mimetypes: Parsed Accept header (werkzeug MIMEAccept),
+                          defaults to that of the current Flask request
+
+    Returns:
+        str: key of MEDIA_TYPES
+
+    Raises:
+        FormatError: Unknown `format` value (400)
+    """
+    if args is None:
+        args = request.args
+    if accept_mimetypes is None:
+        accept_mimetypes = request.accept_mimetypes
+
+    fmt = args.get('format')
+    if fmt is not None:
+        fmt = fmt.lower()
+        if fmt not in MEDIA_TYPES:
+            raise FormatError(f"Invalid format: {fmt}. Allowed: {list(MEDIA_TYPES)}", 400)
+        return fmt
+
+    offered = list(MEDIA_TYPES.values()) + list(_ACCEPT_ALIASES)
+    best = accept_mimetypes.best_match(offered, default=MEDIA_TYPES['json'])
+    if best in _ACCEPT_ALIASES:
+        return _ACCEPT_ALIASES[best]
+    return next(name for name, media_type in MEDIA_TYPES.items() if media_type == best)
+
+
+def to_columns(rows, columns):
+    """
+    Converts row-oriented API data to a column-oriented layout.
+
+    Args:
+        rows:    List of dicts with identical keys
+        columns: Ordered field names (used when rows is empty)
+
+    Returns:
+        dict mapping every field to the list of its values
+    """
+    return {column: [row[column] for row in rows] for column in columns}
+
+
+def render_response(rows, columns, fmt):
+    """
+    Serializes API data in the requested format.
+
+    Args:
+        rows:    List of dicts with camelCase keys in sorted order (see formats.rows.RowEncoder)
+        columns: Ordered camelCase field names of the result
+        fmt:     Key of MEDIA_TYPES
+
+    Returns:
+        Flask response
+
+    Raises:
+        FormatError: The optional package required by `fmt` is not installed (406)
+    """
+    return current_app.response_class(encode_body(rows, columns, fmt), mimetype=MEDIA_TYPES[fmt])
+
+
+def encode_json(obj, sort_keys=True, newline=True):
+    """
+    Encodes an object like Flask's jsonify() (sorted keys, compact separators,
+    trailing newline), with orjson when it is installed. Non-ASCII characters
+    are written as UTF-8 instead of \\u escapes, with or without orjson, so
+    responses are the same bytes whether orjson is installed or not.
+
+    Args:
+        obj:       JSON-serializable object without Decimal values
+        sort_keys: False if the keys of every dict are already inserted in sorted order
+        newline:   Append a trailing newline
+
+    Returns:
+        bytes
+    """
+    if orjson is not None:
+        option = orjson.OPT_SORT_KEYS if sort_keys else 0
+        if newline:
+            option |= orjson.OPT_APPEND_NEWLINE
+        return orjson.dumps(obj, option=option)
+    body = json.dumps(obj, sort_keys=sort_keys, separators=(',', ':'), ensure_ascii=False)
+    return (body + '\n' if newline else body).encode()
+
+
+def dump_json(obj):
+    """
+    Encodes an object like Flask's jsonify() outside of an application context,
+    see encode_json().
+
+    Returns:
+        str
+    """
+    return encode_json(obj).decode()
+
+
+def encode_body(rows, columns, fmt):
+    """
+    Serializes API data in the requested format without a Flask application context,
+    see render_response().
+
+    Returns:
+        bytes
+
+    Raises:
+        FormatError: The optional package required by `fmt` is not installed (406)
+    """
+    if fmt == 'json':
+        return encode_json(rows, sort_keys=False)
+
+    column_data = to_columns(rows, columns)
+    if fmt == 'columns':
+        return encode_json(column_data)
+    if fmt == 'msgpack':
+        return _encode_msgpack(column_data)
+    return _encode_arrow(column_data)
+
+
+def _encode_msgpack(column_data):
+    try:
+        import msgpack
+    except ImportError as e:
+        raise FormatError("MessagePack format requires the 'msgpack' package", 406) from e
+    return msgpack.packb(column_data, use_bin_type=True)
+
+
+def _encode_arrow(column_data):
+    try:
+        import pyarrow as pa
+    except ImportError as e:
+        raise FormatError("Arrow format requires the 'pyarrow' package", 406) from e
+    table = pa.Table.from_pydict(column_data)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
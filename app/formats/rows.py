@@ -0,0 +1,85 @@
+from operator import itemgetter
+
+from formats import encode_json
+
+# PostgreSQL type OID of NUMERIC; psycopg returns such values as Decimal
+NUMERIC_TYPE = 1700
+
+
+def _to_float(value):
+    return None if value is None else float(value)
+
+
+# Conversions of values to JSON-compatible types by column type OID.
+# Routes cast their NUMERIC columns to float8 in SQL (QuerySpec.floats),
+# the conversion only covers columns that are not cast.
+CONVERTERS = {
+    NUMERIC_TYPE: _to_float,
+}
+
+
+class RowEncoder:
+    """
+    Converts query result rows (tuples) of one column layout to API rows.
+
+    The camelCase names, the type conversions and the key order are resolved
+    once from the cursor description instead of for every cell. Keys are
+    inserted in sorted order, so the rows serialize like jsonify() output
+    without sorting every object again.
+
+    Args:
+        description: ((name, type_code), ...) of the result columns
+        key_mapping: Mapping of snake_case column names to camelCase API names
+    """
+
+    def __init__(self, description, key_mapping):
+        self.names = [name for name, _ in description]
+        self.columns = [key_mapping.get(name, name) for name in self.names]
+        self._converters = [
+            (index, CONVERTERS[type_code])
+            for index, (_, type_code) in enumerate(description)
+            if type_code in CONVERTERS
+        ]
+        order = sorted(range(len(self.columns)), key=lambda index: self.columns[index])
+        self._keys = [self.columns[index] for index in order]
+        # None when the columns are already in sorted order
+        self._reorder = itemgetter(*order) if order != list(range(len(order))) else None
+
+    def to_dicts(self, rows):
+        """
+        Args:
+            rows: Sequence of result tuples
+
+        Returns:
+            List of dicts with camelCase keys in sorted order
+        """
+        if self._converters:
+            rows = [self._convert(row) for row in rows]
+        keys, reorder = self._keys, self._reorder
+        if reorder is None:
+            return [dict(zip(keys, row)) for row in rows]
+        return [dict(zip(keys, reorder(row))) for row in rows]
+
+    def to_json_lines(self, rows):
+        """
+        Returns:
+            List of compact JSON objects (bytes, no trailing newline), one per row
+        """
+        return [encode_json(row, sort_keys=False, newline=False) for row in self.to_dicts(rows)]
+
+    def _convert(self, row):
+        row = list(row)
+        for index, convert in self._converters:
+            row[index] = convert(row[index])
+        return row
+
+
+def describe(description):
+    """
+    Reduces a DB-API cursor description (psycopg2 or psycopg 3) to the
+    hashable form expected by RowEncoder.
+
+    Returns:
+        tuple of (name, type_code) pairs
+    """
+    return tuple((column.name, column.type_code) for column in description)
@@ -0,0 +1,30 @@
+# Gunicorn settings of the API: gunicorn -c gunicorn.conf.py app:app
+import os
+import shutil
+
+# Prometheus multiprocess mode: workers write metrics to files in this directory,
+# which must exist and be empty before the first worker starts.
+# Set before prometheus_client is imported, which selects its storage on import.
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/football-api-metrics')
+
+from prometheus_client import multiprocess  # noqa: E402
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.getenv('GUNICORN_WORKERS', '4'))
+
+
+def on_starting(server):
+    metrics_dir = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir)
+
+
+def post_worker_init(worker):
+    # Precompute the responses of the first visits (WARMUP), limited to WARMUP_CONCURRENCY requests
+    from warmup import start_cache_warmer
+    start_cache_warmer(worker.wsgi)
+
+
+def child_exit(server, worker):
+    # Drop live gauges (pool connections) of the exited worker
+    multiprocess.mark_process_dead(worker.pid)
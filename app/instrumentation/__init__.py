@@ -0,0 +1,178 @@
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+
+from flask import g, has_request_context, request
+from config import Config
+
+# Structured access log, one JSON object per line
+access_logger = logging.getLogger('api.access')
+
+# WSGI environ key marking requests the API sends to itself (cache warm-up),
+# which are left out of the access log
+INTERNAL_REQUEST = 'football_api.internal'
+
+_NULL_PHASE = nullcontext()
+
+# Entries of the cProfile summary returned in the X-Profile header
+PROFILE_HEADER_ENTRIES = 10
+# Entries of the cProfile summary written to the access log
+PROFILE_LOG_ENTRIES = 30
+
+
+class RequestTimer:
+    """
+    Collects the duration of the phases of one request (connection checkout,
+    SQL execution, transformation, serialization, ...) and row counts.
+    Durations of repeated phases are summed.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}
+        self.counts = {}
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - started
+
+    def count(self, name, value):
+        self.counts[name] = self.counts.get(name, 0) + value
+
+    def total(self):
+        return time.perf_counter() - self.started
+
+    def server_timing(self):
+        """
+        Returns:
+            str: Server-Timing header value, durations in milliseconds
+        """
+        entries = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in self.phases.items()]
+        entries += [f'{name};desc="{value}"' for name, value in self.counts.items()]
+        entries.append(f"total;dur={self.total() * 1000:.2f}")
+        return ', '.join(entries)
+
+
+def phase(name):
+    """
+    Times a block as a phase of the current request:
+
+        with phase('sql'):
+            cur.execute(sql, params)
+
+    Returns a shared no-op context manager when timing is disabled
+    or there is no request.
+    """
+    timer = g.get('request_timer') if has_request_context() else None
+    if timer is None:
+        return _NULL_PHASE
+    return timer.phase(name)
+
+
+def count(name, value):
+    """Adds to a counter of the current request (e.g. rows) if timing is enabled."""
+    timer = g.get('request_timer') if has_request_context() else None
+    if timer is not None:
+        timer.count(name, value)
+
+
+def profiling():
+    """Tells whether the current request is profiled with `?profile=1`."""
+    return has_request_context() and g.get('profiler') is not None
+
+
+def init_request_timing(app):
+    """
+    Registers request hooks for the Server-Timing header (REQUEST_TIMING),
+    the JSON access log (ACCESS_LOG) and `?profile=1` (PROFILING). Phases are
+    also timed for the Prometheus metrics (METRICS, see instrumentation.metrics).
+    Nothing is registered when all of them are disabled.
+
+    Args:
+        app: Flask application
+    """
+    if not (Config.REQUEST_TIMING or Config.ACCESS_LOG or Config.PROFILING or Config.METRICS):
+        return
+
+    if Config.ACCESS_LOG and not access_logger.handlers:
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        access_logger.addHandler(handler)
+        access_logger.setLevel(logging.INFO)
+        access_logger.propagate = False
+
+    @app.before_request
+    def start_request_timing():
+        profile = Config.PROFILING and request.args.get('profile') == '1'
+        if not (Config.REQUEST_TIMING or Config.ACCESS_LOG or Config.METRICS or profile):
+            return
+        g.request_timer = RequestTimer()
+        if profile:
+            g.profiler = cProfile.Profile()
+            g.profiler.enable()
+
+    @app.after_request
+    def finish_request_timing(response):
+        timer = g.get('request_timer')
+        if timer is None:
+            return response
+
+        profile = None
+        profiler = g.get('profiler')
+        if profiler is not None:
+            profiler.disable()
+            profile = pstats.Stats(profiler).sort_stats('cumulative')
+            response.headers['X-Profile'] = _profile_header(profile)
+
+        if Config.REQUEST_TIMING or profiler is not None:
+            response.headers['Server-Timing'] = timer.server_timing()
+
+        internal = request.environ.get(INTERNAL_REQUEST, False)
+        if (Config.ACCESS_LOG and not internal) or profiler is not None:
+            record = {
+                'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+                'pid': os.getpid(),
+                'method': request.method,
+                'path': request.path,
+                'query': request.query_string.decode('latin-1'),
+                'endpoint': request.endpoint,
+                'status': response.status_code,
+                'bytes': response.content_length,
+                'duration_ms': round(timer.total() * 1000, 3),
+                'phases_ms': {name: round(seconds * 1000, 3) for name, seconds in timer.phases.items()},
+                **timer.counts,
+            }
+            if profile is not None:
+                record['profile'] = _profile_text(profile)
+            access_logger.info(json.dumps(record, separators=(',', ':')))
+        return response
+
+
+def _top_functions(stats, limit):
+    entries = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)
+    for (filename, line, function), (_, calls, _, cumulative, _) in entries[:limit]:
+        yield f"{os.path.basename(filename)}:{line}({function})", calls, cumulative
+
+
+def _profile_header(stats):
+    return ', '.join(
+        f"{location};calls={calls};cum_ms={cumulative * 1000:.2f}"
+        for location, calls, cumulative in _top_functions(stats, PROFILE_HEADER_ENTRIES)
+    )
+
+
+def _profile_text(stats):
+    stream = io.StringIO()
+    stats.stream = stream
+    stats.print_stats(PROFILE_LOG_ENTRIES)
+    return stream.getvalue()
@@ -0,0 +1,158 @@
+import logging
+import os
+
+from flask import g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+)
+from cache import get_response_cache
+from config import Config
+from db import pool_stats
+from db.admission import get_admission_control
+
+# Metrics are aggregated across gunicorn workers when PROMETHEUS_MULTIPROC_DIR is set
+# (see gunicorn.conf.py): every worker writes its samples to memory-mapped files in
+# that directory and /metrics merges the files of all workers.
+
+RESPONSE_SIZE_BUCKETS = [256 * 4 ** i for i in range(9)]    # 256 B .. 16 MiB
+
+REQUESTS = Counter(
+    'api_requests_total', 'HTTP requests by Flask endpoint, method and status',
+    ['endpoint', 'method', 'status']
+)
+ERRORS = Counter(
+    'api_errors_total', 'Responses with a 4xx or 5xx status by Flask endpoint',
+    ['endpoint', 'status']
+)
+REQUEST_DURATION = Histogram(
+    'api_request_duration_seconds', 'Request handling time by Flask endpoint',
+    ['endpoint']
+)
+RESPONSE_SIZE = Histogram(
+    'api_response_size_bytes', 'Size of buffered response bodies by Flask endpoint',
+    ['endpoint'], buckets=RESPONSE_SIZE_BUCKETS
+)
+DB_QUERY_DURATION = Histogram(
+    'api_db_query_duration_seconds', 'SQL execution time per request by Flask endpoint, without pool checkout',
+    ['endpoint']
+)
+POOL_CONNECTIONS = Gauge(
+    'api_db_pool_connections', 'Open database connections of live workers by state',
+    ['state'], multiprocess_mode='livesum'
+)
+POOL_MAX_CONNECTIONS = Gauge(
+    'api_db_pool_max_connections', 'Connection limit summed over live workers',
+    multiprocess_mode='livesum'
+)
+POOL_CHECKOUTS = Counter('api_db_pool_checkouts_total', 'Connections checked out of the pool')
+POOL_TIMEOUTS = Counter('api_db_pool_timeouts_total', 'Checkouts that timed out waiting for a connection')
+POOL_WAIT = Counter('api_db_pool_wait_seconds_total', 'Time spent waiting for a pooled connection')
+ADMISSION_QUEUE_DURATION = Histogram(
+    'api_admission_queue_seconds', 'Time requests waited for a database slot by Flask endpoint',
+    ['endpoint'], buckets=[0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+)
+ADMISSION_REJECTIONS = Counter(
+    'api_admission_rejected_total', 'Requests shed with 503 by reason (queue_full, queue_timeout)', ['reason']
+)
+CACHE_LOOKUPS = Counter('api_cache_lookups_total', 'Response cache lookups by result', ['result'])
+
+logger = logging.getLogger(__name__)
+
+# Last seen cumulative pool and cache counters of this process, see _export_deltas()
+_last = {'pid': None}
+
+
+def init_metrics(app):
+    """
+    Registers the request hook recording Prometheus metrics when METRICS is enabled.
+    Phase durations are taken from instrumentation.RequestTimer.
+
+    Args:
+        app: Flask application
+    """
+    if not Config.METRICS:
+        return
+
+    @app.after_request
+    def record_request_metrics(response):
+        endpoint = request.endpoint or 'unmatched'
+        status = str(response.status_code)
+        REQUESTS.labels(endpoint, request.method, status).inc()
+        if response.status_code >= 400:
+            ERRORS.labels(endpoint, status).inc()
+
+        timer = g.get('request_timer')
+        if timer is not None:
+            REQUEST_DURATION.labels(endpoint).observe(timer.total())
+            if 'sql' in timer.phases:
+                DB_QUERY_DURATION.labels(endpoint).observe(timer.phases['sql'])
+            if 'queue' in timer.phases:
+                ADMISSION_QUEUE_DURATION.labels(endpoint).observe(timer.phases['queue'])
+        if response.content_length is not None:
+            RESPONSE_SIZE.labels(endpoint).observe(response.content_length)
+
+        if request.blueprint == 'api':
+            try:
+                _export_deltas()
+            except Exception:
+                # Metrics must never replace the response
+                logger.exception("Exporting pool, cache and admission metrics failed")
+        return response
+
+
+def metrics_response(response_class):
+    """
+    Renders all metrics in the Prometheus text format, merged over every
+    worker in multiprocess mode.
+
+    Args:
+        response_class: Flask response class
+
+    Returns:
+        Flask response
+    """
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return response_class(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
+
+
+def _export_deltas():
+    # The pool, the response cache and admission control keep cumulative counters
+    # per process; export what changed since the previous request of this process.
+    # The pool is only read, requests that need no database must not connect
+    pool = pool_stats(create=False)
+    cache = get_response_cache().stats()
+    admission = get_admission_control().stats()
+    current = {
+        'checkouts': pool['checkouts'],
+        'timeouts': pool['timeouts'],
+        'wait': pool['wait_ms_total'] / 1000,
+        'hits': cache['hits'],
+        'misses': cache['misses'],
+        'queue_full': admission['rejected_queue_full'],
+        'queue_timeout': admission['rejected_queue_timeout'],
+    }
+    if _last['pid'] != os.getpid():
+        # First request of this worker, its pool and cache counters start at zero
+        _last.clear()
+        _last.update(dict.fromkeys(current, 0), pid=os.getpid())
+
+    POOL_CONNECTIONS.labels('in_use').set(pool['in_use'])
+    POOL_CONNECTIONS.labels('idle').set(pool['idle'])
+    POOL_MAX_CONNECTIONS.set(pool['max_size'])
+    for counter, name in (
+        (POOL_CHECKOUTS, 'checkouts'),
+        (POOL_TIMEOUTS, 'timeouts'),
+        (POOL_WAIT, 'wait'),
+        (CACHE_LOOKUPS.labels('hit'), 'hits'),
+        (CACHE_LOOKUPS.labels('miss'), 'misses'),
+        (ADMISSION_REJECTIONS.labels('queue_full'), 'queue_full'),
+        (ADMISSION_REJECTIONS.labels('queue_timeout'), 'queue_timeout'),
+    ):
+        delta = current[name] - _last[name]
+        if delta > 0:
+            counter.inc(delta)
+        _last[name] = current[name]
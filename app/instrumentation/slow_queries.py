@@ -0,0 +1,336 @@
+import hashlib
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:     # not available on Windows, workers then write the log without locking
+    fcntl = None
+
+import psycopg2.errors
+from flask import has_request_context, request
+from config import Config
+from db import get_conn, release_conn
+from db.admission import Overloaded, get_admission_control
+from db.embedded import get_embedded_database
+
+# Normalization of SQL statements into shapes, see normalize_sql()
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_LIST_RE = re.compile(r'%s(?:\s*,\s*%s)+')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+# Sampled statements waiting for their EXPLAIN; further ones are logged without a plan
+EXPLAIN_QUEUE_SIZE = 16
+# Admission control route of the EXPLAIN runs, limit it with ROUTE_LIMITS
+EXPLAIN_ROUTE = 'slow_queries.explain'
+
+
+def normalize_sql(sql):
+    """
+    Reduces a statement to its shape: literals replaced by placeholders,
+    placeholder lists collapsed and whitespace normalized, so statements that
+    differ only in their LIMIT or number of filter values are grouped together.
+
+    Args:
+        sql: Final SQL statement, see routes.query.build_query()
+
+    Returns:
+        str shape
+    """
+    shape = _STRING_RE.sub('?', sql)
+    shape = _NUMBER_RE.sub('?', shape)
+    shape = _PLACEHOLDER_LIST_RE.sub('%s, ...', shape)
+    return _WHITESPACE_RE.sub(' ', shape).strip()
+
+
+def shape_id(shape):
+    return hashlib.sha1(shape.encode()).hexdigest()[:12]
+
+
+class SharedRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """
+    RotatingFileHandler written by all workers of the host: records and rollovers
+    are serialized with flock() on `<file>.lock`, and a worker reopens the file
+    once another worker has rotated it.
+    """
+
+    def emit(self, record):
+        if fcntl is None:
+            return super().emit(record)
+        with open(self.baseFilename + '.lock', 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                if self.stream is not None and self._rotated():
+                    self.stream.close()
+                    self.stream = None
+                super().emit(record)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _rotated(self):
+        try:
+            return os.stat(self.baseFilename).st_ino != os.fstat(self.stream.fileno()).st_ino
+        except OSError:
+            return True
+
+
+class SlowQueryLog:
+    """
+    Records API statements that ran longer than `threshold_ms` as JSON lines:
+    the final SQL, its parameters, duration, row count, endpoint and shape.
+
+    Statements are recorded when they complete or fail, so statements cancelled
+    by their statement timeout are recorded (with `timed_out`) whatever their
+    duration. Streamed statements are timed until their last row was sent.
+
+    A fraction `explain_sample` of the slow statements is run again with
+    EXPLAIN (ANALYZE, BUFFERS) by a background thread of the worker and logged
+    with its plan; timed out statements are only planned (EXPLAIN). The plans
+    show which base query shapes degrade as the data grows. EXPLAIN runs have
+    their own statement timeout, are subject to admission control (EXPLAIN_ROUTE)
+    and are skipped when their queue is full.
+
+    Args:
+        path:           Log file, rotated when it reaches `max_bytes`
+        threshold_ms:   Statements running at least this long are recorded
+        explain_sample: Fraction of recorded statements captured with their plan, 0 for none
+        max_bytes:      Size of the log file before rotation
+        backups:        Rotated files kept
+    """
+
+    def __init__(self, path, threshold_ms, explain_sample=0.0, max_bytes=10 * 1024 * 1024, backups=3):
+        self.path = path
+        self.threshold_ms = threshold_ms
+        self.explain_sample = explain_sample
+        self.backups = backups
+        self.pid = os.getpid()
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        handler = SharedRotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, delay=True)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        self._logger = logging.Logger('api.slow_queries', logging.INFO)
+        self._logger.addHandler(handler)
+
+        self._explains = queue.Queue(maxsize=EXPLAIN_QUEUE_SIZE)
+        self._explain_thread = None
+        self._lock = threading.Lock()
+
+        self.recorded = 0
+        self.explained = 0
+        self.explain_skipped = 0
+
+    def observe(self, sql, params, seconds, rows, error=None, streamed=False, endpoint=None):
+        """
+        Records a statement if it ran at least `threshold_ms` or was cancelled
+        by its statement timeout.
+
+        Args:
+            sql:      Final SQL statement
+            params:   Statement parameters
+            seconds:  Execution time including the fetch of the rows (and sending them, if streamed)
+            rows:     Number of returned rows, None if the statement failed
+            error:    Exception the statement failed with
+            streamed: Rows were streamed from a server-side cursor
+            endpoint: Flask endpoint, taken from the request context if omitted
+        """
+        duration_ms = seconds * 1000
+        timed_out = isinstance(error, psycopg2.errors.QueryCanceled)
+        if duration_ms < self.threshold_ms and not timed_out:
+            return
+        shape = normalize_sql(sql)
+        entry = {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'pid': os.getpid(),
+            'endpoint': endpoint or (request.endpoint if has_request_context() else None),
+            'shape_id': shape_id(shape),
+            'shape': shape,
+            'sql': sql,
+            'params': list(params),
+            'duration_ms': round(duration_ms, 3),
+            'rows': rows,
+            'streamed': streamed,
+        }
+        if error is not None:
+            entry['error'] = str(error).strip()
+            entry['timed_out'] = timed_out
+        with self._lock:
+            self.recorded += 1
+        if self.explain_sample and random.random() < self.explain_sample:
+            try:
+                self._explain_worker().put_nowait(entry)
+                return
+            except queue.Full:
+                with self._lock:
+                    self.explain_skipped += 1
+        self._write(entry)
+
+    def worst(self, limit=20):
+        """
+        Aggregates the log file and its rotated backups by statement shape.
+
+        Args:
+            limit: Number of shapes to return
+
+        Returns:
+            list of dicts per shape, ordered by total duration, with the plan
+            of its slowest explained execution
+        """
+        shapes = {}
+        for path in [self.path] + [f"{self.path}.{i}" for i in range(1, self.backups + 1)]:
+            try:
+                with open(path) as f:
+                    lines = f.readlines()
+            except OSError:
+                continue
+            for line in lines:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                stats = shapes.get(entry['shape_id'])
+                if stats is None:
+                    stats = shapes[entry['shape_id']] = {
+                        'shape_id': entry['shape_id'],
+                        'shape': entry['shape'],
+                        'endpoints': set(),
+                        'count': 0,
+                        'errors': 0,
+                        'timeouts': 0,
+                        'total_ms': 0.0,
+                        'max_ms': 0.0,
+                        'rows_max': 0,
+                        'last_seen': None,
+                        'slowest_sql': None,
+                        'slowest_params': None,
+                        'plan': None,
+                        'plan_duration_ms': None,
+                    }
+                stats['count'] += 1
+                stats['total_ms'] += entry['duration_ms']
+                stats['errors'] += 'error' in entry
+                stats['timeouts'] += entry.get('timed_out', False)
+                stats['rows_max'] = max(stats['rows_max'], entry['rows'] or 0)
+                stats['last_seen'] = max(stats['last_seen'] or entry['time'], entry['time'])
+                if entry.get('endpoint'):
+                    stats['endpoints'].add(entry['endpoint'])
+                if entry['duration_ms'] >= stats['max_ms']:
+                    stats['max_ms'] = entry['duration_ms']
+                    stats['slowest_sql'] = entry['sql']
+                    stats['slowest_params'] = entry['params']
+                if entry.get('plan') is not None and entry['duration_ms'] >= (stats['plan_duration_ms'] or 0):
+                    stats['plan'] = entry['plan']
+                    stats['plan_duration_ms'] = entry['duration_ms']
+
+        worst = sorted(shapes.values(), key=lambda stats: stats['total_ms'], reverse=True)[:limit]
+        for stats in worst:
+            stats['endpoints'] = sorted(stats['endpoints'])
+            stats['avg_ms'] = round(stats['total_ms'] / stats['count'], 3)
+            stats['total_ms'] = round(stats['total_ms'], 3)
+        return worst
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pid': os.getpid(),
+                'path': self.path,
+                'threshold_ms': self.threshold_ms,
+                'explain_sample': self.explain_sample,
+                'recorded': self.recorded,
+                'explained': self.explained,
+                'explain_skipped': self.explain_skipped,
+            }
+
+    def _write(self, entry):
+        self._logger.info(json.dumps(entry, separators=(',', ':'), default=str))
+
+    def _explain_worker(self):
+        with self._lock:
+            if self._explain_thread is None:
+                self._explain_thread = threading.Thread(
+                    target=self._run_explains, name='slow-query-explain', daemon=True
+                )
+                self._explain_thread.start()
+        return self._explains
+
+    def _run_explains(self):
+        while True:
+            entry = self._explains.get()
+            try:
+                with get_admission_control().admit(EXPLAIN_ROUTE):
+                    # A statement that hit its timeout would hit it again, it is planned without running it
+                    entry['plan'] = explain(entry['sql'], entry['params'], analyze=not entry.get('timed_out'))
+                with self._lock:
+                    self.explained += 1
+            except Overloaded:
+                with self._lock:
+                    self.explain_skipped += 1
+            except Exception as e:
+                entry['plan_error'] = str(e)
+            self._write(entry)
+
+
+def explain(sql, params, analyze=True):
+    """
+    Runs a statement with EXPLAIN (ANALYZE, BUFFERS), or plans it with EXPLAIN.
+    On PostgreSQL the statement is cancelled after SLOW_QUERY_EXPLAIN_TIMEOUT_MS.
+
+    Returns:
+        PostgreSQL: the JSON plan; DB_BACKEND=duckdb: the text of EXPLAIN [ANALYZE] (no buffer counts)
+    """
+    if Config.DB_BACKEND == 'duckdb':
+        rows, _ = get_embedded_database().execute(f"EXPLAIN {'ANALYZE ' if analyze else ''}{sql}", params)
+        return '\n'.join(row[-1] for row in rows)
+    options = 'ANALYZE, BUFFERS, FORMAT JSON' if analyze else 'FORMAT JSON'
+    conn = get_conn()
+    try:
+        # SET LOCAL only lasts for the transaction
+        conn.autocommit = False
+        with conn.cursor() as cur:
+            cur.execute("SET LOCAL statement_timeout = %s", (Config.SLOW_QUERY_EXPLAIN_TIMEOUT_MS,))
+            cur.execute(f"EXPLAIN ({options}) {sql}", params)
+            plan = cur.fetchone()['QUERY PLAN']
+        conn.rollback()
+        conn.autocommit = True
+    except Exception:
+        release_conn(conn, discard=True)
+        raise
+    release_conn(conn)
+    return plan
+
+
+_slow_query_log = None
+_slow_query_log_lock = threading.Lock()
+
+
+def get_slow_query_log():
+    """
+    Returns the slow-query log of the current process, configured by SLOW_QUERY_MS.
+    An instance inherited through fork is replaced, it would not run its EXPLAIN thread.
+
+    Returns:
+        SlowQueryLog, None when SLOW_QUERY_MS is 0
+    """
+    global _slow_query_log
+    if Config.SLOW_QUERY_MS <= 0:
+        return None
+    log = _slow_query_log
+    if log is not None and log.pid == os.getpid():
+        return log
+    with _slow_query_log_lock:
+        if _slow_query_log is None or _slow_query_log.pid != os.getpid():
+            _slow_query_log = SlowQueryLog(
+                path=Config.SLOW_QUERY_LOG,
+                threshold_ms=Config.SLOW_QUERY_MS,
+                explain_sample=Config.SLOW_QUERY_EXPLAIN_SAMPLE,
+                max_bytes=Config.SLOW_QUERY_LOG_MAX_MB * 1024 * 1024,
+                backups=Config.SLOW_QUERY_LOG_BACKUPS
+            )
+        return _slow_query_log
@@ -0,0 +1,178 @@
+from flask import Blueprint, jsonify, request
+from db import get_data_version, pool_stats
+from db.admission import get_admission_control
+from instrumentation.slow_queries import get_slow_query_log
+from db.singleflight import get_single_flight
+from cache import get_response_cache
+from config import Config
+from snapshot import get_snapshot_engine
+
+admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
+
+
+@admin_bp.route('/pool', methods=['GET'])
+def get_pool_stats():
+    """
+    Get database connection pool statistics
+    ---
+    tags:
+      - Admin
+    summary: Get connection pool utilization of the serving worker
+    description: Returns pool sizes, in-use connections and checkout wait times of the gunicorn worker that handled the request
+    responses:
+      200:
+        examples:
+          application/json:
+            checkouts: 1520
+            discarded: 0
+            idle: 3
+            in_use: 1
+            max_size: 10
+            min_size: 1
+            pid: 4182
+            size: 4
+            timeouts: 0
+            wait_ms_avg: 0.021
+            wait_ms_max: 12.4
+            wait_ms_total: 31.9
+    """
+    return jsonify(pool_stats())
+
+
+@admin_bp.route('/cache', methods=['GET'])
+def get_cache_stats():
+    """
+    Get response cache statistics
+    ---
+    tags:
+      - Admin
+    summary: Get response cache hit ratio of the serving worker
+    description: Returns the cache backend, hit/miss counters and the data version used in cache keys, and with QUERY_BACKEND=snapshot the snapshot engine counters
+    responses:
+      200:
+        examples:
+          application/json:
+            backend: LRUCache
+            data_version: "3"
+            entries: 42
+            hit_ratio: 0.9712
+            hits: 1420
+            misses: 42
+    """
+    stats = get_response_cache().stats()
+    stats['data_version'] = get_data_version().token
+    if Config.QUERY_BACKEND == 'snapshot':
+        stats['snapshot'] = get_snapshot_engine().stats()
+    return jsonify(stats)
+
+
+@admin_bp.route('/coalescing', methods=['GET'])
+def get_coalescing_stats():
+    """
+    Get query coalescing statistics
+    ---
+    tags:
+      - Admin
+    summary: Get single-flight coalescing counters of the serving worker
+    description: Returns how many database executions the worker ran and how many requests shared the result of an identical in-flight query, in the same worker or in another worker of the host
+    responses:
+      200:
+        examples:
+          application/json:
+            coalesced: 318
+            coalesced_across_workers: 96
+            cross_worker: true
+            executions: 204
+            in_flight: 0
+            pid: 4182
+    """
+    single_flight = get_single_flight()
+    if single_flight is None:
+        return jsonify({'enabled': False})
+    return jsonify(single_flight.stats())
+
+
+@admin_bp.route('/admission', methods=['GET'])
+def get_admission_stats():
+    """
+    Get admission control statistics
+    ---
+    tags:
+      - Admin
+    summary: Get per-route admission counters of the serving worker
+    description: Returns, per route, the host-wide concurrency limit, the requests of the worker that ran, waited for a slot or were shed with 503 because the queue was full or the wait timed out, and the average time a route held its slot
+    responses:
+      200:
+        examples:
+          application/json:
+            host_wide: true
+            pid: 4182
+            queue_size: 16
+            queue_timeout: 5.0
+            rejected_queue_full: 3
+            rejected_queue_timeout: 1
+            routes:
+              api.get_aggregate:
+                admitted: 120
+                in_flight: 1
+                max_concurrency: 2
+                queued: 14
+                rejected_queue_full: 3
+                rejected_queue_timeout: 1
+                service_ms_avg: 412.7
+                wait_ms_total: 2210.4
+    """
+    return jsonify(get_admission_control().stats())
+
+
+@admin_bp.route('/slow_queries', methods=['GET'])
+def get_slow_queries():
+    """
+    Get the slowest statement shapes
+    ---
+    tags:
+      - Admin
+    summary: Get the slow-query log aggregated by statement shape
+    description: Reads the slow-query log written by all workers of the host (SLOW_QUERY_LOG) and groups the statements by their normalized shape (literals and placeholder lists collapsed). Shapes are ordered by their total duration and carry the SQL and parameters of their slowest execution and, with SLOW_QUERY_EXPLAIN_SAMPLE, its EXPLAIN (ANALYZE, BUFFERS) plan
+    parameters:
+      - name: limit
+        in: query
+        type: integer
+        default: 20
+        description: Number of shapes to return
+    responses:
+      200:
+        examples:
+          application/json:
+            recorder:
+              explain_sample: 0.1
+              explain_skipped: 0
+              explained: 4
+              path: /tmp/football-api-slow-queries.log
+              pid: 4182
+              recorded: 37
+              threshold_ms: 500
+            shapes:
+              - avg_ms: 812.4
+                count: 21
+                endpoints: [api.get_aggregate]
+                last_seen: "2024-05-02T10:14:03+0000"
+                max_ms: 1530.2
+                plan: null
+                plan_duration_ms: null
+                rows_max: 48211
+                shape: "SELECT * FROM ( SELECT team_id, year, sum(team_cost) AS sum_team_cost FROM team_yearly_stats GROUP BY team_id, year ) AS subquery ORDER BY team_id ASC, year ASC"
+                shape_id: 5f0c2a9e1b7d
+                slowest_params: []
+                slowest_sql: "..."
+                total_ms: 17060.4
+      400:
+        description: Invalid limit
+    """
+    slow_query_log = get_slow_query_log()
+    if slow_query_log is None:
+        return jsonify({'enabled': False})
+    limit = request.args.get('limit', '20')
+    if not limit.isdigit():
+        return jsonify({"error": "limit must be a non-negative integer"}), 400
+    return jsonify({'recorder': slow_query_log.stats(), 'shapes': slow_query_log.worst(int(limit))})
@@ -1,111 +1,420 @@
-from flask import Blueprint, jsonify, request
-from db import get_conn
-from decimal import Decimal
+import hashlib
+import time
+import psycopg2.errors
+import psycopg2.extensions
+from flask import Blueprint, current_app, jsonify, request
+from werkzeug.http import is_resource_modified
+from db import UNKNOWN_VERSION, PoolTimeout, get_conn, get_data_version, release_conn
+from db.admission import Overloaded, get_admission_control, statement_timeout
+from db.embedded import get_embedded_database
+from db.singleflight import get_single_flight
+from cache import get_response_cache
+from config import Config
+from instrumentation import count, phase, profiling
+from instrumentation.slow_queries import get_slow_query_log
+from formats import MEDIA_TYPES, STREAMING_FORMATS, FormatError, negotiate_format, render_response
+from formats.rows import RowEncoder, describe
+from routes.query import QuerySpec, build_query, normalize_query_args, pagination_headers
+from snapshot import get_snapshot_engine
 
 api_bp = Blueprint('api', __name__, url_prefix='/api')
 
 
-def build_query(base_sql, allowed_filters, allowed_sorts, allowed_null_fields):
+def apply_http_caching(response, etag, version):
     """
-    Builds a parameterized SQL query from HTTP request arguments.
-    Supports sorting, pagination (limit/offset), NULL filtering
+    Adds validators and Cache-Control to a successful API response
+    and turns it into a 304 if the request's conditions match.
 
     Args:
-        base_sql:         Base SQL query to wrap
-        allowed_filters:  List of permitted filter columns
-        allowed_sorts:    List of allowed sorting columns
-        allowed_null_fields: Fields allowed for NULL handling
-    
+        response: Flask response with the full body
+        etag:     Precomputed strong ETag, or None to hash the response body
+        version:  DataVersion the response was built from
+
     Returns:
-        tuple: (sql_query, query_params, error_message, http_status)
-               Returns (None, None, error, status) on validation failure
+        The same response, possibly converted to 304 Not Modified
     """
-    filters = []
-    params = []
-    for key in allowed_filters:
-        value = request.args.get(key)
-        if value is not None:
-            filters.append(f"{key} = %s")
-            params.append(value)
-
-    sort_by = request.args.get('sort_by', default=allowed_sorts[0])
-    order = request.args.get('order', default='asc').upper()
-    if sort_by not in allowed_sorts or order not in ['ASC', 'DESC']:
-        return None, None, "Invalid sort parameters", 400
-
-    null_conditions = []
-    exclude_nulls = request.args.get('exclude_nulls', 'false').lower() == 'true'
-    exclude_null_fields = request.args.getlist('exclude_null_fields')
-
-    if allowed_null_fields:
-        invalid_fields = [f for f in exclude_null_fields if f not in allowed_null_fields]
-        if invalid_fields:
-            return None, None, f"Invalid fields for null exclusion: {invalid_fields}", 400
-
-        for field in exclude_null_fields:
-            null_conditions.append(f"{field} IS NOT NULL")
-
-        if exclude_nulls:
-            for field in allowed_null_fields:
-                if field not in exclude_null_fields:
-                    null_conditions.append(f"{field} IS NOT NULL")
-
-    all_conditions = filters + null_conditions
-    where_clause = " AND ".join(all_conditions) if all_conditions else ""
-
-    limit = request.args.get('limit', type=int)
-    offset = request.args.get('offset', type=int)
-
-    sql = f"""
-          SELECT * FROM ({base_sql}) AS subquery
-          {f'WHERE {where_clause}' if where_clause else ''}
-          ORDER BY {sort_by} {order}
-          {f'LIMIT {limit}' if limit else ''}
-          {f'OFFSET {offset}' if offset else ''}
+    response.set_etag(etag or hashlib.sha1(response.get_data()).hexdigest())
+    if version.updated_at is not None:
+        response.last_modified = version.updated_at
+    response.cache_control.public = True
+    response.cache_control.max_age = Config.HTTP_CACHE_MAX_AGE
+    response.cache_control.must_revalidate = True
+    response.vary.add('Accept')
+    return response.make_conditional(request)
+
+
+def stream_query_results(sql, params, fmt, timeout_ms=None):
     """
-    
-    return sql, params, None, None
+    Executes a query through a server-side (named) cursor and streams the rows
+    as they are fetched, in batches of STREAM_BATCH_SIZE rows per FETCH.
+    Only one batch is held in memory at a time, independent of the size of the result.
+
+    The pooled connection is held until the response has been fully sent
+    (or the client disconnected) and is then returned to the pool. The statement
+    is timed for the slow-query log until then, including sending the rows.
+    With DB_BACKEND=duckdb the rows are fetched from the embedded database instead.
+
+    Args:
+        sql:        Final SQL query
+        params:     Query parameters
+        fmt:        'json' for a JSON array, 'ndjson' for one JSON object per line
+        timeout_ms: statement_timeout of this query instead of the connection's, PostgreSQL only
+
+    Returns:
+        Streaming Flask response
+    """
+    # Streams are sent after the request context has ended
+    endpoint = request.endpoint
+    if Config.DB_BACKEND == 'duckdb':
+        started = time.perf_counter()
+        try:
+            with phase('sql'):
+                relation, description = get_embedded_database().stream(sql, params)
+        except Exception as e:
+            _observe_query(sql, params, time.perf_counter() - started, None, e, True, endpoint)
+            raise
+
+        def generate_embedded():
+            fetched, error = [], None
+            try:
+                yield from _encode_rows(_counting(relation.fetchmany, fetched), lambda: description, fmt)
+            except Exception as e:
+                error = e
+                raise
+            finally:
+                _observe_query(sql, params, time.perf_counter() - started, sum(fetched), error, True, endpoint)
+
+        return current_app.response_class(generate_embedded(), mimetype=MEDIA_TYPES[fmt])
+
+    with phase('conn'):
+        conn = get_conn()
+    started = time.perf_counter()
+    try:
+        # Named cursors only exist inside a transaction
+        conn.autocommit = False
+        cur = conn.cursor(name='api_stream', cursor_factory=psycopg2.extensions.cursor)
+        with phase('sql'):
+            _set_statement_timeout(conn, timeout_ms)
+            cur.execute(sql, params)
+    except Exception as e:
+        _end_transaction(conn)
+        _observe_query(sql, params, time.perf_counter() - started, None, e, True, endpoint)
+        raise
+
+    def generate():
+        fetched, error = [], None
+        try:
+            # The description of a named cursor is known after the first fetch
+            yield from _encode_rows(_counting(cur.fetchmany, fetched), lambda: describe(cur.description), fmt)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            cur.close()
+            _end_transaction(conn)
+            _observe_query(sql, params, time.perf_counter() - started, sum(fetched), error, True, endpoint)
+
+    return current_app.response_class(generate(), mimetype=MEDIA_TYPES[fmt])
+
+
+def _counting(fetchmany, fetched):
+    """Wraps fetchmany() to append the size of every fetched batch to `fetched`."""
+    def fetch(size):
+        rows = fetchmany(size)
+        fetched.append(len(rows))
+        return rows
+    return fetch
+
+
+def _encode_rows(fetchmany, description, fmt):
+    """
+    Yields the rows returned by `fetchmany` in batches of STREAM_BATCH_SIZE
+    as chunks of a JSON array or of NDJSON lines.
 
+    Args:
+        fetchmany:   fetchmany() of the executed cursor
+        description: Callable returning the result's ((name, type_code), ...),
+                     called after the first batch was fetched
+        fmt:         'json' or 'ndjson'
+    """
+    separator = b'\n' if fmt == 'ndjson' else b','
+    encoder = None
+    if fmt == 'json':
+        yield b'['
+    while True:
+        rows = fetchmany(Config.STREAM_BATCH_SIZE)
+        if not rows:
+            break
+        first = encoder is None
+        if first:
+            encoder = row_encoder(description())
+        chunk = separator.join(encoder.to_json_lines(rows))
+        if fmt == 'ndjson':
+            yield chunk + b'\n'
+        else:
+            yield chunk if first else b',' + chunk
+    if fmt == 'json':
+        # Same bytes as the buffered body, which shares the ETag of the request
+        yield b']\n'
 
-def handle_get_request(base_sql, allowed_filters, allowed_sorts, allowed_null_fields):
+
+def _set_statement_timeout(conn, timeout_ms):
+    # SET LOCAL lasts until the end of the transaction the connection is in
+    if timeout_ms is not None:
+        with conn.cursor() as cur:
+            cur.execute("SET LOCAL statement_timeout = %s", (timeout_ms,))
+
+
+def _end_transaction(conn):
+    try:
+        conn.rollback()
+        conn.autocommit = True
+    except Exception:
+        release_conn(conn, discard=True)
+    else:
+        release_conn(conn)
+
+
+def handle_get_request(query):
     """
     Executes a parameterized SQL query for GET requests and returns JSON results.
+    Successful responses are stored in the response cache, keyed on the endpoint,
+    the normalized query arguments and the current data version. While the data
+    version is unknown (data_version missing or unreadable) the cache is bypassed,
+    since a data reload could not invalidate such entries.
+
+    While the data version is known, the ETag is derived from the cache key, so
+    conditional requests (If-None-Match / If-Modified-Since) are answered with
+    304 without touching the database. Otherwise the ETag is a hash of the body.
+
+    Identical concurrent queries are executed once and their result is shared,
+    within the worker and across the workers of the host (see db.singleflight).
+    Requests profiled with `?profile=1` bypass the response cache, conditional
+    responses and coalescing, so that their profile covers the query execution.
+
+    The response format (row JSON, column JSON, MessagePack, Arrow) is chosen
+    with the `format` query parameter or the Accept header, see formats.MEDIA_TYPES.
+    With `stream=true` (JSON) or `format=ndjson` the rows are streamed from a
+    server-side cursor instead of being buffered; streamed responses bypass the cache.
+
+    With QUERY_BACKEND=snapshot, buffered responses are computed from the in-memory
+    snapshot of the route's base query (see snapshot.SnapshotEngine) while the data
+    version is known, and from SQL otherwise.
+
+    Pages of limited results carry the continuation token of the next page in the
+    X-Next-Cursor and Link headers; passing it back as `cursor` continues after the
+    last returned row (keyset pagination, not available for streamed responses).
+
+    Database work is subject to admission control (see db.admission): a route runs
+    at most its concurrency limit of queries at once on the host, further requests
+    wait in a bounded queue and are answered with 503 and Retry-After once it is
+    full or the wait times out. Queries are cancelled after the route's statement
+    timeout (STATEMENT_TIMEOUT_MS, ROUTE_LIMITS) and answered with 504.
     
     Args:
-        base_sql: Base SQL query to extend
-        allowed_filters: List of allowed sorting columns
-        allowed_sorts: List of allowed sorting columns
-        allowed_null_fields: Fields allowed for NULL handling
+        query: QuerySpec describing the route's base query;
+               all of its columns can be filtered, sorted and NULL-excluded
     
     Returns:
-        JSON response with data (camelCase keys) or error message
+        Response with data (camelCase keys) in the negotiated format or JSON error message
     """
-    sql, params, error, status = build_query(
-        base_sql=base_sql,
-        allowed_filters=allowed_filters,
-        allowed_sorts=allowed_sorts,
-        allowed_null_fields=allowed_null_fields
-    )
+    with phase('build'):
+        sql, params, error, status = build_query(query, request.args)
     
     if error:
         return jsonify({"error": error}), status
-    
+
     try:
+        fmt = negotiate_format()
+    except FormatError as e:
+        return jsonify({"error": str(e)}), e.status
+
+    streaming = fmt == 'ndjson' or request.args.get('stream', 'false').lower() == 'true'
+    if streaming and fmt not in STREAMING_FORMATS:
+        return jsonify({"error": f"Streaming supports formats: {list(STREAMING_FORMATS)}"}), 400
+
+    query_args = normalize_query_args(query, request.args)
+    version = get_data_version()
+    cache = get_response_cache()
+    cache_key = cache.make_key(
+        version=version.token,
+        endpoint=request.endpoint,
+        params={
+            'query': query.render(),
+            'query_params': query.params,
+            'args': query_args,
+            'format': fmt
+        }
+    )
+
+    # A profiled request runs the query itself, its profile would otherwise show
+    # a cache lookup or the wait for another request's query
+    profiled = profiling()
+
+    etag = None
+    if version != UNKNOWN_VERSION:
+        etag = hashlib.sha1(cache_key.encode()).hexdigest()
+        if not profiled and not is_resource_modified(request.environ, etag=etag, last_modified=version.updated_at):
+            not_modified = current_app.response_class(status=304)
+            return apply_http_caching(not_modified, etag, version)
+
+    admission = get_admission_control()
+    timeout_ms = statement_timeout(request.endpoint)
+
+    if streaming:
+        try:
+            with phase('queue'):
+                ticket = admission.admit(request.endpoint)
+            try:
+                response = stream_query_results(sql, params, fmt, timeout_ms)
+            except Exception:
+                ticket.release()
+                raise
+        except Exception as e:
+            return error_response(e)
+        # The slot is held until the stream has been sent
+        response.call_on_close(ticket.release)
+        if etag is not None:
+            response.set_etag(etag)
+        response.vary.add('Accept')
+        return response
+
+    # Entries of an unknown version could not be invalidated by a data reload
+    cacheable = version != UNKNOWN_VERSION and not profiled
+    cached = None
+    if cacheable:
+        with phase('cache'):
+            cached = cache.get(cache_key)
+    if cached is not None:
+        body, headers = cached
+        response = current_app.response_class(body, mimetype=MEDIA_TYPES[fmt], headers=headers)
+        return apply_http_caching(response, etag, version)
+
+    try:
+        result = None
+        if Config.QUERY_BACKEND == 'snapshot' and version != UNKNOWN_VERSION:
+            with phase('snapshot'):
+                result = get_snapshot_engine().execute(query, request.args, version.token)
+        if result is None:
+            def admitted_query():
+                with phase('queue'):
+                    ticket = admission.admit(request.endpoint)
+                with ticket:
+                    return execute_query(sql, params, timeout_ms)
+
+            single_flight = None if profiled else get_single_flight()
+            if single_flight is None:
+                result = admitted_query()
+            else:
+                # Only the request executing the query takes a slot, coalesced ones wait for its result
+                key = single_flight.make_key(version.token, sql, params)
+                with phase('query'):
+                    result = single_flight.do(key, admitted_query)
+        data, description = result
+        count('rows', len(data))
+        encoder = row_encoder(description)
+        with phase('transform'):
+            mapped_data = encoder.to_dicts(data)
+        headers = pagination_headers(
+            data, encoder.names, query_args, query.key_fields, request.path, request.args
+        )
+        with phase('render'):
+            response = render_response(mapped_data, encoder.columns, fmt)
+        response.headers.update(headers)
+        if cacheable:
+            cache.set(cache_key, response.get_data(), headers)
+        return apply_http_caching(response, etag, version)
+    except FormatError as e:
+        return jsonify({"error": str(e)}), e.status
+    except Exception as e:
+        return error_response(e)
+
+
+def execute_query(sql, params, timeout_ms=None):
+    """
+    Runs a query on a pooled connection, or on the embedded database with DB_BACKEND=duckdb.
+    Statements slower than SLOW_QUERY_MS are recorded, see instrumentation.slow_queries.
+
+    Args:
+        sql:        Final SQL query
+        params:     Query parameters
+        timeout_ms: statement_timeout of this query instead of the connection's, PostgreSQL only
+
+    Returns:
+        tuple: (rows, description), rows are tuples, description holds
+               the (name, type_code) pair of every column, see formats.rows.describe()
+    """
+    if Config.DB_BACKEND == 'duckdb':
+        started = time.perf_counter()
+        rows = error = None
+        try:
+            with phase('sql'):
+                rows, description = get_embedded_database().execute(sql, params)
+            return rows, description
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            _observe_query(sql, params, time.perf_counter() - started, None if rows is None else len(rows), error)
+    with phase('conn'):
         conn = get_conn()
-        with conn.cursor() as cur:
+    started = rows = error = None
+    try:
+        with phase('sql'), conn.cursor(cursor_factory=psycopg2.extensions.cursor) as cur:
+            if timeout_ms is not None:
+                conn.autocommit = False
+                _set_statement_timeout(conn, timeout_ms)
+            started = time.perf_counter()
             cur.execute(sql, params)
-            data = cur.fetchall()
-            mapped_data = transform_db_result_for_api(data)
-        return jsonify(mapped_data)
+            rows = cur.fetchall()
+            return rows, describe(cur.description)
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        error = e
+        raise
     finally:
-        if conn and not conn.closed:
-            conn.close()
+        elapsed = time.perf_counter() - started if started is not None else None
+        if timeout_ms is not None:
+            _end_transaction(conn)
+        else:
+            release_conn(conn)
+        if elapsed is not None:
+            _observe_query(sql, params, elapsed, None if rows is None else len(rows), error)
+
+
+def _observe_query(sql, params, seconds, rows, error=None, streamed=False, endpoint=None):
+    # Failed statements are recorded too: those cancelled by statement_timeout are the slowest
+    slow_query_log = get_slow_query_log()
+    if slow_query_log is not None:
+        slow_query_log.observe(sql, params, seconds, rows, error, streamed, endpoint)
+
+
+def error_response(error):
+    """
+    Maps an exception raised while answering a request to its JSON error response.
+    Shed requests and exhausted connection pools are answered with 503 and
+    Retry-After, queries cancelled by their statement timeout with 504.
+
+    Args:
+        error: Exception
+
+    Returns:
+        tuple: (response, status)
+    """
+    if isinstance(error, Overloaded):
+        response = jsonify({"error": str(error)})
+        response.headers['Retry-After'] = str(error.retry_after)
+        return response, 503
+    if isinstance(error, PoolTimeout):
+        response = jsonify({"error": str(error)})
+        response.headers['Retry-After'] = '1'
+        return response, 503
+    if isinstance(error, psycopg2.errors.QueryCanceled):
+        return jsonify({"error": str(error).strip()}), 504
+    return jsonify({"error": str(error)}), 500
 
 
 # Mapping of snake_case database keys to camelCase JSON response keys.
-# Used in transform_db_result_for_api()
+# Used by row_encoder()
 key_mapping = {
     'national_team_id': 'NationalTeamID',
     'year': 'Year',
@@ -130,29 +439,37 @@ key_mapping = {
     'national_players_count': 'NationalPlayersCount'
 }
 
-def transform_db_result_for_api(data):
+# Encoders of the column layouts seen so far, see row_encoder()
+_row_encoders = {}
+# Upper bound of distinct layouts (e.g. /team_yearly_stats metric selections)
+ROW_ENCODER_CACHE_SIZE = 1024
+
+
+def row_encoder(description):
     """
-    Converts snake_case database keys to camelCase and decimal fields
-    to float for API responses 
-    
+    Returns the RowEncoder of a column layout, created on first use
+    so that every route resolves its camelCase names and converters once.
+
     Args:
-        data: List of database rows (as dicts) with snake_case keys
-        
+        description: ((name, type_code), ...) of the result columns
+
     Returns:
-        List of dicts with camelCase keys according to key_mapping
-        and decimal fields transformed to float
+        RowEncoder converting rows to dicts with keys according to key_mapping
     """
-    camel_data = []
-    for row in data:
-        new_row = {}
-        for key, value in row.items():
-            camel_key = key_mapping.get(key, key)
-            if isinstance(value, Decimal):
-                new_row[camel_key] = float(value)
-            else:
-                new_row[camel_key] = value
-        camel_data.append(new_row)
-    return camel_data
+    encoder = _row_encoders.get(description)
+    if encoder is None:
+        if len(_row_encoders) >= ROW_ENCODER_CACHE_SIZE:
+            _row_encoders.clear()
+        encoder = _row_encoders[description] = RowEncoder(description, key_mapping)
+    return encoder
+
+
+FULL_PLAYERS_COSTS_QUERY = QuerySpec(
+    columns=['national_team_id', 'year', 'total_country_cost'],
+    source='country_yearly_stats',
+    key_fields=['national_team_id', 'year'],
+    where=['in_national_teams']
+)
 
 
 @api_bp.route('/full_players_costs', methods=['GET'])
@@ -204,10 +521,12 @@ def get_full_players_costs():
       - name: limit
         in: query
         type: integer
+        minimum: 0
         description: Maximum results to return
       - name: offset
         in: query
         type: integer
+        minimum: 0
         description: Results offset for pagination
     responses:
       200:
@@ -227,23 +546,15 @@ def get_full_players_costs():
       500:
         description: Internal server error
     """
-    base_query = """
-        SELECT 
-            n.national_team_id,
-            tys.year,
-            SUM(tys.team_cost) AS total_country_cost
-        FROM teams t
-        JOIN team_yearly_stats tys ON t.team_id = tys.team_id
-        JOIN national_teams n ON t.national_team_id = n.national_team_id
-        GROUP BY n.national_team_id, tys.year
-    """
-    
-    return handle_get_request(
-        base_sql=base_query,
-        allowed_filters=['national_team_id', 'year', 'total_country_cost'],
-        allowed_sorts=['national_team_id', 'year', 'total_country_cost'],
-        allowed_null_fields=['national_team_id', 'year', 'total_country_cost']
-    )
+    return handle_get_request(FULL_PLAYERS_COSTS_QUERY)
+
+
+AVERAGE_TEAM_COST_QUERY = QuerySpec(
+    columns=['national_team_id', 'year', 'team_cost'],
+    source='country_yearly_stats',
+    key_fields=['national_team_id', 'year'],
+    where=['in_national_teams']
+)
 
 
 @api_bp.route('/average_team_cost', methods=['GET'])
@@ -295,10 +606,12 @@ def get_average_team_cost():
       - name: limit
         in: query
         type: integer
+        minimum: 0
         description: Maximum number of results
       - name: offset
         in: query
         type: integer
+        minimum: 0
         description: Pagination offset
     responses:
       200:
@@ -318,23 +631,15 @@ def get_average_team_cost():
       500:
         description: Internal server error
     """
-    base_query = """
-        SELECT 
-            n.national_team_id,
-            tys.year,
-            SUM(tys.team_cost) / COUNT(t.team_id) AS team_cost
-        FROM teams t
-        JOIN team_yearly_stats tys ON t.team_id = tys.team_id
-        JOIN national_teams n ON t.national_team_id = n.national_team_id
-        GROUP BY n.national_team_id, tys.year
-    """
+    return handle_get_request(AVERAGE_TEAM_COST_QUERY)
 
-    return handle_get_request(
-        base_sql=base_query,
-        allowed_filters=['national_team_id', 'year', 'team_cost'],
-        allowed_sorts=['national_team_id', 'year', 'team_cost'],
-        allowed_null_fields=['national_team_id', 'year', 'team_cost']
-    )
+
+LEGIONNAIRES_TOTAL_AMOUNT_QUERY = QuerySpec(
+    columns=['national_team_id', 'year', 'total_legionnaires_amount'],
+    source='country_yearly_stats',
+    key_fields=['national_team_id', 'year'],
+    where=['in_national_teams']
+)
 
 
 @api_bp.route('/legionnaires_total_amount', methods=['GET'])
@@ -385,10 +690,12 @@ def get_legionnaires_total_amount():
       - name: limit
         in: query
         type: integer
+        minimum: 0
         description: Maximum results to return
       - name: offset
         in: query
         type: integer
+        minimum: 0
         description: Pagination offset
     responses:
       200:
@@ -408,23 +715,16 @@ def get_legionnaires_total_amount():
       500:
         description: Internal server error
     """
-    base_query =    """
-        SELECT 
-            n.national_team_id,
-            tys.year,
-            SUM(tys.legionnaires) AS total_legionnaires_amount
-        FROM teams t
-        JOIN team_yearly_stats tys ON t.team_id = tys.team_id
-        JOIN national_teams n ON t.national_team_id = n.national_team_id
-        GROUP BY n.national_team_id, tys.year
-    """
+    return handle_get_request(LEGIONNAIRES_TOTAL_AMOUNT_QUERY)
 
-    return handle_get_request(
-        base_sql=base_query,
-        allowed_filters=['national_team_id', 'year', 'total_legionnaires_amount'],
-        allowed_sorts=['national_team_id', 'year', 'total_legionnaires_amount'],
-        allowed_null_fields=['national_team_id', 'year', 'total_legionnaires_amount']
-    )
+
+TOTAL_AVERAGE_AGE_QUERY = QuerySpec(
+    columns=['national_team_id', 'year', 'average_age_among_clubs'],
+    source='country_yearly_stats',
+    key_fields=['national_team_id', 'year'],
+    where=['in_national_teams'],
+    floats=['average_age_among_clubs']
+)
 
 
 @api_bp.route('/total_average_age' ,methods=['GET'])
@@ -476,10 +776,12 @@ def get_total_average_age():
       - name: limit
         in: query
         type: integer
+        minimum: 0
         description: Maximum number of results
       - name: offset
         in: query
         type: integer
+        minimum: 0
         description: Pagination offset
     responses:
       200:
@@ -499,23 +801,15 @@ def get_total_average_age():
       500:
         description: Internal server error
     """
-    base_query =    """
-        SELECT 
-            n.national_team_id,
-            tys.year,
-            SUM(tys.average_age) / COUNT(tys.average_age) AS average_age_among_clubs
-        FROM teams t
-        JOIN team_yearly_stats tys ON t.team_id = tys.team_id
-        JOIN national_teams n ON t.national_team_id = n.national_team_id
-        GROUP BY n.national_team_id, tys.year
-    """
+    return handle_get_request(TOTAL_AVERAGE_AGE_QUERY)
 
-    return handle_get_request(
-        base_sql=base_query,
-        allowed_filters=['national_team_id', 'year', 'average_age_among_clubs'],
-        allowed_sorts=['national_team_id', 'year', 'average_age_among_clubs'],
-        allowed_null_fields=['national_team_id', 'year', 'average_age_among_clubs']
-    )
+
+AVERAGE_POINTS_PER_TEAM_QUERY = QuerySpec(
+    columns=['team_id', 'year', 'average_points'],
+    source='team_yearly_stats',
+    key_fields=['team_id', 'year'],
+    floats=['average_points']
+)
 
 
 @api_bp.route('/average_points_per_team', methods=['GET'])
@@ -567,10 +861,12 @@ def get_average_points_per_team():
       - name: limit
         in: query
         type: integer
+        minimum: 0
         description: Maximum number of results
       - name: offset
         in: query
         type: integer
+        minimum: 0
         description: Pagination offset
     responses:
       200:
@@ -590,20 +886,14 @@ def get_average_points_per_team():
       500:
         description: Internal server error
     """
-    base_query = """
-        SELECT 
-            team_id,
-            year,
-            average_points
-        FROM team_yearly_stats
-    """
-    
-    return handle_get_request(
-        base_sql=base_query,
-        allowed_filters=['team_id', 'year', 'average_points'],
-        allowed_sorts=['team_id', 'year', 'average_points'],
-        allowed_null_fields=['team_id', 'year', 'average_points']
-    )
+    return handle_get_request(AVERAGE_POINTS_PER_TEAM_QUERY)
+
+
+CLUB_TITLES_QUERY = QuerySpec(
+    columns=['team_id', 'year', 'number_of_titles_this_year'],
+    source='team_yearly_stats',
+    key_fields=['team_id', 'year']
+)
 
 
 @api_bp.route('/club_titles', methods=['GET'])
@@ -654,10 +944,12 @@ def get_club_titles():
       - name: limit
         in: query
         type: integer
+        minimum: 0
         description: Results limit
       - name: offset
         in: query
         type: integer
+        minimum: 0
         description: Pagination offset
     responses:
       200:
@@ -677,20 +969,14 @@ def get_club_titles():
       500:
         description: Internal server error
     """
-    base_query = """
-        SELECT 
-            team_id,
-            year,
-            number_of_titles_this_year
-        FROM team_yearly_stats
-    """
-    
-    return handle_get_request(
-        base_sql=base_query,
-        allowed_filters=['team_id', 'year', 'number_of_titles_this_year'],
-        allowed_sorts=['team_id', 'year', 'number_of_titles_this_year'],
-        allowed_null_fields=['team_id', 'year', 'number_of_titles_this_year']
-    )
+    return handle_get_request(CLUB_TITLES_QUERY)
+
+
+CLUBS_AND_NATIONAL_PLAYERS_QUERY = QuerySpec(
+    columns=['team_id', 'year', 'players_in_national_team'],
+    source='team_yearly_stats',
+    key_fields=['team_id', 'year']
+)
 
 
 @api_bp.route('/clubs_and_national_players', methods=['GET'])
@@ -741,10 +1027,12 @@ def get_clubs_and_national_players():
       - name: limit
         in: query
         type: integer
+        minimum: 0
         description: Maximum results to return
       - name: offset
         in: query
         type: integer
+        minimum: 0
         description: Pagination offset
     responses:
       200:
@@ -764,20 +1052,14 @@ def get_clubs_and_national_players():
       500:
         description: Internal server error
     """
-    base_query = """
-        SELECT 
-            team_id,
-            year,
-            players_in_national_team
-        FROM team_yearly_stats
-    """
-    
-    return handle_get_request(
-        base_sql=base_query,
-        allowed_filters=['team_id', 'year', 'players_in_national_team'],
-        allowed_sorts=['team_id', 'year', 'players_in_national_team'],
-        allowed_null_fields=['team_id', 'year', 'players_in_national_team']
-    )
+    return handle_get_request(CLUBS_AND_NATIONAL_PLAYERS_QUERY)
+
+
+TOTAL_TEAM_COST_QUERY = QuerySpec(
+    columns=['team_id', 'year', 'team_cost'],
+    source='team_yearly_stats',
+    key_fields=['team_id', 'year']
+)
 
 
 @api_bp.route('/total_team_cost', methods=['GET'])
@@ -829,10 +1111,12 @@ def get_total_team_cost():
       - name: limit
         in: query
         type: integer
+        minimum: 0
         description: Maximum results to return
       - name: offset
         in: query
         type: integer
+        minimum: 0
         description: Pagination offset
     responses:
       200:
@@ -852,20 +1136,14 @@ def get_total_team_cost():
       500:
         description: Internal server error
     """
-    base_query = """
-        SELECT 
-            team_id,
-            year,
-            team_cost
-        FROM team_yearly_stats
-    """
-    
-    return handle_get_request(
-        base_sql=base_query,
-        allowed_filters=['team_id', 'year', 'team_cost'],
-        allowed_sorts=['team_id', 'year', 'team_cost'],
-        allowed_null_fields=['team_id', 'year', 'team_cost']
-    )
+    return handle_get_request(TOTAL_TEAM_COST_QUERY)
+
+
+TRANSFER_BALANCE_QUERY = QuerySpec(
+    columns=['team_id', 'year', 'transfer_balance'],
+    source='team_yearly_stats',
+    key_fields=['team_id', 'year']
+)
 
 
 @api_bp.route('/transfer_balance', methods=['GET'])
@@ -917,10 +1195,12 @@ def get_transfer_balance():
       - name: limit
         in: query
         type: integer
+        minimum: 0
         description: Maximum results to return
       - name: offset
         in: query
         type: integer
+        minimum: 0
         description: Pagination offset
     responses:
       200:
@@ -940,20 +1220,14 @@ def get_transfer_balance():
       500:
         description: Internal server error
     """
-    base_query = """
-        SELECT 
-            team_id,
-            year,
-            transfer_balance
-        FROM team_yearly_stats
-    """
-    
-    return handle_get_request(
-        base_sql=base_query,
-        allowed_filters=['team_id', 'year', 'transfer_balance'],
-        allowed_sorts=['team_id', 'year', 'transfer_balance'],
-        allowed_null_fields=['team_id', 'year', 'transfer_balance']
-    )
+    return handle_get_request(TRANSFER_BALANCE_QUERY)
+
+
+LEGIONNAIRES_PER_TEAM_QUERY = QuerySpec(
+    columns=['team_id', 'year', ('legioners', 'legionnaires')],
+    source='team_yearly_stats',
+    key_fields=['team_id', 'year']
+)
 
 
 @api_bp.route('/legionnaires_per_team', methods=['GET'])
@@ -1004,10 +1278,12 @@ def get_legionnaires_per_team():
       - name: limit
         in: query
         type: integer
+        minimum: 0
         description: Maximum results to return
       - name: offset
         in: query
         type: integer
+        minimum: 0
         description: Pagination offset
     responses:
       200:
@@ -1027,20 +1303,15 @@ def get_legionnaires_per_team():
       500:
         description: Internal server error
     """
-    base_query = """
-        SELECT 
-            team_id,
-            year,
-            legionnaires AS legioners
-        FROM team_yearly_stats
-    """
-    
-    return handle_get_request(
-        base_sql=base_query,
-        allowed_filters=['team_id', 'year', 'legioners'],
-        allowed_sorts=['team_id', 'year', 'legioners'],
-        allowed_null_fields=['team_id', 'year', 'legioners']
-    )
+    return handle_get_request(LEGIONNAIRES_PER_TEAM_QUERY)
+
+
+AVERAGE_AGE_PER_TEAM_QUERY = QuerySpec(
+    columns=['team_id', 'year', 'average_age'],
+    source='team_yearly_stats',
+    key_fields=['team_id', 'year'],
+    floats=['average_age']
+)
 
 
 @api_bp.route('/average_age_per_team', methods=['GET'])
@@ -1092,10 +1363,12 @@ def get_average_age_per_team():
       - name: limit
         in: query
         type: integer
+        minimum: 0
         description: Maximum results to return
       - name: offset
         in: query
         type: integer
+        minimum: 0
         description: Pagination offset
     responses:
       200:
@@ -1115,20 +1388,15 @@ def get_average_age_per_team():
       500:
         description: Internal server error
     """
-    base_query = """
-        SELECT 
-            team_id,
-            year,
-            average_age
-        FROM team_yearly_stats
-    """
-    
-    return handle_get_request(
-        base_sql=base_query,
-        allowed_filters=['team_id', 'year', 'average_age'],
-        allowed_sorts=['team_id', 'year', 'average_age'],
-        allowed_null_fields=['team_id', 'year', 'average_age']
-    )
+    return handle_get_request(AVERAGE_AGE_PER_TEAM_QUERY)
+
+
+TEAM_SIZE_RATIO_QUERY = QuerySpec(
+    columns=['team_id', 'year', 'team_size_ratio'],
+    source='team_yearly_stats',
+    key_fields=['team_id', 'year'],
+    floats=['team_size_ratio']
+)
 
 
 @api_bp.route('/team_size_ratio', methods=['GET'])
@@ -1180,10 +1448,12 @@ def get_team_size_ratio():
       - name: limit
         in: query
         type: integer
+        minimum: 0
         description: Maximum results to return
       - name: offset
         in: query
         type: integer
+        minimum: 0
         description: Pagination offset
     responses:
       200:
@@ -1203,20 +1473,464 @@ def get_team_size_ratio():
       500:
         description: Internal server error
     """
-    base_query = """
-        SELECT 
-            team_id,
-            year,
-            team_size_ratio
-        FROM team_yearly_stats
+    return handle_get_request(TEAM_SIZE_RATIO_QUERY)
+
+
+# Per-club yearly metrics served by /team_yearly_stats.
+# Maps the API metric name to its QuerySpec column over team_yearly_stats,
+# names match the fields returned by the single-metric endpoints.
+TEAM_YEARLY_METRICS = {
+    'average_points': 'average_points',
+    'number_of_titles_this_year': 'number_of_titles_this_year',
+    'players_in_national_team': 'players_in_national_team',
+    'team_cost': 'team_cost',
+    'transfer_balance': 'transfer_balance',
+    'legioners': ('legioners', 'legionnaires'),
+    'average_age': 'average_age',
+    'team_size_ratio': 'team_size_ratio',
+}
+
+# DECIMAL columns of team_yearly_stats, returned as floats
+TEAM_YEARLY_FLOAT_METRICS = ['average_points', 'average_age', 'team_size_ratio']
+
+
+def selected_metrics(args):
+    """
+    Parses `metrics` (repeated or comma-separated; all metrics when omitted).
+
+    Args:
+        args: Request arguments (werkzeug MultiDict)
+
+    Returns:
+        tuple: (metrics in TEAM_YEARLY_METRICS order, error_message), metrics is None on error
+    """
+    requested = [
+        metric.strip()
+        for value in args.getlist('metrics')
+        for metric in value.split(',')
+        if metric.strip()
+    ]
+    invalid_metrics = [m for m in requested if m not in TEAM_YEARLY_METRICS]
+    if invalid_metrics:
+        return None, f"Invalid metrics: {invalid_metrics}"
+    return [m for m in TEAM_YEARLY_METRICS if not requested or m in requested], None
+
+
+def team_yearly_stats_query(args):
     """
-    
-    return handle_get_request(
-        base_sql=base_query,
-        allowed_filters=['team_id', 'year', 'team_size_ratio'],
-        allowed_sorts=['team_id', 'year', 'team_size_ratio'],
-        allowed_null_fields=['team_id', 'year', 'team_size_ratio']
+    Builds the query of /team_yearly_stats for the metrics selected with
+    `metrics`, see selected_metrics().
+
+    Args:
+        args: Request arguments (werkzeug MultiDict)
+
+    Returns:
+        tuple: (query_spec, error_message), query_spec is None on error
+    """
+    metrics, error = selected_metrics(args)
+    if error:
+        return None, error
+    query = QuerySpec(
+        columns=['team_id', 'year'] + [TEAM_YEARLY_METRICS[m] for m in metrics],
+        source='team_yearly_stats',
+        key_fields=['team_id', 'year'],
+        floats=[m for m in metrics if m in TEAM_YEARLY_FLOAT_METRICS]
+    )
+    return query, None
+
+
+@api_bp.route('/team_yearly_stats', methods=['GET'])
+def get_team_yearly_stats():
+    """
+    Get multiple yearly metrics per team
+    ---
+    tags:
+      - Statistics
+    summary: Get several per-team yearly metrics in one response
+    description: Returns one row per team and year with all requested metrics. Filters, sorting and null exclusion accept team_id, year and any requested metric
+    parameters:
+      - name: metrics
+        in: query
+        type: array
+        items:
+          type: string
+          enum: [average_points, number_of_titles_this_year, players_in_national_team, team_cost, transfer_balance, legioners, average_age, team_size_ratio]
+        collectionFormat: csv
+        description: Metrics to include (comma separated or repeated). All metrics are returned when omitted
+      - name: team_id
+        in: query
+        type: integer
+        description: Filter by team ID
+      - name: year
+        in: query
+        type: integer
+        description: Filter by year
+      - name: sort_by
+        in: query
+        type: string
+        default: team_id
+        description: Field to sort results (team_id, year or a requested metric)
+      - name: order
+        in: query
+        type: string
+        enum: [asc, desc]
+        default: asc
+        description: Sorting direction
+      - name: exclude_nulls
+        in: query
+        type: boolean
+        default: false
+        description: Exclude records with null values in any returned field
+      - name: exclude_null_fields
+        in: query
+        type: string
+        collectionFormat: multi
+        description: Specific fields to exclude nulls for (team_id, year or a requested metric)
+      - name: limit
+        in: query
+        type: integer
+        minimum: 0
+        description: Maximum number of results
+      - name: offset
+        in: query
+        type: integer
+        minimum: 0
+        description: Pagination offset
+    responses:
+      200:
+        examples:
+          application/json:
+            - AverageAge: 25.9
+              AveragePoints: 1.24
+              Legioners: 11
+              TeamCost: 23450000
+              TeamID: 3
+              Year: 2014
+      400:
+        description: Invalid request parameters
+        schema:
+          type: object
+          properties:
+            error:
+              type: string
+              example: "Invalid metrics: ['invalid_metric']"
+      500:
+        description: Internal server error
+    """
+    query, error = team_yearly_stats_query(request.args)
+    if error:
+        return jsonify({"error": error}), 400
+    return handle_get_request(query)
+
+
+def country_clubs_query(national_team_id, args):
+    """
+    Builds the query of /country/<national_team_id>/clubs: the yearly metrics
+    selected with `metrics` (see selected_metrics()) of the clubs of one country.
+    The country is matched through the teams.national_team_id index and the
+    metrics are joined on the (team_id, year) primary key of team_yearly_stats.
+
+    Args:
+        national_team_id: ID of the country's national team
+        args:             Request arguments (werkzeug MultiDict)
+
+    Returns:
+        tuple: (query_spec, error_message), query_spec is None on error
+    """
+    metrics, error = selected_metrics(args)
+    if error:
+        return None, error
+    columns = [('team_id', 't.team_id'), ('team_name', 't.team_name'), ('year', 'tys.year')]
+    for metric in metrics:
+        column = TEAM_YEARLY_METRICS[metric]
+        name, expression = column if isinstance(column, tuple) else (column, column)
+        columns.append((name, f'tys.{expression}'))
+    query = QuerySpec(
+        columns=columns,
+        source='teams t JOIN team_yearly_stats tys ON tys.team_id = t.team_id',
+        where=['t.national_team_id = %s'],
+        params=[national_team_id],
+        key_fields=['team_id', 'year'],
+        floats=[m for m in metrics if m in TEAM_YEARLY_FLOAT_METRICS]
     )
+    return query, None
+
+
+@api_bp.route('/country/<int:national_team_id>/clubs', methods=['GET'])
+def get_country_clubs(national_team_id):
+    """
+    Get yearly metrics of the clubs of a country
+    ---
+    tags:
+      - Statistics
+    summary: Get the clubs of one country with their yearly metrics
+    description: Returns one row per club of the country and year, with the club name and the requested metrics. Used by the map when a country is selected, instead of downloading a whole per-team table
+    parameters:
+      - name: national_team_id
+        in: path
+        type: integer
+        required: true
+        description: National team ID of the country
+      - name: year
+        in: query
+        type: integer
+        description: Filter by year
+      - name: metrics
+        in: query
+        type: array
+        items:
+          type: string
+          enum: [average_points, number_of_titles_this_year, players_in_national_team, team_cost, transfer_balance, legioners, average_age, team_size_ratio]
+        collectionFormat: csv
+        description: Metrics to include (comma separated or repeated). All metrics are returned when omitted
+      - name: team_id
+        in: query
+        type: integer
+        description: Filter by team ID
+      - name: sort_by
+        in: query
+        type: string
+        default: team_id
+        description: Field to sort results (team_id, team_name, year or a requested metric)
+      - name: order
+        in: query
+        type: string
+        enum: [asc, desc]
+        default: asc
+        description: Sorting direction
+      - name: exclude_nulls
+        in: query
+        type: boolean
+        default: false
+        description: Exclude records with null values in any returned field
+      - name: exclude_null_fields
+        in: query
+        type: string
+        collectionFormat: multi
+        description: Specific fields to exclude nulls for
+      - name: limit
+        in: query
+        type: integer
+        minimum: 0
+        description: Maximum number of results
+      - name: offset
+        in: query
+        type: integer
+        minimum: 0
+        description: Pagination offset
+    responses:
+      200:
+        examples:
+          application/json:
+            - TeamCost: 23450000
+              TeamID: 3
+              TeamName: "1.FC Köln"
+              Year: 2020
+      400:
+        description: Invalid request parameters
+        schema:
+          type: object
+          properties:
+            error:
+              type: string
+              example: "Invalid metrics: ['invalid_metric']"
+      500:
+        description: Internal server error
+    """
+    query, error = country_clubs_query(national_team_id, request.args)
+    if error:
+        return jsonify({"error": error}), 400
+    return handle_get_request(query)
+
+
+# Dimensions of the aggregate_cube materialized view, in the order of its
+# GROUPING() bitmask (json_to_postgresql/derived_tables.sql)
+AGGREGATE_DIMENSIONS = ['national_team_id', 'team_id', 'year']
+
+# Dimension combinations precomputed in aggregate_cube
+AGGREGATE_GROUPINGS = [
+    ('national_team_id', 'year'),
+    ('national_team_id',),
+    ('year',),
+    ('team_id', 'year'),
+    (),
+]
+
+# team_yearly_stats columns that can be aggregated
+AGGREGATE_MEASURES = [
+    'team_cost', 'legionnaires', 'average_age', 'players_in_national_team',
+    'average_points', 'number_of_titles_this_year', 'team_size_ratio', 'transfer_balance',
+]
+
+# Aggregate functions and their expressions over the cube's stored partial aggregates;
+# avg is computed over non-NULL values
+AGGREGATE_FUNCTIONS = {
+    'sum': 'sum_{measure}',
+    'avg': 'sum_{measure}::numeric / NULLIF(count_{measure}, 0)',
+    'min': 'min_{measure}',
+    'max': 'max_{measure}',
+    'count': 'count_{measure}',
+}
+
+key_mapping.update({
+    f'{function}_{measure}': function.capitalize() + ''.join(part.capitalize() for part in measure.split('_'))
+    for function in AGGREGATE_FUNCTIONS
+    for measure in AGGREGATE_MEASURES
+})
+
+
+def aggregate_query(args):
+    """
+    Builds the query of /aggregate from `group_by` (dimensions) and
+    `agg` (function:measure pairs), both comma-separated or repeated.
+
+    Args:
+        args: Request arguments (werkzeug MultiDict)
+
+    Returns:
+        tuple: (query_spec, error_message), query_spec is None on error
+    """
+    def split(name):
+        return [item.strip() for value in args.getlist(name) for item in value.split(',') if item.strip()]
+
+    group_by = split('group_by')
+    invalid_dimensions = [d for d in group_by if d not in AGGREGATE_DIMENSIONS]
+    if invalid_dimensions:
+        return None, f"Invalid group_by: {invalid_dimensions}. Allowed: {AGGREGATE_DIMENSIONS}"
+    if set(group_by) not in [set(grouping) for grouping in AGGREGATE_GROUPINGS]:
+        available = [','.join(grouping) for grouping in AGGREGATE_GROUPINGS]
+        return None, f"Unsupported group_by combination: {group_by}. Available: {available}"
+
+    aggregates = []
+    for item in split('agg'):
+        function, _, measure = item.partition(':')
+        if function not in AGGREGATE_FUNCTIONS or measure not in AGGREGATE_MEASURES:
+            return None, (
+                f"Invalid aggregate: {item}. Expected <function>:<measure> with function in "
+                f"{list(AGGREGATE_FUNCTIONS)} and measure in {AGGREGATE_MEASURES}"
+            )
+        if (function, measure) not in aggregates:
+            aggregates.append((function, measure))
+    if not aggregates:
+        return None, "At least one aggregate is required, e.g. agg=sum:team_cost"
+
+    dimensions = [d for d in AGGREGATE_DIMENSIONS if d in group_by]
+    rolled_up = sum(1 << i for i, d in enumerate(reversed(AGGREGATE_DIMENSIONS)) if d not in group_by)
+    query = QuerySpec(
+        columns=dimensions + [
+            (f'{function}_{measure}', AGGREGATE_FUNCTIONS[function].format(measure=measure))
+            for function, measure in aggregates
+        ],
+        source='aggregate_cube',
+        where=['grouping_set = %s'],
+        params=[rolled_up],
+        key_fields=dimensions,
+        floats=[
+            f'{function}_{measure}' for function, measure in aggregates
+            if function == 'avg' or (function != 'count' and measure in TEAM_YEARLY_FLOAT_METRICS)
+        ]
+    )
+    return query, None
+
+
+@api_bp.route('/aggregate', methods=['GET'])
+def get_aggregate():
+    """
+    Get aggregated team statistics
+    ---
+    tags:
+      - Statistics
+    summary: Aggregate per-team yearly metrics by country, club and year
+    description: Returns the requested aggregates of team_yearly_stats grouped by the requested dimensions. Results are read from the precomputed aggregate_cube rollup. Filters, sorting and null exclusion accept the grouping dimensions and the returned aggregates (e.g. sum_team_cost)
+    parameters:
+      - name: group_by
+        in: query
+        type: array
+        items:
+          type: string
+          enum: [national_team_id, team_id, year]
+        collectionFormat: csv
+        description: "Grouping dimensions, one of: national_team_id,year; national_team_id; year; team_id,year. The grand total is returned when omitted"
+      - name: agg
+        in: query
+        type: array
+        required: true
+        items:
+          type: string
+        collectionFormat: csv
+        description: "Aggregates as function:measure, function in sum, avg, min, max, count and measure in team_cost, legionnaires, average_age, players_in_national_team, average_points, number_of_titles_this_year, team_size_ratio, transfer_balance"
+      - name: national_team_id
+        in: query
+        type: integer
+        description: Filter by national team ID
+      - name: team_id
+        in: query
+        type: integer
+        description: Filter by team ID
+      - name: year
+        in: query
+        type: integer
+        description: Filter by year
+      - name: sort_by
+        in: query
+        type: string
+        description: Field to sort results (a grouping dimension or a returned aggregate), defaults to the first returned field
+      - name: order
+        in: query
+        type: string
+        enum: [asc, desc]
+        default: asc
+        description: Sorting direction
+      - name: exclude_nulls
+        in: query
+        type: boolean
+        default: false
+        description: Exclude records with null values in any returned field
+      - name: exclude_null_fields
+        in: query
+        type: string
+        collectionFormat: multi
+        description: Specific fields to exclude nulls for
+      - name: limit
+        in: query
+        type: integer
+        minimum: 0
+        description: Maximum number of results
+      - name: offset
+        in: query
+        type: integer
+        minimum: 0
+        description: Pagination offset
+    responses:
+      200:
+        examples:
+          application/json:
+            - AvgAverageAge: 26.35
+              NationalTeamID: 3262
+              SumTeamCost: 812450000
+              Year: 2020
+      400:
+        description: Invalid request parameters
+        schema:
+          type: object
+          properties:
+            error:
+              type: string
+              example: "Unsupported group_by combination: ['team_id']. Available: ['national_team_id,year', 'national_team_id', 'year', 'team_id,year', '']"
+      500:
+        description: Internal server error
+    """
+    query, error = aggregate_query(request.args)
+    if error:
+        return jsonify({"error": error}), 400
+    return handle_get_request(query)
+
+
+CLUB_INFO_QUERY = QuerySpec(
+    columns=['team_id', 'team_name', 'number_of_cups', 'national_team_id', 'image_link'],
+    source='teams',
+    key_fields=['team_id']
+)
 
 
 @api_bp.route('/club_info', methods=['GET'])
@@ -1275,10 +1989,12 @@ def get_club_info():
       - name: limit
         in: query
         type: integer
+        minimum: 0
         description: Maximum results to return
       - name: offset
         in: query
         type: integer
+        minimum: 0
         description: Pagination offset
     responses:
       200:
@@ -1300,21 +2016,22 @@ def get_club_info():
       500:
         description: Internal server error
     """
-    base_query = """
-        SELECT 
-            team_id,
-            team_name,
-            number_of_cups,
-            national_team_id,
-            image_link
-        FROM teams
-    """
-    return handle_get_request(
-        base_sql=base_query,
-        allowed_filters=['team_id', 'team_name', 'number_of_cups', 'national_team_id', 'image_link'],
-        allowed_sorts=['team_id', 'team_name', 'number_of_cups', 'national_team_id', 'image_link'],
-        allowed_null_fields=['team_id', 'team_name', 'number_of_cups', 'national_team_id', 'image_link']
-    )
+    return handle_get_request(CLUB_INFO_QUERY)
+
+
+COUNTRY_INFO_QUERY = QuerySpec(
+    columns=[
+        ('national_team_id', 'nt.national_team_id'),
+        ('national_team_name', 'nt.national_team_name'),
+        ('club_ids', 'ARRAY_AGG(t.team_id)'),
+    ],
+    source=(
+        'national_teams nt '
+        'LEFT JOIN teams t ON nt.national_team_id = t.national_team_id'
+    ),
+    group_by=['national_team_id', 'national_team_name'],
+    key_fields=['national_team_id']
+)
 
 
 @api_bp.route('/country_info', methods=['GET'])
@@ -1368,10 +2085,12 @@ def get_country_info():
       - name: limit
         in: query
         type: integer
+        minimum: 0
         description: Maximum results to return
       - name: offset
         in: query
         type: integer
+        minimum: 0
         description: Pagination offset
     responses:
       200:
@@ -1391,22 +2110,14 @@ def get_country_info():
       500:
         description: Internal server error
     """
-    base_query = """
-        SELECT 
-            nt.national_team_id,
-            nt.national_team_name,
-            ARRAY_AGG(t.team_id) AS "club_ids"
-        FROM national_teams nt
-        LEFT JOIN teams t ON nt.national_team_id = t.national_team_id
-        GROUP BY nt.national_team_id, nt.national_team_name
-    """
-    
-    return handle_get_request(
-        base_sql=base_query,
-        allowed_filters=['national_team_id', 'national_team_name', 'club_ids'],
-        allowed_sorts=['national_team_id', 'national_team_name', 'club_ids'],
-        allowed_null_fields=['national_team_id', 'national_team_name', 'club_ids'],
-    )
+    return handle_get_request(COUNTRY_INFO_QUERY)
+
+
+NATIONAL_TEAMS_PLAYERS_TOTAL_AMOUNT_QUERY = QuerySpec(
+    columns=['national_team_id', 'year', 'national_players_count'],
+    source='country_yearly_stats',
+    key_fields=['national_team_id', 'year']
+)
 
 
 @api_bp.route('/national_teams_players_total_amount', methods=['GET'])
@@ -1457,10 +2168,12 @@ def get_national_teams_players_total_amount():
       - name: limit
         in: query
         type: integer
+        minimum: 0
         description: Maximum results to return
       - name: offset
         in: query
         type: integer
+        minimum: 0
         description: Pagination offset
     responses:
       200:
@@ -1480,20 +2193,33 @@ def get_national_teams_players_total_amount():
       500:
         description: Internal server error
     """
-    base_query = """
-        SELECT 
-            t.national_team_id,
-            tys.year,
-            SUM(tys.players_in_national_team) AS national_players_count
-        FROM teams t
-        JOIN team_yearly_stats tys ON t.team_id = tys.team_id
-        WHERE t.national_team_id IS NOT NULL
-        GROUP BY t.national_team_id, tys.year
-    """
-    
-    return handle_get_request(
-        base_sql=base_query,
-        allowed_filters=['national_team_id', 'year', 'national_players_count'],
-        allowed_sorts=['national_team_id', 'year', 'national_players_count'],
-        allowed_null_fields=['national_team_id', 'year', 'national_players_count']
-    )
+    return handle_get_request(NATIONAL_TEAMS_PLAYERS_TOTAL_AMOUNT_QUERY)
+
+
+# Static base query of every route with a fixed column set, keyed by URL rule.
+# Used by tooling that needs the routes' SQL without handling a request.
+QUERY_ROUTES = {
+    '/full_players_costs': FULL_PLAYERS_COSTS_QUERY,
+    '/average_team_cost': AVERAGE_TEAM_COST_QUERY,
+    '/legionnaires_total_amount': LEGIONNAIRES_TOTAL_AMOUNT_QUERY,
+    '/total_average_age': TOTAL_AVERAGE_AGE_QUERY,
+    '/average_points_per_team': AVERAGE_POINTS_PER_TEAM_QUERY,
+    '/club_titles': CLUB_TITLES_QUERY,
+    '/clubs_and_national_players': CLUBS_AND_NATIONAL_PLAYERS_QUERY,
+    '/total_team_cost': TOTAL_TEAM_COST_QUERY,
+    '/transfer_balance': TRANSFER_BALANCE_QUERY,
+    '/legionnaires_per_team': LEGIONNAIRES_PER_TEAM_QUERY,
+    '/average_age_per_team': AVERAGE_AGE_PER_TEAM_QUERY,
+    '/team_size_ratio': TEAM_SIZE_RATIO_QUERY,
+    '/club_info': CLUB_INFO_QUERY,
+    '/country_info': COUNTRY_INFO_QUERY,
+    '/national_teams_players_total_amount': NATIONAL_TEAMS_PLAYERS_TOTAL_AMOUNT_QUERY,
+}
+
+
+# Routes whose query depends on request arguments, mapped to the function
+# building it, see team_yearly_stats_query()
+DYNAMIC_QUERY_ROUTES = {
+    '/team_yearly_stats': team_yearly_stats_query,
+    '/aggregate': aggregate_query,
+}
@@ -0,0 +1,306 @@
+import base64
+import binascii
+import json
+from decimal import Decimal
+from urllib.parse import urlencode
+
+
+class QuerySpec:
+    """
+    Structured description of the base query behind an API route.
+
+    Knowing which output columns are plain (grouping) columns lets build_query()
+    inject filters and NULL exclusion on them into the inner WHERE clause, before
+    any aggregation, where they can use indexes. Filters on aggregated columns
+    are applied to the aggregated result.
+
+    Args:
+        columns:    Output columns in order; a column is either a name selected as is
+                    or a (name, sql_expression) pair
+        source:     FROM clause (table or joined tables)
+        key_fields: Output columns uniquely identifying a row (sorting tie-breaker
+                    and keyset pagination)
+        where:      Fixed conditions applied before aggregation
+        group_by:   Output columns to group by; all other columns are aggregates
+        params:     Parameters of placeholders used in `where`
+        floats:     NUMERIC output columns returned as double precision, so that
+                    their values arrive as floats instead of Decimals
+    """
+
+    def __init__(self, columns, source, key_fields, where=None, group_by=None, params=None, floats=None):
+        self.expressions = {}
+        for column in columns:
+            name, expression = column if isinstance(column, tuple) else (column, column)
+            self.expressions[name] = expression
+        self.source = source
+        self.key_fields = key_fields
+        self.where = where or []
+        self.group_by = group_by or []
+        self.params = params or []
+        self.floats = floats or []
+
+    @property
+    def fields(self):
+        """Output column names, all of them can be filtered, sorted and NULL-excluded."""
+        return list(self.expressions)
+
+    def is_pre_aggregation(self, field):
+        """
+        Tells whether a condition on `field` can be evaluated before aggregation.
+
+        Returns:
+            bool: True for every column of a non-aggregating query and for grouping columns
+        """
+        return not self.group_by or field in self.group_by
+
+    def render(self, conditions=()):
+        """
+        Renders the inner SELECT statement.
+
+        Args:
+            conditions: Additional pre-aggregation conditions, see is_pre_aggregation()
+
+        Returns:
+            str: SQL with `self.params` placeholders first, followed by those of `conditions`
+        """
+        columns = ',\n            '.join(
+            f"CAST({expression} AS float8) AS {name}" if name in self.floats
+            else expression if expression == name else f"{expression} AS {name}"
+            for name, expression in self.expressions.items()
+        )
+        where = list(self.where) + list(conditions)
+        group_by = ', '.join(self.expressions[field] for field in self.group_by)
+        return f"""
+        SELECT
+            {columns}
+        FROM {self.source}
+        {f'WHERE {" AND ".join(where)}' if where else ''}
+        {f'GROUP BY {group_by}' if group_by else ''}
+    """
+
+
+def encode_cursor(row, sort_by, order, key_fields):
+    """
+    Builds an opaque continuation token pointing after `row`.
+
+    Args:
+        row:        Last database row (snake_case keys) of the current page
+        sort_by:    Sorting column of the request
+        order:      'asc' or 'desc'
+        key_fields: Columns that uniquely identify a row
+
+    Returns:
+        str: URL-safe token for the `cursor` query parameter
+    """
+    values = [
+        str(value) if isinstance(value, Decimal) else value
+        for value in (row[column] for column in keyset_columns(sort_by, key_fields))
+    ]
+    payload = json.dumps({'s': sort_by, 'o': order.lower(), 'v': values}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token, sort_by, order, key_fields):
+    """
+    Decodes a token produced by encode_cursor().
+
+    Returns:
+        tuple: (values, error_message), values is None on error
+    """
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        values = payload['v']
+        cursor_sort, cursor_order = payload['s'], payload['o']
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        return None, "Invalid cursor"
+    if cursor_sort != sort_by or cursor_order != order.lower():
+        return None, "Cursor does not match sort parameters"
+    if not isinstance(values, list) or len(values) != len(keyset_columns(sort_by, key_fields)):
+        return None, "Invalid cursor"
+    return values, None
+
+
+def keyset_columns(sort_by, key_fields):
+    """Columns of the total result order: the sorting column followed by the remaining keys."""
+    return [sort_by] + [key for key in key_fields if key != sort_by]
+
+
+def keyset_condition(sort_by, order, key_fields, values):
+    """
+    Builds the predicate selecting rows that come after the cursor position
+    in `ORDER BY sort_by, *key_fields` order.
+    Follows PostgreSQL NULL ordering (NULLS LAST for ASC, NULLS FIRST for DESC)
+    of the sorting column; key fields are expected to be NOT NULL.
+
+    Args:
+        sort_by:    Sorting column
+        order:      'ASC' or 'DESC'
+        key_fields: Tie-breaker columns uniquely identifying a row
+        values:     Cursor values of sort_by followed by the remaining key fields
+
+    Returns:
+        tuple: (sql_condition, params)
+    """
+    sort_value, key_values = values[0], values[1:]
+    keys = [key for key in key_fields if key != sort_by]
+    op = '>' if order == 'ASC' else '<'
+
+    if keys:
+        keys_after = f"({', '.join(keys)}) {op} ({', '.join(['%s'] * len(keys))})"
+    else:
+        # The sorting column is the key itself, no ties are possible
+        keys_after = "FALSE"
+
+    if sort_value is None:
+        if order == 'ASC':
+            return f"({sort_by} IS NULL AND {keys_after})", key_values
+        return f"({sort_by} IS NOT NULL OR ({sort_by} IS NULL AND {keys_after}))", key_values
+
+    nulls_after = f" OR {sort_by} IS NULL" if order == 'ASC' else ""
+    condition = f"({sort_by} {op} %s{nulls_after} OR ({sort_by} = %s AND {keys_after}))"
+    return condition, [sort_value, sort_value] + key_values
+
+
+def build_query(query, args):
+    """
+    Builds a parameterized SQL query from HTTP request arguments.
+    Supports sorting, pagination (limit/offset or keyset `cursor`), NULL filtering.
+
+    Filters and NULL exclusion on columns that exist before aggregation are placed
+    in the inner query (see QuerySpec.is_pre_aggregation), all other conditions
+    are applied to the wrapped result.
+
+    Args:
+        query: QuerySpec of the route
+        args:  Request arguments (werkzeug MultiDict)
+
+    Returns:
+        tuple: (sql_query, query_params, error_message, http_status)
+               Returns (None, None, error, status) on validation failure
+    """
+    fields = query.fields
+    inner_conditions, inner_params = [], []
+    outer_conditions, outer_params = [], []
+
+    def add_condition(field, condition, params=()):
+        if query.is_pre_aggregation(field):
+            inner_conditions.append(condition.format(column=query.expressions[field]))
+            inner_params.extend(params)
+        else:
+            outer_conditions.append(condition.format(column=field))
+            outer_params.extend(params)
+
+    for key in fields:
+        value = args.get(key)
+        if value is not None:
+            add_condition(key, "{column} = %s", [value])
+
+    sort_by = args.get('sort_by', default=fields[0])
+    order = args.get('order', default='asc').upper()
+    if sort_by not in fields or order not in ['ASC', 'DESC']:
+        return None, None, "Invalid sort parameters", 400
+
+    exclude_nulls = args.get('exclude_nulls', 'false').lower() == 'true'
+    exclude_null_fields = args.getlist('exclude_null_fields')
+
+    invalid_fields = [f for f in exclude_null_fields if f not in fields]
+    if invalid_fields:
+        return None, None, f"Invalid fields for null exclusion: {invalid_fields}", 400
+
+    for field in exclude_null_fields:
+        add_condition(field, "{column} IS NOT NULL")
+
+    if exclude_nulls:
+        for field in fields:
+            if field not in exclude_null_fields:
+                add_condition(field, "{column} IS NOT NULL")
+
+    key_fields = query.key_fields
+    cursor = args.get('cursor')
+    if cursor is not None:
+        values, cursor_error = decode_cursor(cursor, sort_by, order, key_fields)
+        if cursor_error:
+            return None, None, cursor_error, 400
+        condition, condition_params = keyset_condition(sort_by, order, key_fields, values)
+        outer_conditions.append(condition)
+        outer_params.extend(condition_params)
+
+    where_clause = " AND ".join(outer_conditions)
+
+    limit = args.get('limit', type=int)
+    offset = args.get('offset', type=int)
+    if (limit is not None and limit < 0) or (offset is not None and offset < 0):
+        return None, None, "Invalid pagination parameters: limit and offset must not be negative", 400
+
+    order_by = ", ".join(f"{column} {order}" for column in keyset_columns(sort_by, key_fields))
+
+    sql = f"""
+          SELECT * FROM ({query.render(inner_conditions)}) AS subquery
+          {f'WHERE {where_clause}' if where_clause else ''}
+          ORDER BY {order_by}
+          {f'LIMIT {limit}' if limit else ''}
+          {f'OFFSET {offset}' if offset else ''}
+    """
+
+    return sql, query.params + inner_params + outer_params, None, None
+
+
+def normalize_query_args(query, args):
+    """
+    Extracts the request arguments understood by build_query() in canonical form,
+    so that equivalent requests (default values spelled out, different argument
+    order, repeated null fields) share one response cache entry.
+
+    Args:
+        query: QuerySpec of the route
+        args:  Request arguments (werkzeug MultiDict)
+
+    Returns:
+        dict of normalized arguments
+    """
+    fields = query.fields
+    params = {
+        'filters': {key: args.get(key) for key in fields if args.get(key) is not None},
+        'sort_by': args.get('sort_by', default=fields[0]),
+        'order': args.get('order', default='asc').lower(),
+        'exclude_nulls': args.get('exclude_nulls', 'false').lower() == 'true',
+        'exclude_null_fields': sorted(set(args.getlist('exclude_null_fields'))),
+        'cursor': args.get('cursor'),
+    }
+    limit = args.get('limit', type=int)
+    offset = args.get('offset', type=int)
+    if limit:
+        params['limit'] = limit
+    if offset:
+        params['offset'] = offset
+    return params
+
+
+def pagination_headers(data, names, query_args, key_fields, path, args):
+    """
+    Builds the headers advertising the next page of a limited result.
+    A next page exists when the page is full (len(data) == limit).
+
+    Args:
+        data:       Database rows (tuples) of the current page
+        names:      Column names of the rows
+        query_args: Normalized arguments, see normalize_query_args()
+        key_fields: Columns uniquely identifying a row
+        path:       Request path, base of the Link URL
+        args:       Request arguments (werkzeug MultiDict)
+
+    Returns:
+        dict with X-Next-Cursor and Link headers, empty on the last page
+    """
+    limit = query_args.get('limit')
+    if not limit or len(data) < limit:
+        return {}
+    last_row = dict(zip(names, data[-1]))
+    next_cursor = encode_cursor(last_row, query_args['sort_by'], query_args['order'], key_fields)
+    next_args = [(key, value) for key, value in args.items(multi=True) if key not in ('cursor', 'offset')]
+    next_args.append(('cursor', next_cursor))
+    return {
+        'X-Next-Cursor': next_cursor,
+        'Link': f'<{path}?{urlencode(next_args)}>; rel="next"',
+    }
@@ -0,0 +1,426 @@
+import math
+import re
+import threading
+from bisect import bisect_left
+from collections import OrderedDict
+from decimal import Decimal
+
+import numpy as np
+import psycopg2.extensions
+from config import Config
+from db import get_conn, release_conn
+from db.embedded import get_embedded_database
+from formats.rows import describe
+from routes.query import decode_cursor, keyset_columns
+
+# PostgreSQL type OIDs with vectorized filtering and sorting, and their value ranges
+INTEGER_TYPES = {21: 2 ** 15, 23: 2 ** 31, 20: 2 ** 63}
+NUMERIC_TYPE = 1700
+FLOAT_TYPES = (700, 701)
+TEXT_TYPES = (25, 1043)
+
+# Parameter spellings accepted identically by PostgreSQL and Python
+_INTEGER_RE = re.compile(r'^\s*[+-]?\d+\s*$')
+_NUMERIC_RE = re.compile(r'^\s*[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?\s*$')
+
+
+class Unsupported(Exception):
+    """Raised when a request cannot be answered exactly from the snapshot; the SQL path is used instead."""
+
+
+class Column:
+    """
+    Values of one result column.
+
+    Rows are ordered and compared through `order`, an int64 array that sorts like
+    PostgreSQL does: the values themselves for integer columns, the rank among the
+    distinct values for numeric and float columns and text columns (ranked by the
+    database, so its collation is respected).
+
+    Args:
+        name:      Output column name
+        type_code: PostgreSQL type OID
+        values:    Python values as returned by psycopg2
+        text_rank: For text columns, mapping of every distinct value to its rank
+    """
+
+    def __init__(self, name, type_code, values, text_rank=None):
+        self.name = name
+        self.type_code = type_code
+        self.values = np.empty(len(values), dtype=object)
+        for i, value in enumerate(values):
+            # Assigned one by one so that arrays (ARRAY_AGG) stay single objects
+            self.values[i] = value
+        self.null = np.array([value is None for value in values], dtype=bool)
+        self.order = None
+        self._ranks = None
+        self._sorted = None
+
+        present = [value for value in values if value is not None]
+        if type_code in INTEGER_TYPES:
+            self.order = np.array([0 if value is None else value for value in values], dtype=np.int64)
+        elif type_code == NUMERIC_TYPE and not any(value.is_nan() for value in present):
+            self._sorted = sorted(set(present))
+            self._ranks = {value: rank for rank, value in enumerate(self._sorted)}
+        elif type_code in FLOAT_TYPES and not any(math.isnan(value) for value in present):
+            self._sorted = sorted(set(present))
+            self._ranks = {value: rank for rank, value in enumerate(self._sorted)}
+        elif type_code in TEXT_TYPES and text_rank is not None:
+            self._ranks = text_rank
+        if self._ranks is not None:
+            self.order = np.array(
+                [0 if value is None else self._ranks[value] for value in values], dtype=np.int64
+            )
+
+    @property
+    def sortable(self):
+        return self.order is not None
+
+    def parse(self, value):
+        """
+        Converts a request parameter the way PostgreSQL casts an untyped literal
+        to the column type.
+
+        Raises:
+            Unsupported: Column type without vectorized comparison, or a value
+                         PostgreSQL would reject or interpret differently
+        """
+        if not self.sortable or '\x00' in value or self.type_code in FLOAT_TYPES:
+            # Filters on float columns compare the NUMERIC value before the cast in SQL
+            raise Unsupported(self.name)
+        if self.type_code in INTEGER_TYPES:
+            if not _INTEGER_RE.match(value):
+                raise Unsupported(self.name)
+            number = int(value)
+            if not -INTEGER_TYPES[self.type_code] <= number < INTEGER_TYPES[self.type_code]:
+                raise Unsupported(self.name)
+            return number
+        if self.type_code == NUMERIC_TYPE:
+            if not _NUMERIC_RE.match(value):
+                raise Unsupported(self.name)
+            return Decimal(value.strip())
+        return value
+
+    def compare(self, op, value):
+        """
+        Evaluates `column <op> value` for every row.
+
+        Args:
+            op:    '=', '>' or '<'
+            value: Value of the column type, see parse()
+
+        Returns:
+            numpy bool array, False for NULL rows (SQL comparison with NULL is not true)
+        """
+        if value is None:
+            return np.zeros(len(self.null), dtype=bool)
+        if self.type_code in INTEGER_TYPES:
+            position, exact = value, True
+        elif self._sorted is not None:
+            position = bisect_left(self._sorted, value)
+            exact = position < len(self._sorted) and self._sorted[position] == value
+        elif value in self._ranks:
+            position, exact = self._ranks[value], True
+        elif op == '=':
+            return np.zeros(len(self.null), dtype=bool)
+        else:
+            # The collation position of an unknown text value is only known to the database
+            raise Unsupported(self.name)
+
+        if op == '=':
+            result = self.order == position if exact else np.zeros(len(self.null), dtype=bool)
+        elif op == '>':
+            # Without an exact match `position` is the rank of the next greater value
+            result = self.order > position if exact else self.order >= position
+        else:
+            result = self.order < position
+        return result & ~self.null
+
+    def cursor_value(self, value):
+        """Converts a value decoded from a pagination cursor to the column type."""
+        if value is None:
+            return None
+        if isinstance(value, str):
+            return self.parse(value)
+        if self.type_code in FLOAT_TYPES and isinstance(value, (int, float)) and not isinstance(value, bool):
+            # Cursors of float columns hold the float itself
+            return float(value)
+        if isinstance(value, bool) or not isinstance(value, int) or self.type_code in TEXT_TYPES:
+            raise Unsupported(self.name)
+        if self.type_code in INTEGER_TYPES:
+            return self.parse(str(value))
+        return Decimal(value)
+
+
+class Frame:
+    """
+    Unfiltered result of a route's base query held as column arrays.
+
+    Args:
+        query:   QuerySpec the frame was loaded for
+        columns: Column objects in output order
+    """
+
+    def __init__(self, query, columns):
+        self.query = query
+        self.columns = {column.name: column for column in columns}
+        self.size = len(columns[0].values) if columns else 0
+
+    def project(self, query):
+        """Returns a frame with the subset of columns selected by `query`."""
+        return Frame(query, [self.columns[name] for name in query.fields])
+
+    def covers(self, query):
+        """Tells whether `query` selects a subset of this frame's non-aggregated columns."""
+        return (
+            not query.group_by and not self.query.group_by
+            and query.source == self.query.source
+            and query.where == self.query.where
+            and query.params == self.query.params
+            and all(self.query.expressions.get(name) == expression
+                    and (name in self.query.floats) == (name in query.floats)
+                    for name, expression in query.expressions.items())
+        )
+
+    def execute(self, query, args):
+        """
+        Evaluates the filtering, NULL exclusion, ordering, keyset and limit/offset
+        semantics of routes.query.build_query() over the frame.
+        Arguments must already have been validated by build_query().
+
+        Returns:
+            tuple: (rows, description), rows are tuples of the values psycopg2
+                   returned, as the SQL path would fetch them (see routes.api.execute_query)
+
+        Raises:
+            Unsupported: The request needs the SQL path
+        """
+        fields = query.fields
+        mask = np.ones(self.size, dtype=bool)
+
+        for key in fields:
+            value = args.get(key)
+            if value is not None:
+                column = self.columns[key]
+                mask &= column.compare('=', column.parse(value))
+
+        exclude_null_fields = set(args.getlist('exclude_null_fields'))
+        if args.get('exclude_nulls', 'false').lower() == 'true':
+            exclude_null_fields.update(fields)
+        for field in exclude_null_fields:
+            mask &= ~self.columns[field].null
+
+        sort_by = args.get('sort_by', default=fields[0])
+        order = args.get('order', default='asc').upper()
+        ordering = [self.columns[name] for name in keyset_columns(sort_by, query.key_fields)]
+        if not all(column.sortable for column in ordering):
+            raise Unsupported(sort_by)
+
+        cursor = args.get('cursor')
+        if cursor is not None:
+            values, _ = decode_cursor(cursor, sort_by, order, query.key_fields)
+            mask &= self._after_cursor(ordering, order, values)
+
+        limit = args.get('limit', type=int)
+        offset = args.get('offset', type=int)
+        if (limit and limit < 0) or (offset and offset < 0):
+            raise Unsupported('limit')
+
+        selected = np.flatnonzero(mask)
+        sort_keys = []
+        for column in reversed(ordering):
+            # np.lexsort sorts by the last key first; for every column the NULL flag
+            # precedes the value (NULLS LAST for ASC, NULLS FIRST for DESC)
+            if order == 'ASC':
+                sort_keys += [column.order[selected], column.null[selected]]
+            else:
+                sort_keys += [-column.order[selected], ~column.null[selected]]
+        selected = selected[np.lexsort(sort_keys)]
+
+        if offset:
+            selected = selected[offset:]
+        if limit:
+            selected = selected[:limit]
+
+        columns = [self.columns[name].values[selected] for name in fields]
+        description = tuple((name, self.columns[name].type_code) for name in fields)
+        return list(zip(*columns)), description
+
+    def _after_cursor(self, ordering, order, values):
+        # Same predicate as routes.query.keyset_condition()
+        sort_column, keys = ordering[0], ordering[1:]
+        sort_value = sort_column.cursor_value(values[0])
+        key_values = [column.cursor_value(value) for column, value in zip(keys, values[1:])]
+        op = '>' if order == 'ASC' else '<'
+
+        keys_after = np.zeros(self.size, dtype=bool)
+        keys_equal = np.ones(self.size, dtype=bool)
+        for column, value in zip(keys, key_values):
+            keys_after |= keys_equal & column.compare(op, value)
+            keys_equal &= column.compare('=', value)
+
+        null = sort_column.null
+        if sort_value is None:
+            if order == 'ASC':
+                return null & keys_after
+            return ~null | (null & keys_after)
+
+        after = sort_column.compare(op, sort_value) | (sort_column.compare('=', sort_value) & keys_after)
+        if order == 'ASC':
+            after |= null
+        return after
+
+
+class SnapshotEngine:
+    """
+    Serves API queries from an in-memory copy of the routes' base query results
+    instead of running SQL for every request.
+
+    The first request of a route loads its unfiltered base query (aggregates are
+    still computed by PostgreSQL, once per data version); filters, NULL exclusion,
+    ordering and pagination are then evaluated with NumPy. At most `max_frames`
+    results are kept, the least recently used one is dropped first. When the data
+    version changes, all frames are dropped and each is reloaded on its next request.
+    Requests that cannot be evaluated exactly fall back to the SQL path.
+
+    Args:
+        max_frames: Maximum number of base query results kept
+    """
+
+    def __init__(self, max_frames):
+        self.max_frames = max_frames
+        self._lock = threading.Lock()
+        # Serializes loads, so concurrent requests of a route load its frame once
+        self._load_lock = threading.Lock()
+        self._version = None
+        self._frames = OrderedDict()    # (rendered base query, parameters) -> Frame
+        self.hits = 0
+        self.fallbacks = 0
+        self.evictions = 0
+
+    def execute(self, query, args, version):
+        """
+        Args:
+            query:   QuerySpec of the route
+            args:    Request arguments validated by build_query()
+            version: Current DataVersion token
+
+        Returns:
+            tuple: (rows, description) as the SQL path would return them,
+                   None if the SQL path must be used
+        """
+        frame = self._frame(query, version)
+        try:
+            result = frame.execute(query, args)
+        except Unsupported:
+            with self._lock:
+                self.fallbacks += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {
+                'version': self._version,
+                'frames': len(self._frames),
+                'max_frames': self.max_frames,
+                'rows': sum(frame.size for frame in self._frames.values()),
+                'hits': self.hits,
+                'fallbacks': self.fallbacks,
+                'evictions': self.evictions,
+            }
+
+    def _frame(self, query, version):
+        key = _frame_key(query)
+        frame = self._cached(key, version)
+        if frame is not None:
+            return frame
+
+        with self._load_lock:
+            frame = self._cached(key, version)
+            if frame is not None:
+                return frame
+            with self._lock:
+                frames = list(self._frames.values())
+            frame = _build(query, frames)
+            with self._lock:
+                # A frame loaded while the version changed is used once but not kept
+                if version == self._version:
+                    self._frames[key] = frame
+                    while len(self._frames) > self.max_frames:
+                        self._frames.popitem(last=False)
+                        self.evictions += 1
+            return frame
+
+    def _cached(self, key, version):
+        with self._lock:
+            if version != self._version:
+                self._frames.clear()
+                self._version = version
+                return None
+            frame = self._frames.get(key)
+            if frame is not None:
+                self._frames.move_to_end(key)
+            return frame
+
+
+def _build(query, frames):
+    base = next((frame for frame in frames if frame.covers(query)), None)
+    return base.project(query) if base is not None else _load_frame(query)
+
+
+def _frame_key(query):
+    # Queries of path-parameterized routes differ only in their parameters
+    return query.render(), tuple(query.params)
+
+
+def _load_frame(query):
+    if Config.DB_BACKEND == 'duckdb':
+        return _build_frame(query, get_embedded_database().execute)
+    conn = get_conn()
+    try:
+        with conn.cursor(cursor_factory=psycopg2.extensions.cursor) as cur:
+            def execute(sql, params):
+                cur.execute(sql, params)
+                return cur.fetchall(), describe(cur.description)
+            return _build_frame(query, execute)
+    finally:
+        release_conn(conn)
+
+
+def _build_frame(query, execute):
+    rows, description = execute(f"SELECT * FROM ({query.render()}) AS subquery", query.params)
+    columns = []
+    for index, (name, type_code) in enumerate(description):
+        values = [row[index] for row in rows]
+        text_rank = None
+        if type_code in TEXT_TYPES:
+            # Rank distinct values in the database collation, as ORDER BY would
+            ranked, _ = execute(
+                "SELECT value FROM unnest(%s::text[]) AS t(value) ORDER BY value",
+                (sorted({value for value in values if value is not None}),)
+            )
+            text_rank = {value: rank for rank, (value,) in enumerate(ranked)}
+        columns.append(Column(name, type_code, values, text_rank))
+    return Frame(query, columns)
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_snapshot_engine():
+    """
+    Returns the process-wide snapshot engine, used when QUERY_BACKEND=snapshot.
+
+    Returns:
+        SnapshotEngine
+    """
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = SnapshotEngine(Config.SNAPSHOT_MAX_FRAMES)
+    return _engine
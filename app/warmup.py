@@ -0,0 +1,185 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from config import Config
+from db import UNKNOWN_VERSION, get_data_version
+from instrumentation import INTERNAL_REQUEST
+
+logger = logging.getLogger(__name__)
+
+# Bytes read from the end of the access log when looking for frequent requests
+ACCESS_LOG_TAIL_BYTES = 8 * 1024 * 1024
+
+# Query arguments of responses that are never cached
+UNCACHED_ARGUMENTS = ('stream=', 'format=ndjson', 'profile=')
+
+
+def default_urls(app):
+    """
+    Returns:
+        list of the `api` GET routes without path parameters, requested with their defaults
+    """
+    return sorted(
+        rule.rule for rule in app.url_map.iter_rules()
+        if rule.endpoint.split('.')[0] == 'api' and not rule.arguments and 'GET' in rule.methods
+    )
+
+
+def frequent_urls(path, limit):
+    """
+    Counts the successful /api GET requests in the tail of a JSON access log
+    (see ACCESS_LOG) and returns the most frequent ones.
+
+    Args:
+        path:  Access log file, lines that are not JSON objects are skipped
+        limit: Number of URLs to return
+
+    Returns:
+        list of URLs with query string, most frequent first
+    """
+    try:
+        with open(path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(f.tell() - ACCESS_LOG_TAIL_BYTES, 0))
+            lines = f.read().splitlines()
+    except OSError as e:
+        logger.warning("Access log %s could not be read: %s", path, e)
+        return []
+
+    counts = Counter()
+    for line in lines:
+        if not line.startswith(b'{'):
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        query = record.get('query', '')
+        if (
+            record.get('method') != 'GET' or record.get('status') not in (200, 304)
+            or not record.get('path', '').startswith('/api/')
+            or any(argument in query for argument in UNCACHED_ARGUMENTS)
+        ):
+            continue
+        counts[record['path'] + (f"?{query}" if query else '')] += 1
+    return [url for url, _ in counts.most_common(limit)]
+
+
+class CacheWarmer:
+    """
+    Precomputes API responses into the response cache by requesting them
+    through the application, so they take the same path (and cache keys)
+    as requests of clients.
+
+    Warmed are the routes with their default parameters and the most frequent
+    requests of the access log. At most `concurrency` requests run at once,
+    which bounds the database connections warm-up takes from live traffic.
+
+    Args:
+        app:         Flask application
+        concurrency: Requests running at once
+        access_log:  JSON access log to take frequent requests from, None to skip
+        top:         Number of frequent requests to warm
+    """
+
+    def __init__(self, app, concurrency, access_log=None, top=50):
+        self.app = app
+        self.concurrency = max(concurrency, 1)
+        self.access_log = access_log
+        self.top = top
+        self.warmed_version = None
+        self.runs = 0
+        self.last_run = None
+
+    def urls(self):
+        urls = default_urls(self.app)
+        if self.access_log:
+            urls += frequent_urls(self.access_log, self.top)
+        return list(dict.fromkeys(urls))
+
+    def run(self):
+        """
+        Requests every warm-up URL once.
+
+        Returns:
+            dict with the version, number of URLs, responses warmed (200),
+            server errors and duration; routes that need parameters answer 400
+        """
+        version = get_data_version()
+        urls = self.urls()
+        started = time.monotonic()
+        client = self.app.test_client()
+
+        def fetch(url):
+            response = client.get(url, environ_base={INTERNAL_REQUEST: True})
+            response.close()
+            return response.status_code
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='cache-warmup') as executor:
+            statuses = list(executor.map(fetch, urls))
+
+        self.runs += 1
+        self.warmed_version = version
+        self.last_run = {
+            'version': version.token,
+            'urls': len(urls),
+            'warmed': statuses.count(200),
+            'failed': sum(1 for status in statuses if status >= 500),
+            'seconds': round(time.monotonic() - started, 3),
+        }
+        logger.info("Cache warm-up: %s", self.last_run)
+        return self.last_run
+
+    def watch(self, interval):
+        """
+        Warms the cache now and again whenever the data version changes.
+        Runs until the process exits, checking the version every `interval` seconds.
+        """
+        while True:
+            version = get_data_version()
+            if version != UNKNOWN_VERSION and version != self.warmed_version:
+                try:
+                    self.run()
+                except Exception:
+                    logger.exception("Cache warm-up failed")
+                    self.warmed_version = version
+            time.sleep(interval)
+
+
+_warmer = None
+_warmer_lock = threading.Lock()
+
+
+def start_cache_warmer(app):
+    """
+    Starts the warm-up of the current process in a daemon thread, once.
+    Called on gunicorn worker boot (see gunicorn.conf.py); does nothing unless WARMUP is enabled.
+
+    Args:
+        app: Flask application
+
+    Returns:
+        CacheWarmer or None
+    """
+    global _warmer
+    if not Config.WARMUP:
+        return None
+    with _warmer_lock:
+        if _warmer is None:
+            _warmer = CacheWarmer(
+                app,
+                concurrency=Config.WARMUP_CONCURRENCY,
+                access_log=Config.WARMUP_ACCESS_LOG,
+                top=Config.WARMUP_TOP_REQUESTS
+            )
+            thread = threading.Thread(
+                target=_warmer.watch, args=(Config.DATA_VERSION_CHECK_INTERVAL,),
+                name='cache-warmup', daemon=True
+            )
+            thread.start()
+    return _warmer
@@ -0,0 +1,99 @@
+"""
+Compares the synchronous Flask/gunicorn server with the ASGI server under
+the same concurrent load.
+
+Start both servers against the same database with the same number of workers,
+and disable the Flask response cache so that every request reaches PostgreSQL.
+Admission control is disabled as well: the ASGI server has none, and at a
+concurrency of 200 it would answer most Flask requests with 503 (see ADMISSION):
+
+    cd app
+    CACHE_BACKEND=none ADMISSION=false gunicorn -w 4 -b 127.0.0.1:5000 app:app
+    uvicorn asgi:app --workers 4 --host 127.0.0.1 --port 8000
+
+Then run:
+
+    python benchmarks/async_vs_sync.py --concurrency 200 --requests 5000
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+DEFAULT_PATHS = [
+    '/api/team_yearly_stats',
+    '/api/country_info',
+    '/api/full_players_costs?year=2020',
+    '/api/average_points_per_team?sort_by=average_points&order=desc&limit=100',
+]
+
+
+async def run_load(base_url, paths, total_requests, concurrency, timeout):
+    """
+    Sends `total_requests` GET requests with `concurrency` requests in flight,
+    cycling through `paths`.
+
+    Returns:
+        dict with the number of requests and errors, wall time and latencies in seconds
+    """
+    latencies = []
+    errors = 0
+    next_request = 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+        async def worker():
+            nonlocal next_request, errors
+            while next_request < total_requests:
+                path = paths[next_request % len(paths)]
+                next_request += 1
+                started = time.perf_counter()
+                try:
+                    response = await client.get(path)
+                    response.read()
+                    if response.status_code != 200:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {'requests': len(latencies), 'errors': errors, 'elapsed': elapsed, 'latencies': latencies}
+
+
+def summarize(name, result):
+    latencies = sorted(result['latencies'])
+    quantiles = statistics.quantiles(latencies, n=100)
+    return (
+        f"{name:<6} {result['requests']:>8} {result['errors']:>7} "
+        f"{result['requests'] / result['elapsed']:>9.1f} "
+        f"{quantiles[49] * 1000:>9.1f} {quantiles[94] * 1000:>9.1f} {quantiles[98] * 1000:>9.1f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sync-url', default='http://127.0.0.1:5000')
+    parser.add_argument('--async-url', default='http://127.0.0.1:8000')
+    parser.add_argument('--path', action='append', dest='paths', help='Request path (repeatable)')
+    parser.add_argument('--requests', type=int, default=5000, help='Requests per server')
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--warmup', type=int, default=200, help='Unmeasured requests per server')
+    parser.add_argument('--timeout', type=float, default=60)
+    args = parser.parse_args()
+    paths = args.paths or DEFAULT_PATHS
+
+    print(f"{'mode':<6} {'requests':>8} {'errors':>7} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, url in (('sync', args.sync_url), ('async', args.async_url)):
+        asyncio.run(run_load(url, paths, args.warmup, min(args.warmup, args.concurrency), args.timeout))
+        result = asyncio.run(run_load(url, paths, args.requests, args.concurrency, args.timeout))
+        print(summarize(name, result))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+"""
+Compares the PostgreSQL and the embedded DuckDB storage backends in-process.
+
+Every case is requested through the Flask test client with DB_BACKEND=postgres
+and DB_BACKEND=duckdb (response cache disabled). Both backends have to serve the
+same dataset: load PostgreSQL with json_to_postgresql/psql_database.ipynb and
+build the Parquet files from the same analysis/ outputs with `flask build-parquet`.
+
+Responses are identical when their bodies and pagination headers match
+byte for byte, equivalent when they only differ in the order of ClubIDs
+(ARRAY_AGG without ORDER BY) or in the last digits of averages computed
+as numeric in PostgreSQL and as double in DuckDB. The script reports the mean
+time per request of both backends and exits with status 1 on any mismatch or failed case.
+
+    cd app
+    flask --app app build-parquet
+    python ../benchmarks/duckdb_vs_postgres.py --repeat 200
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+os.environ['CACHE_BACKEND'] = 'none'
+os.environ['SINGLEFLIGHT'] = 'off'
+# Re-read the data version of the active backend on every request
+os.environ['DATA_VERSION_CHECK_INTERVAL'] = '0'
+
+from app import app  # noqa: E402
+from config import Config  # noqa: E402
+
+CASES = [
+    '/api/team_yearly_stats',
+    '/api/team_yearly_stats?metrics=team_cost,average_age&year=2020&sort_by=team_cost&order=desc',
+    '/api/average_points_per_team?sort_by=average_points&order=desc&limit=50',
+    '/api/average_age_per_team?exclude_nulls=true&sort_by=average_age&limit=100&offset=200',
+    '/api/transfer_balance?team_id=3',
+    '/api/legionnaires_per_team?exclude_null_fields=legioners&sort_by=legioners',
+    '/api/team_size_ratio?year=2018&sort_by=team_size_ratio&order=desc',
+    '/api/full_players_costs?year=2020&sort_by=total_country_cost&order=desc',
+    '/api/average_team_cost?national_team_id=3262',
+    '/api/total_average_age?sort_by=average_age_among_clubs',
+    '/api/national_teams_players_total_amount?sort_by=national_players_count&order=desc&limit=20',
+    '/api/club_info',
+    '/api/club_info?national_team_id=3262&order=desc',
+    '/api/country_info',
+    '/api/country/3262/clubs?year=2020&metrics=team_cost,average_age',
+    '/api/aggregate?group_by=national_team_id,year&agg=sum:team_cost,avg:average_age',
+    '/api/aggregate?group_by=year&agg=avg:average_points,max:team_size_ratio,count:team_cost',
+    '/api/aggregate?group_by=team_id,year&agg=sum:legionnaires&team_id=3',
+    '/api/team_yearly_stats?format=columns&sort_by=team_size_ratio',
+    '/api/team_yearly_stats?format=ndjson&metrics=average_points',
+    '/api/total_team_cost?stream=true&sort_by=team_cost&order=desc',
+]
+
+# Sorting by text compares in the database collation, which DuckDB does not have
+COLLATION_CASES = [
+    '/api/club_info?sort_by=team_name',
+    '/api/country_info?sort_by=national_team_name&order=desc',
+]
+
+
+def request(client, backend, url):
+    Config.DB_BACKEND = backend
+    response = client.get(url)
+    return response.status_code, response.get_data(), response.headers.get('X-Next-Cursor')
+
+
+def follow_cursor(client, backend, url, pages):
+    """Fetches up to `pages` pages of a limited request through the keyset cursor."""
+    results = []
+    for _ in range(pages):
+        status, body, next_cursor = request(client, backend, url)
+        results.append((status, body, next_cursor))
+        if next_cursor is None:
+            break
+        url = f"{url.split('&cursor=')[0]}&cursor={next_cursor}"
+    return results
+
+
+def _decode(body):
+    try:
+        return json.loads(body)
+    except ValueError:
+        return [json.loads(line) for line in body.splitlines() if line]
+
+
+def _equivalent(left, right):
+    if isinstance(left, float) and isinstance(right, (int, float)):
+        return math.isclose(left, right, rel_tol=1e-12)
+    if isinstance(left, dict) and isinstance(right, dict):
+        if left.keys() != right.keys():
+            return False
+        if 'ClubIDs' in left:
+            left, right = dict(left, ClubIDs=sorted(left['ClubIDs'])), dict(right, ClubIDs=sorted(right['ClubIDs']))
+        return all(_equivalent(left[key], right[key]) for key in left)
+    if isinstance(left, list) and isinstance(right, list):
+        return len(left) == len(right) and all(_equivalent(a, b) for a, b in zip(left, right))
+    return left == right
+
+
+def compare(postgres, duckdb):
+    """
+    Returns:
+        'identical', 'equivalent', 'MISMATCH' or 'FAILED' (not answered with 200,
+        errors of both backends would compare equal without comparing any data)
+    """
+    if postgres[0] != 200 or duckdb[0] != 200:
+        return 'FAILED'
+    if postgres == duckdb:
+        return 'identical'
+    (status, body, _), (other_status, other_body, _) = postgres, duckdb
+    if status == other_status and _equivalent(_decode(body), _decode(other_body)):
+        return 'equivalent'
+    return 'MISMATCH'
+
+
+def timed(client, backend, url, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        request(client, backend, url)
+    return (time.perf_counter() - started) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=100, help='Timed requests per case and backend')
+    args = parser.parse_args()
+
+    client = app.test_client()
+    mismatches = 0
+
+    print(f"{'case':<90} {'result':<10} {'pg ms':>8} {'duck ms':>8} {'speedup':>8}")
+    for url in CASES + COLLATION_CASES:
+        result = compare(request(client, 'postgres', url), request(client, 'duckdb', url))
+        if result == 'MISMATCH' and url in COLLATION_CASES:
+            result = 'collation'
+        elif result in ('MISMATCH', 'FAILED'):
+            mismatches += 1
+        postgres_time = timed(client, 'postgres', url, args.repeat)
+        duckdb_time = timed(client, 'duckdb', url, args.repeat)
+        print(
+            f"{url:<90} {result:<10} {postgres_time * 1000:>8.2f} {duckdb_time * 1000:>8.2f} "
+            f"{postgres_time / duckdb_time:>7.1f}x"
+        )
+
+    paginated = '/api/team_yearly_stats?sort_by=average_points&order=desc&limit=500'
+    if follow_cursor(client, 'postgres', paginated, 30) != follow_cursor(client, 'duckdb', paginated, 30):
+        mismatches += 1
+        print(f"MISMATCH cursor pages of {paginated}")
+
+    if mismatches:
+        print(f"{mismatches} responses differ between backends")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,283 @@
+"""
+Replays a realistic request mix against a running API and reports latency
+percentiles and throughput per route.
+
+Mixes:
+  pageload  - the requests of the map (scriptMap.js) and scatter (scriptScatter.js)
+              pages plus the clubs of a country the map loads on click
+  variants  - filtered, sorted, paginated and aggregated variants of every route
+  all       - both, page loads weighted like one page view per five variant requests
+
+The request sequence is drawn from --seed, so runs with the same arguments
+replay the same requests. Results are written as JSON to --output and can be
+compared with a previous run. Start the server without response cache and
+without admission control, which would otherwise shed most of the concurrent
+requests with 503 and the run would measure load shedding (see ADMISSION):
+
+    python benchmarks/seed.py --scale 10
+    cd app && CACHE_BACKEND=none ADMISSION=false gunicorn -c gunicorn.conf.py app:app
+    python benchmarks/loadtest.py --label scale10 --scale 10
+    python benchmarks/loadtest.py --label scale10-after --scale 10 --compare benchmarks/results/<previous>.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import statistics
+import subprocess
+import time
+from collections import defaultdict
+
+import httpx
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+# Requests fired when the map and the scatter pages load
+PAGE_LOAD = [
+    '/api/average_team_cost',
+    '/api/full_players_costs',
+    '/api/legionnaires_total_amount',
+    '/api/national_teams_players_total_amount',
+    '/api/total_average_age',
+    '/api/club_info',
+    '/api/country_info',
+    '/api/club_info',
+    '/api/country_info',
+    '/api/team_yearly_stats',
+]
+
+# Metrics the map requests for the clubs of a clicked country
+MAP_CLICK_METRICS = ['team_cost', 'legioners', 'players_in_national_team', 'average_age']
+
+TEAM_ROUTES = {
+    '/api/average_points_per_team': 'average_points',
+    '/api/club_titles': 'number_of_titles_this_year',
+    '/api/clubs_and_national_players': 'players_in_national_team',
+    '/api/total_team_cost': 'team_cost',
+    '/api/transfer_balance': 'transfer_balance',
+    '/api/legionnaires_per_team': 'legioners',
+    '/api/average_age_per_team': 'average_age',
+    '/api/team_size_ratio': 'team_size_ratio',
+}
+
+COUNTRY_ROUTES = {
+    '/api/full_players_costs': 'total_country_cost',
+    '/api/average_team_cost': 'team_cost',
+    '/api/legionnaires_total_amount': 'total_legionnaires_amount',
+    '/api/total_average_age': 'average_age_among_clubs',
+    '/api/national_teams_players_total_amount': 'national_players_count',
+}
+
+YEARS = list(range(2014, 2025))
+
+# Path parameters are reported under one route
+_PATH_ID_RE = re.compile(r'/\d+(?=/|$)')
+
+
+class RequestMix:
+    """
+    Draws request URLs of a mix.
+
+    Args:
+        mix:      'pageload', 'variants' or 'all'
+        team_ids: Existing club IDs
+        country_ids: Existing national team IDs
+        rng:      random.Random instance
+    """
+
+    def __init__(self, mix, team_ids, country_ids, rng):
+        self.mix = mix
+        self.team_ids = team_ids
+        self.country_ids = country_ids
+        self.rng = rng
+
+    def page_load(self):
+        rng = self.rng
+        click = (
+            f"/api/country/{rng.choice(self.country_ids)}/clubs"
+            f"?year={rng.choice(YEARS)}&metrics={rng.choice(MAP_CLICK_METRICS)}"
+        )
+        return list(PAGE_LOAD) + [click]
+
+    def variant(self):
+        rng = self.rng
+        kind = rng.choice(['team', 'country', 'aggregate', 'info'])
+        if kind == 'team':
+            route, metric = rng.choice(list(TEAM_ROUTES.items()))
+            return route + '?' + rng.choice([
+                f"team_id={rng.choice(self.team_ids)}",
+                f"year={rng.choice(YEARS)}&sort_by={metric}&order=desc&limit=50",
+                f"sort_by={metric}&order=desc&exclude_nulls=true&limit=100",
+                f"year={rng.choice(YEARS)}&exclude_null_fields={metric}",
+                f"sort_by={metric}&limit=200&offset={rng.randrange(0, 2000, 200)}",
+            ])
+        if kind == 'country':
+            route, metric = rng.choice(list(COUNTRY_ROUTES.items()))
+            return route + '?' + rng.choice([
+                f"national_team_id={rng.choice(self.country_ids)}",
+                f"year={rng.choice(YEARS)}&sort_by={metric}&order=desc",
+                f"sort_by={metric}&order=desc&limit=20",
+            ])
+        if kind == 'aggregate':
+            return '/api/aggregate?' + rng.choice([
+                'group_by=national_team_id,year&agg=sum:team_cost,avg:average_age',
+                f"group_by=year&agg=avg:average_points,max:team_cost&year={rng.choice(YEARS)}",
+                f"group_by=team_id,year&agg=sum:legionnaires&team_id={rng.choice(self.team_ids)}",
+                'group_by=national_team_id&agg=count:team_cost&sort_by=count_team_cost&order=desc&limit=10',
+            ])
+        return rng.choice([
+            f"/api/club_info?national_team_id={rng.choice(self.country_ids)}",
+            f"/api/country_info?national_team_id={rng.choice(self.country_ids)}",
+            f"/api/team_yearly_stats?metrics=team_cost,average_age&year={rng.choice(YEARS)}",
+        ])
+
+    def draw(self, count):
+        """Returns `count` URLs of the mix in replay order."""
+        urls = []
+        while len(urls) < count:
+            if self.mix == 'pageload' or (self.mix == 'all' and self.rng.random() < 1 / 6):
+                urls += self.page_load()
+            else:
+                urls.append(self.variant())
+        return urls[:count]
+
+
+async def discover_ids(client):
+    clubs = (await client.get('/api/club_info')).json()
+    countries = (await client.get('/api/country_info')).json()
+    return [club['TeamID'] for club in clubs], [country['NationalTeamID'] for country in countries]
+
+
+async def replay(client, urls, concurrency):
+    """
+    Sends the URLs in order with `concurrency` requests in flight.
+
+    Returns:
+        tuple: (samples, elapsed) where samples are (route, seconds, ok, bytes)
+    """
+    samples = []
+    position = 0
+
+    async def worker():
+        nonlocal position
+        while position < len(urls):
+            url = urls[position]
+            position += 1
+            started = time.perf_counter()
+            try:
+                response = await client.get(url)
+                ok = response.status_code == 200
+                size = len(response.content)
+            except httpx.HTTPError:
+                ok, size = False, 0
+            route = _PATH_ID_RE.sub('/<id>', url.split('?')[0])
+            samples.append((route, time.perf_counter() - started, ok, size))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return samples, time.perf_counter() - started
+
+
+def summarize(samples, elapsed):
+    latencies = sorted(seconds for _, seconds, _, _ in samples)
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return {
+        'requests': len(samples),
+        'errors': sum(1 for _, _, ok, _ in samples if not ok),
+        'throughput_rps': round(len(samples) / elapsed, 2),
+        'mean_ms': round(statistics.fmean(latencies) * 1000, 3),
+        'p50_ms': round(quantiles[49] * 1000, 3),
+        'p95_ms': round(quantiles[94] * 1000, 3),
+        'p99_ms': round(quantiles[98] * 1000, 3),
+        'mean_bytes': round(statistics.fmean(size for _, _, _, size in samples)),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(result, previous=None):
+    print(f"{'route':<45} {'req':>6} {'err':>4} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    rows = [('overall', result['overall'])] + sorted(result['routes'].items())
+    for route, stats in rows:
+        line = (
+            f"{route:<45} {stats['requests']:>6} {stats['errors']:>4} {stats['throughput_rps']:>8.1f} "
+            f"{stats['p50_ms']:>8.1f} {stats['p95_ms']:>8.1f} {stats['p99_ms']:>8.1f}"
+        )
+        before = (previous or {}).get('overall' if route == 'overall' else 'routes', {})
+        before = before if route == 'overall' else before.get(route)
+        if before:
+            change = (stats['p95_ms'] - before['p95_ms']) / before['p95_ms'] * 100 if before['p95_ms'] else 0.0
+            line += f"   p95 {change:+.1f}%"
+        print(line)
+
+
+async def run(args):
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=args.timeout) as client:
+        team_ids, country_ids = await discover_ids(client)
+        rng = random.Random(args.seed)
+        mix = RequestMix(args.mix, sorted(team_ids), sorted(country_ids), rng)
+        if args.warmup:
+            await replay(client, mix.draw(args.warmup), args.concurrency)
+        samples, elapsed = await replay(client, mix.draw(args.requests), args.concurrency)
+
+    by_route = defaultdict(list)
+    for sample in samples:
+        by_route[sample[0]].append(sample)
+    return {
+        'meta': {
+            'label': args.label,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'commit': git_commit(),
+            'base_url': args.base_url,
+            'scale': args.scale,
+            'mix': args.mix,
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+            'seed': args.seed,
+            'elapsed_s': round(elapsed, 3),
+        },
+        'overall': summarize(samples, elapsed),
+        'routes': {route: summarize(route_samples, elapsed) for route, route_samples in by_route.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base-url', default='http://127.0.0.1:5000')
+    parser.add_argument('--mix', choices=['pageload', 'variants', 'all'], default='all')
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--warmup', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--scale', type=int, help='Dataset scale passed to seed.py, recorded in the results')
+    parser.add_argument('--label', default='run')
+    parser.add_argument('--timeout', type=float, default=60)
+    parser.add_argument('--output', default=RESULTS_DIR, help='Directory of result files')
+    parser.add_argument('--compare', help='Previous result file to compare p95 latencies with')
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+    print_report(result, previous)
+
+    os.makedirs(args.output, exist_ok=True)
+    path = os.path.join(args.output, f"{time.strftime('%Y%m%d-%H%M%S')}-{args.label}.json")
+    with open(path, 'w') as f:
+        json.dump(result, f, indent=2)
+    print(f"Results written to {path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+"""
+Seeds a local PostgreSQL database with a synthetic dataset shaped like the
+real one (national_teams, teams, team_yearly_stats), then builds the indexes,
+derived tables and data_version exactly like json_to_postgresql/psql_database.ipynb.
+
+Scale 1 matches the real dataset (~1k clubs x 11 seasons); 10 and 100 multiply
+the number of clubs. The data is generated from --seed, so runs are reproducible.
+
+    createdb football_bench
+    python benchmarks/seed.py --dsn "dbname=football_bench" --scale 10
+
+Existing API tables in the target database are dropped; databases whose name
+does not contain "bench" are refused unless --force is given.
+"""
+import argparse
+import io
+import os
+import random
+import sys
+
+import psycopg2
+
+SQL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'json_to_postgresql')
+
+NATIONAL_TEAMS = 200
+CLUBS_PER_SCALE = 1000
+YEARS = range(2014, 2025)
+NULL_SHARE = 0.08
+
+SCHEMA = """
+DROP MATERIALIZED VIEW IF EXISTS aggregate_cube;
+DROP MATERIALIZED VIEW IF EXISTS country_yearly_stats;
+DROP TABLE IF EXISTS team_yearly_stats, teams, national_teams, data_version;
+
+CREATE TABLE national_teams (
+    national_team_id INT PRIMARY KEY,
+    national_team_name VARCHAR(100) NOT NULL
+);
+
+CREATE TABLE teams (
+    team_id INT PRIMARY KEY,
+    team_name VARCHAR(100) NOT NULL,
+    number_of_cups INT,
+    image_link TEXT,
+    national_team_id INT REFERENCES national_teams(national_team_id)
+);
+
+CREATE TABLE team_yearly_stats (
+    team_id INT REFERENCES teams(team_id),
+    year INT,
+    average_points DECIMAL(3,2),
+    average_age DECIMAL(3,1),
+    number_of_titles_this_year INT,
+    team_cost INT,
+    team_size_ratio DECIMAL(4,2),
+    players_in_national_team INT,
+    legionnaires INT,
+    transfer_balance INT,
+    PRIMARY KEY (team_id, year)
+);
+"""
+
+DATA_VERSION = """
+CREATE TABLE data_version (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    version BIGINT NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+INSERT INTO data_version (id, version, updated_at) VALUES (TRUE, 1, now());
+"""
+
+
+def maybe_null(rng, value):
+    return None if rng.random() < NULL_SHARE else value
+
+
+def generate(scale, seed):
+    """
+    Returns:
+        tuple: (national_teams, teams, team_yearly_stats) as lists of row tuples
+    """
+    rng = random.Random(seed)
+
+    national_teams = [(3000 + i, f"Country {i}") for i in range(NATIONAL_TEAMS)]
+    # Few countries have many clubs, most have a handful (as in the real data)
+    weights = [1 / (rank + 1) for rank in range(NATIONAL_TEAMS)]
+    countries = rng.choices([team_id for team_id, _ in national_teams], weights=weights, k=CLUBS_PER_SCALE * scale)
+
+    teams, stats = [], []
+    for index, country in enumerate(countries):
+        team_id = index + 1
+        teams.append((
+            team_id, f"Club {team_id}", maybe_null(rng, rng.randint(0, 60)),
+            f"https://example.org/clubs/{team_id}.png", country
+        ))
+        strength = rng.random()
+        for year in YEARS:
+            if rng.random() < 0.1:
+                continue
+            stats.append((
+                team_id, year,
+                maybe_null(rng, f"{0.3 + 2.5 * strength * rng.uniform(0.8, 1.1):.2f}"),
+                maybe_null(rng, f"{rng.uniform(21, 30):.1f}"),
+                maybe_null(rng, rng.choices([0, 1, 2], weights=[85, 12, 3])[0]),
+                maybe_null(rng, int(1e6 + strength ** 3 * 1.2e9 * rng.uniform(0.8, 1.2))),
+                maybe_null(rng, f"{rng.uniform(0.5, 3):.2f}"),
+                maybe_null(rng, int(strength * 20 * rng.random())),
+                maybe_null(rng, rng.randint(0, 30)),
+                maybe_null(rng, int(rng.gauss(0, 2e7 + strength * 1e8))),
+            ))
+    return national_teams, teams, stats
+
+
+def copy_rows(cur, table, rows):
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write('\t'.join(r'\N' if value is None else str(value) for value in row) + '\n')
+    buffer.seek(0)
+    cur.copy_expert(f"COPY {table} FROM STDIN", buffer)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dsn', default=os.getenv('BENCH_DSN', 'dbname=football_bench'))
+    parser.add_argument('--scale', type=int, choices=[1, 10, 100], default=1)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--read-only-user', help='Role to grant SELECT on all API tables to')
+    parser.add_argument('--force', action='store_true', help='Allow databases whose name does not contain "bench"')
+    args = parser.parse_args()
+
+    national_teams, teams, stats = generate(args.scale, args.seed)
+
+    conn = psycopg2.connect(args.dsn)
+    try:
+        with conn, conn.cursor() as cur:
+            cur.execute("SELECT current_database()")
+            database = cur.fetchone()[0]
+            if 'bench' not in database and not args.force:
+                sys.exit(f"Refusing to drop the API tables of database {database!r} without --force")
+
+            cur.execute(SCHEMA)
+            copy_rows(cur, 'national_teams', national_teams)
+            copy_rows(cur, 'teams', teams)
+            copy_rows(cur, 'team_yearly_stats', stats)
+            for name in ('indexes.sql', 'derived_tables.sql'):
+                with open(os.path.join(SQL_DIR, name)) as f:
+                    cur.execute(f.read())
+            cur.execute(DATA_VERSION)
+            cur.execute("ANALYZE")
+            if args.read_only_user:
+                cur.execute(
+                    "GRANT SELECT ON national_teams, teams, team_yearly_stats, data_version, "
+                    f"country_yearly_stats, aggregate_cube TO {args.read_only_user}"
+                )
+    finally:
+        conn.close()
+
+    print(f"Seeded {database}: scale {args.scale}, {len(national_teams)} national teams, "
+          f"{len(teams)} clubs, {len(stats)} yearly stats rows")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+Micro-benchmark of the row serialization pipeline, without a database.
+
+Compares the previous path (RealDictCursor rows with Decimal values, a
+key_mapping lookup and an isinstance() check per cell, stdlib JSON with
+sorted keys as in jsonify()) with the current one (tuples with float8 values
+cast in SQL, a precompiled formats.rows.RowEncoder and formats.encode_json(),
+which uses orjson when installed). Both must produce the same JSON document.
+
+    python benchmarks/serialization.py --rows 10000 --repeat 50
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+from formats import encode_json, orjson  # noqa: E402
+from formats.rows import RowEncoder  # noqa: E402
+from routes.api import key_mapping  # noqa: E402
+
+# /team_yearly_stats with all metrics: (name, type OID)
+DESCRIPTION = (
+    ('team_id', 23), ('year', 23), ('average_points', 701), ('number_of_titles_this_year', 23),
+    ('players_in_national_team', 23), ('team_cost', 23), ('transfer_balance', 23),
+    ('legioners', 23), ('average_age', 701), ('team_size_ratio', 701),
+)
+
+
+def generate(count, seed):
+    """
+    Returns:
+        tuple: (dict rows with Decimal values, tuple rows with float values)
+    """
+    rng = random.Random(seed)
+    dict_rows, tuple_rows = [], []
+    for index in range(count):
+        row = {
+            'team_id': index // 11 + 1,
+            'year': 2014 + index % 11,
+            'average_points': Decimal(f"{rng.uniform(0.3, 2.8):.2f}"),
+            'number_of_titles_this_year': rng.choice([0, 0, 0, 1, None]),
+            'players_in_national_team': rng.randint(0, 20),
+            'team_cost': rng.randint(10 ** 6, 10 ** 9),
+            'transfer_balance': rng.randint(-10 ** 8, 10 ** 8),
+            'legioners': rng.randint(0, 30),
+            'average_age': Decimal(f"{rng.uniform(21, 30):.1f}"),
+            'team_size_ratio': rng.choice([Decimal(f"{rng.uniform(0.5, 3):.2f}"), None]),
+        }
+        dict_rows.append(row)
+        tuple_rows.append(tuple(
+            float(value) if isinstance(value, Decimal) else value
+            for value in (row[name] for name, _ in DESCRIPTION)
+        ))
+    return dict_rows, tuple_rows
+
+
+def previous_path(rows):
+    data = []
+    for row in rows:
+        new_row = {}
+        for key, value in row.items():
+            camel_key = key_mapping.get(key, key)
+            if isinstance(value, Decimal):
+                new_row[camel_key] = float(value)
+            else:
+                new_row[camel_key] = value
+        data.append(new_row)
+    return (json.dumps(data, sort_keys=True, separators=(',', ':')) + '\n').encode()
+
+
+def current_path(rows):
+    encoder = RowEncoder(DESCRIPTION, key_mapping)
+    return encode_json(encoder.to_dicts(rows), sort_keys=False)
+
+
+def timed(fn, rows, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn(rows)
+    return (time.perf_counter() - started) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    dict_rows, tuple_rows = generate(args.rows, args.seed)
+    if json.loads(previous_path(dict_rows)) != json.loads(current_path(tuple_rows)):
+        sys.exit("The serialization paths produce different documents")
+
+    previous = timed(previous_path, dict_rows, args.repeat)
+    current = timed(current_path, tuple_rows, args.repeat)
+    print(f"JSON backend: {'orjson' if orjson is not None else 'json (stdlib)'}")
+    print(f"previous: {previous * 1000:8.2f} ms per {args.rows} rows")
+    print(f"current:  {current * 1000:8.2f} ms per {args.rows} rows ({previous / current:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
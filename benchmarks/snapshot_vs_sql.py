@@ -0,0 +1,104 @@
+"""
+Compares the SQL and the snapshot query backends in-process.
+
+Every case is requested through the Flask test client with QUERY_BACKEND=sql
+and QUERY_BACKEND=snapshot (response cache disabled). Every case must succeed
+and its response bodies and pagination headers must be byte-identical; the
+script reports the mean time per request of both backends and exits with
+status 1 on any mismatch or failed case.
+
+    cd app
+    python ../benchmarks/snapshot_vs_sql.py --repeat 200
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+os.environ['CACHE_BACKEND'] = 'none'
+
+from app import app  # noqa: E402
+from config import Config  # noqa: E402
+
+CASES = [
+    '/api/team_yearly_stats',
+    '/api/team_yearly_stats?metrics=team_cost,average_age&year=2020&sort_by=team_cost&order=desc',
+    '/api/average_points_per_team?sort_by=average_points&order=desc&limit=50',
+    '/api/average_age_per_team?exclude_nulls=true&sort_by=average_age&limit=100&offset=200',
+    '/api/transfer_balance?team_id=3',
+    '/api/legionnaires_per_team?exclude_null_fields=legioners&sort_by=legioners',
+    '/api/full_players_costs?year=2020&sort_by=total_country_cost&order=desc',
+    '/api/total_average_age?sort_by=average_age_among_clubs',
+    '/api/club_info?sort_by=team_name',
+    '/api/club_info?national_team_id=3262&order=desc',
+    '/api/country_info?sort_by=national_team_name&order=desc',
+    '/api/team_yearly_stats?format=columns&sort_by=team_size_ratio',
+]
+
+
+def request(client, backend, url):
+    Config.QUERY_BACKEND = backend
+    response = client.get(url)
+    return response.status_code, response.get_data(), response.headers.get('X-Next-Cursor')
+
+
+def follow_cursor(client, backend, url, pages):
+    """Fetches up to `pages` pages of a limited request through the keyset cursor."""
+    results = []
+    for _ in range(pages):
+        status, body, next_cursor = request(client, backend, url)
+        results.append((status, body, next_cursor))
+        if next_cursor is None:
+            break
+        url = f"{url.split('&cursor=')[0]}&cursor={next_cursor}"
+    return results
+
+
+def timed(client, backend, url, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        request(client, backend, url)
+    return (time.perf_counter() - started) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=100, help='Timed requests per case and backend')
+    args = parser.parse_args()
+
+    client = app.test_client()
+    mismatches = 0
+
+    print(f"{'case':<90} {'sql ms':>8} {'snap ms':>8} {'speedup':>8}")
+    for url in CASES:
+        sql = request(client, 'sql', url)
+        snapshot = request(client, 'snapshot', url)
+        if sql != snapshot:
+            mismatches += 1
+            print(f"MISMATCH {url}")
+            continue
+        if sql[0] != 200:
+            # Errors of both backends compare equal without comparing any data
+            mismatches += 1
+            print(f"FAILED {url}: {sql[0]} {sql[1].decode(errors='replace').strip()}")
+            continue
+        sql_time = timed(client, 'sql', url, args.repeat)
+        snapshot_time = timed(client, 'snapshot', url, args.repeat)
+        print(f"{url:<90} {sql_time * 1000:>8.2f} {snapshot_time * 1000:>8.2f} {sql_time / snapshot_time:>7.1f}x")
+
+    paginated = '/api/team_yearly_stats?sort_by=average_points&order=desc&limit=500'
+    if follow_cursor(client, 'sql', paginated, 30) != follow_cursor(client, 'snapshot', paginated, 30):
+        mismatches += 1
+        print(f"MISMATCH cursor pages of {paginated}")
+
+    Config.QUERY_BACKEND = 'snapshot'
+    stats = client.get('/admin/cache').get_json().get('snapshot')
+    print(f"snapshot engine: {stats}")
+    if mismatches:
+        print(f"{mismatches} responses differ between backends")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Measures the cold start of an API worker with and without a prebuilt Swagger spec.
+
+Every run starts a fresh interpreter that imports the Flask application and
+requests /apispec_1.json and /apidocs/ once through the test client, as the
+first visitor of the documentation after a deploy would. The spec is built
+once with build_apispec() into a temporary file for the prebuilt runs;
+both modes must serve the same spec.
+
+    python benchmarks/startup.py --runs 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app')
+
+BUILD = """
+import json, sys
+from app import app
+from apispec import build_apispec
+with app.app_context():
+    spec = build_apispec(app)
+with open(sys.argv[1], 'w') as f:
+    json.dump(spec, f, sort_keys=True)
+"""
+
+COLD_START = """
+import json, time
+started = time.perf_counter()
+from app import app
+imported = time.perf_counter()
+client = app.test_client()
+spec = client.get('/apispec_1.json')
+first_spec = time.perf_counter()
+ui = client.get('/apidocs/')
+print(json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'first_spec_ms': (first_spec - imported) * 1000,
+    'status': [spec.status_code, ui.status_code],
+    'spec': spec.get_json(),
+}))
+"""
+
+
+def run(code, env, *args):
+    result = subprocess.run(
+        [sys.executable, '-c', code, *args], cwd=APP_DIR, env=env,
+        capture_output=True, text=True, check=True
+    )
+    return result.stdout
+
+
+def cold_starts(env, runs):
+    samples = [json.loads(run(COLD_START, env).splitlines()[-1]) for _ in range(runs)]
+    if any(sample['status'] != [200, 200] for sample in samples):
+        sys.exit(f"Unexpected status codes: {[sample['status'] for sample in samples]}")
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10, help='Cold starts per mode')
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.pop('SWAGGER_SPEC_FILE', None)
+    with tempfile.TemporaryDirectory() as directory:
+        spec_file = os.path.join(directory, 'apispec.json')
+        run(BUILD, env, spec_file)
+        results = {
+            'docstrings': cold_starts(env, args.runs),
+            'prebuilt': cold_starts(dict(env, SWAGGER_SPEC_FILE=spec_file), args.runs),
+        }
+
+    if results['docstrings'][0]['spec'] != results['prebuilt'][0]['spec']:
+        sys.exit("The prebuilt spec differs from the spec parsed from the docstrings")
+
+    print(f"{'mode':<12} {'import ms':>10} {'first spec ms':>14} {'total ms':>10}   (medians of {args.runs} runs)")
+    totals = {}
+    for mode, samples in results.items():
+        imported = statistics.median(sample['import_ms'] for sample in samples)
+        first_spec = statistics.median(sample['first_spec_ms'] for sample in samples)
+        totals[mode] = statistics.median(sample['import_ms'] + sample['first_spec_ms'] for sample in samples)
+        print(f"{mode:<12} {imported:>10.1f} {first_spec:>14.1f} {totals[mode]:>10.1f}")
+    print(f"prebuilt spec saves {totals['docstrings'] - totals['prebuilt']:.1f} ms per worker")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+-- Aggregates derived from teams, team_yearly_stats and national_teams.
+-- Created once and refreshed by psql_database.ipynb after every data load.
+
+-- Per-country, per-year totals served by the heatmap endpoints
+-- (/full_players_costs, /average_team_cost, /legionnaires_total_amount,
+-- /total_average_age, /national_teams_players_total_amount).
+-- Rows exist for every national_team_id of teams: /national_teams_players_total_amount
+-- counts the players of all of them, the other endpoints only serve countries
+-- of national_teams (`in_national_teams`).
+-- A view created before `in_national_teams` existed is recreated; otherwise it is
+-- kept, so that psql_database.ipynb can refresh it CONCURRENTLY.
+DO $$
+BEGIN
+    IF to_regclass('country_yearly_stats') IS NOT NULL AND NOT EXISTS (
+        SELECT 1 FROM pg_attribute
+        WHERE attrelid = to_regclass('country_yearly_stats') AND attname = 'in_national_teams'
+    ) THEN
+        DROP MATERIALIZED VIEW country_yearly_stats;
+    END IF;
+END $$;
+CREATE MATERIALIZED VIEW IF NOT EXISTS country_yearly_stats AS
+SELECT
+    t.national_team_id,
+    tys.year,
+    n.national_team_id IS NOT NULL AS in_national_teams,
+    SUM(tys.team_cost) AS total_country_cost,
+    SUM(tys.team_cost) / COUNT(t.team_id) AS team_cost,
+    SUM(tys.legionnaires) AS total_legionnaires_amount,
+    SUM(tys.average_age) / COUNT(tys.average_age) AS average_age_among_clubs,
+    SUM(tys.players_in_national_team) AS national_players_count
+FROM teams t
+JOIN team_yearly_stats tys ON t.team_id = tys.team_id
+LEFT JOIN national_teams n ON t.national_team_id = n.national_team_id
+WHERE t.national_team_id IS NOT NULL
+GROUP BY t.national_team_id, tys.year, n.national_team_id;
+
+-- Unique index is required by REFRESH MATERIALIZED VIEW CONCURRENTLY
+CREATE UNIQUE INDEX IF NOT EXISTS country_yearly_stats_pkey
+    ON country_yearly_stats (national_team_id, year);
+CREATE INDEX IF NOT EXISTS country_yearly_stats_year_idx
+    ON country_yearly_stats (year);
+
+-- Rollup cube of team_yearly_stats served by /api/aggregate.
+-- One row per group of every grouping set; `grouping_set` is the GROUPING()
+-- bitmask of (national_team_id, team_id, year), a set bit meaning "rolled up":
+--   2 = country x year, 3 = country, 6 = year, 4 = club x year, 7 = total.
+-- For every measure the sum, non-NULL count, minimum and maximum are stored,
+-- averages are derived as sum / count.
+-- Every team_yearly_stats row counts towards the club, year and total sets,
+-- also of clubs without a teams row or country; the country sets only hold
+-- countries of national_teams, like country_yearly_stats.
+-- Recreated on every load so that databases created with an earlier definition
+-- pick up changes; psql_database.ipynb runs this file in one transaction and
+-- grants access again afterwards.
+DROP MATERIALIZED VIEW IF EXISTS aggregate_cube;
+CREATE MATERIALIZED VIEW IF NOT EXISTS aggregate_cube AS
+SELECT
+    GROUPING(n.national_team_id, tys.team_id, tys.year) AS grouping_set,
+    n.national_team_id,
+    tys.team_id,
+    tys.year,
+    SUM(tys.team_cost) AS sum_team_cost,
+    COUNT(tys.team_cost) AS count_team_cost,
+    MIN(tys.team_cost) AS min_team_cost,
+    MAX(tys.team_cost) AS max_team_cost,
+    SUM(tys.legionnaires) AS sum_legionnaires,
+    COUNT(tys.legionnaires) AS count_legionnaires,
+    MIN(tys.legionnaires) AS min_legionnaires,
+    MAX(tys.legionnaires) AS max_legionnaires,
+    SUM(tys.average_age) AS sum_average_age,
+    COUNT(tys.average_age) AS count_average_age,
+    MIN(tys.average_age) AS min_average_age,
+    MAX(tys.average_age) AS max_average_age,
+    SUM(tys.players_in_national_team) AS sum_players_in_national_team,
+    COUNT(tys.players_in_national_team) AS count_players_in_national_team,
+    MIN(tys.players_in_national_team) AS min_players_in_national_team,
+    MAX(tys.players_in_national_team) AS max_players_in_national_team,
+    SUM(tys.average_points) AS sum_average_points,
+    COUNT(tys.average_points) AS count_average_points,
+    MIN(tys.average_points) AS min_average_points,
+    MAX(tys.average_points) AS max_average_points,
+    SUM(tys.number_of_titles_this_year) AS sum_number_of_titles_this_year,
+    COUNT(tys.number_of_titles_this_year) AS count_number_of_titles_this_year,
+    MIN(tys.number_of_titles_this_year) AS min_number_of_titles_this_year,
+    MAX(tys.number_of_titles_this_year) AS max_number_of_titles_this_year,
+    SUM(tys.team_size_ratio) AS sum_team_size_ratio,
+    COUNT(tys.team_size_ratio) AS count_team_size_ratio,
+    MIN(tys.team_size_ratio) AS min_team_size_ratio,
+    MAX(tys.team_size_ratio) AS max_team_size_ratio,
+    SUM(tys.transfer_balance) AS sum_transfer_balance,
+    COUNT(tys.transfer_balance) AS count_transfer_balance,
+    MIN(tys.transfer_balance) AS min_transfer_balance,
+    MAX(tys.transfer_balance) AS max_transfer_balance
+FROM team_yearly_stats tys
+LEFT JOIN teams t ON t.team_id = tys.team_id
+LEFT JOIN national_teams n ON n.national_team_id = t.national_team_id
+GROUP BY GROUPING SETS (
+    (n.national_team_id, tys.year),
+    (n.national_team_id),
+    (tys.year),
+    (tys.team_id, tys.year),
+    ()
+)
+HAVING GROUPING(n.national_team_id) = 1 OR n.national_team_id IS NOT NULL;
+
+-- Rolled-up dimensions are NULL, so the cube is refreshed without CONCURRENTLY
+-- (which requires a unique index)
+CREATE INDEX IF NOT EXISTS aggregate_cube_grouping_idx
+    ON aggregate_cube (grouping_set, national_team_id, team_id, year);
@@ -0,0 +1,8 @@
+-- Indexes on the base tables backing the API's filters.
+-- team_id filters use the (team_id, year) primary key of team_yearly_stats.
+CREATE INDEX IF NOT EXISTS team_yearly_stats_year_idx
+    ON team_yearly_stats (year);
+-- Also selects the clubs of a country for /country/<national_team_id>/clubs,
+-- whose yearly rows are then read through the (team_id, year) primary key.
+CREATE INDEX IF NOT EXISTS teams_national_team_id_idx
+    ON teams (national_team_id);
@@ -0,0 +1,61 @@
+import os
+import sys
+
+import psycopg2
+import pytest
+
+# The API modules import each other by flat names (`from config import Config`), as when run from app/
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app')
+sys.path.insert(0, os.path.normpath(APP_DIR))
+
+from config import Config  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def postgres():
+    """Skips the test unless the PostgreSQL database configured in .env (DB_*) is reachable."""
+    try:
+        psycopg2.connect(
+            database=Config.DB_NAME,
+            user=Config.DB_READ_ONLY_USER,
+            password=Config.DB_READ_ONLY_USER_PASSWORD,
+            host=Config.DB_HOST,
+            port=Config.DB_PORT,
+            connect_timeout=3
+        ).close()
+    except psycopg2.Error:
+        pytest.skip('PostgreSQL is not reachable, see DB_* in .env')
+
+
+@pytest.fixture(scope='session')
+def parquet_dataset(tmp_path_factory):
+    """Directory of the Parquet dataset built from the analysis files, see db.embedded.build_parquet()."""
+    pytest.importorskip('duckdb')
+    from db.embedded import ANALYSIS_DIR, build_parquet
+
+    directory = tmp_path_factory.mktemp('parquet')
+    build_parquet(ANALYSIS_DIR, str(directory))
+    return str(directory)
+
+
+@pytest.fixture(scope='session')
+def embedded_database(parquet_dataset):
+    from db.embedded import EmbeddedDatabase
+
+    return EmbeddedDatabase(parquet_dataset)
+
+
+@pytest.fixture(scope='module')
+def embedded_client(parquet_dataset):
+    """Test client of the API served from the Parquet dataset, without response cache or coalescing."""
+    import db.embedded
+    from app import app
+
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(Config, 'DB_BACKEND', 'duckdb')
+        patch.setattr(Config, 'EMBEDDED_DATA_DIR', parquet_dataset)
+        patch.setattr(Config, 'CACHE_BACKEND', 'none')
+        patch.setattr(Config, 'SINGLEFLIGHT', 'off')
+        patch.setattr(Config, 'DATA_VERSION_CHECK_INTERVAL', 0)
+        patch.setattr(db.embedded, '_database', None)
+        yield app.test_client()
@@ -0,0 +1,58 @@
+import pytest
+
+# Measures of aggregate_cube, see json_to_postgresql/derived_tables.sql
+MEASURES = [
+    'team_cost', 'legionnaires', 'average_age', 'players_in_national_team', 'average_points',
+    'number_of_titles_this_year', 'team_size_ratio', 'transfer_balance',
+]
+
+# grouping_set -> (dimensions, source): the club, year and total sets cover every
+# team_yearly_stats row, the country sets the clubs of countries in national_teams
+GROUPING_SETS = {
+    2: (['n.national_team_id', 'tys.year'], 'inner'),
+    3: (['n.national_team_id'], 'inner'),
+    4: (['tys.team_id', 'tys.year'], 'all'),
+    6: (['tys.year'], 'all'),
+    7: ([], 'all'),
+}
+
+SOURCES = {
+    'all': 'team_yearly_stats tys',
+    'inner': (
+        'team_yearly_stats tys JOIN teams t ON t.team_id = tys.team_id '
+        'JOIN national_teams n ON n.national_team_id = t.national_team_id'
+    ),
+}
+
+CUBE_COLUMNS = {'n.national_team_id': 'national_team_id', 'tys.team_id': 'team_id', 'tys.year': 'year'}
+
+
+def aggregates(prefix):
+    return ', '.join(
+        f'{function}({prefix}{measure})' if prefix == 'tys.' else f'{function}_{measure}'
+        for measure in MEASURES
+        for function in ('sum', 'count', 'min', 'max')
+    )
+
+
+@pytest.mark.parametrize('grouping_set', sorted(GROUPING_SETS))
+def test_cube_matches_base_table(embedded_database, grouping_set):
+    dimensions, source = GROUPING_SETS[grouping_set]
+    group_by = f"GROUP BY {', '.join(dimensions)}" if dimensions else ''
+    expected, _ = embedded_database.execute(
+        f"SELECT {', '.join(dimensions + [aggregates('tys.')])} FROM {SOURCES[source]} {group_by}"
+    )
+    cube_dimensions = [CUBE_COLUMNS[dimension] for dimension in dimensions]
+    actual, _ = embedded_database.execute(
+        f"SELECT {', '.join(cube_dimensions + [aggregates('')])} FROM aggregate_cube WHERE grouping_set = %s",
+        [grouping_set]
+    )
+    assert sorted(actual, key=repr) == sorted(expected, key=repr)
+
+
+def test_totals_cover_every_row(embedded_database):
+    (total, rows), = embedded_database.execute("SELECT SUM(team_cost), COUNT(*) FROM team_yearly_stats")[0]
+    (cube_total,), = embedded_database.execute("SELECT sum_team_cost FROM aggregate_cube WHERE grouping_set = 7")[0]
+    (club_years,), = embedded_database.execute("SELECT COUNT(*) FROM aggregate_cube WHERE grouping_set = 4")[0]
+    assert cube_total == total
+    assert club_years == rows
@@ -0,0 +1,45 @@
+"""
+Requests every case of benchmarks/duckdb_vs_postgres.py from both storage
+backends and requires identical or equivalent responses. PostgreSQL has to be
+configured in .env and loaded from the same analysis/ outputs the Parquet
+dataset is built from (json_to_postgresql/psql_database.ipynb); the tests are
+skipped when it is unreachable.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks'))
+
+from config import Config  # noqa: E402
+from duckdb_vs_postgres import CASES, compare, follow_cursor, request  # noqa: E402
+
+
+@pytest.fixture(scope='module')
+def client(postgres, parquet_dataset):
+    import db.embedded
+    from app import app
+
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(Config, 'CACHE_BACKEND', 'none')
+        patch.setattr(Config, 'SINGLEFLIGHT', 'off')
+        # Re-read the data version of the active backend on every request
+        patch.setattr(Config, 'DATA_VERSION_CHECK_INTERVAL', 0)
+        patch.setattr(Config, 'DB_BACKEND', Config.DB_BACKEND)
+        patch.setattr(Config, 'EMBEDDED_DATA_DIR', parquet_dataset)
+        patch.setattr(db.embedded, '_database', None)
+        yield app.test_client()
+
+
+@pytest.mark.parametrize('url', CASES)
+def test_backends_respond_alike(client, url):
+    postgres = request(client, 'postgres', url)
+    duckdb = request(client, 'duckdb', url)
+    assert postgres[0] == 200
+    assert compare(postgres, duckdb) in ('identical', 'equivalent')
+
+
+def test_cursor_pages_are_identical(client):
+    url = '/api/team_yearly_stats?sort_by=average_points&order=desc&limit=500'
+    assert follow_cursor(client, 'postgres', url, 30) == follow_cursor(client, 'duckdb', url, 30)
@@ -0,0 +1,104 @@
+import pytest
+from werkzeug.datastructures import MultiDict
+
+from commands import SAMPLE_FILTERS, explain_filters
+from routes.api import COUNTRY_INFO_QUERY, QUERY_ROUTES, country_clubs_query
+from routes.query import build_query, encode_cursor
+
+# Routes filtered by each of the key columns they select, as `flask explain-filters` plans them
+KEY_FILTERS = [
+    (rule, field)
+    for rule, query in QUERY_ROUTES.items()
+    for field in SAMPLE_FILTERS
+    if field in query.fields
+]
+
+
+def split(sql):
+    """
+    Returns:
+        tuple: (inner WHERE clause before any GROUP BY, outer WHERE clause), '' when absent
+    """
+    inner, outer = sql.split(') AS subquery')
+    inner = inner.split('GROUP BY')[0]
+    inner_where = inner.split('WHERE', 1)[1] if 'WHERE' in inner else ''
+    outer_where = outer.split('ORDER BY')[0].split('WHERE', 1)[1] if 'WHERE' in outer else ''
+    return inner_where, outer_where
+
+
+@pytest.mark.parametrize('rule, field', KEY_FILTERS)
+def test_key_filters_are_applied_before_aggregation(rule, field):
+    query = QUERY_ROUTES[rule]
+    sql, params, error, _ = build_query(query, MultiDict({field: SAMPLE_FILTERS[field]}))
+
+    assert error is None
+    inner_where, outer_where = split(sql)
+    assert f"{query.expressions[field]} = %s" in inner_where
+    assert outer_where == ''
+    assert params == query.params + [SAMPLE_FILTERS[field]]
+
+
+def test_aggregate_conditions_are_applied_to_the_result():
+    args = MultiDict([('national_team_id', 3262), ('exclude_null_fields', 'club_ids')])
+    sql, params, error, _ = build_query(COUNTRY_INFO_QUERY, args)
+
+    assert error is None
+    inner_where, outer_where = split(sql)
+    assert 'nt.national_team_id = %s' in inner_where
+    assert 'ARRAY_AGG' not in inner_where
+    assert outer_where.strip() == 'club_ids IS NOT NULL'
+    assert params == [3262]
+
+
+def test_exclude_nulls_splits_by_column():
+    sql, _, error, _ = build_query(COUNTRY_INFO_QUERY, MultiDict({'exclude_nulls': 'true'}))
+
+    assert error is None
+    inner_where, outer_where = split(sql)
+    assert 'nt.national_team_id IS NOT NULL' in inner_where
+    assert 'nt.national_team_name IS NOT NULL' in inner_where
+    assert outer_where.strip() == 'club_ids IS NOT NULL'
+
+
+def test_filter_parameters_follow_fixed_parameters():
+    query, error = country_clubs_query(3262, MultiDict({'metrics': 'team_cost'}))
+    assert error is None
+    sql, params, error, _ = build_query(query, MultiDict({'year': 2020}))
+
+    assert error is None
+    inner_where, _ = split(sql)
+    assert inner_where.index('t.national_team_id = %s') < inner_where.index('tys.year = %s')
+    assert params == [3262, 2020]
+
+
+def test_cursor_condition_is_applied_to_the_result():
+    query = QUERY_ROUTES['/total_team_cost']
+    cursor = encode_cursor({'team_cost': 1000, 'team_id': 3, 'year': 2020}, 'team_cost', 'desc', query.key_fields)
+    args = MultiDict({'team_id': 3, 'sort_by': 'team_cost', 'order': 'desc', 'cursor': cursor})
+    sql, params, error, _ = build_query(query, args)
+
+    assert error is None
+    inner_where, outer_where = split(sql)
+    assert 'team_id = %s' in inner_where
+    assert 'team_cost <' in outer_where
+    assert params == [3, 1000, 1000, 3, 2020]
+
+
+def test_key_filters_use_indexes(postgres):
+    for rule, field, used_indexes in explain_filters():
+        assert used_indexes, f"{rule}?{field}= is not answered with an index"
+
+
+@pytest.mark.parametrize('argument', ['limit', 'offset'])
+def test_negative_pagination_is_rejected(argument):
+    sql, params, error, status = build_query(QUERY_ROUTES['/club_info'], MultiDict({argument: '-1'}))
+
+    assert (sql, params, status) == (None, None, 400)
+    assert argument in error
+
+
+def test_negative_limit_is_answered_with_json(embedded_client):
+    response = embedded_client.get('/api/club_info?limit=-1')
+
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
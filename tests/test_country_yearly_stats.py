@@ -0,0 +1,73 @@
+import pytest
+
+from routes.api import (
+    AVERAGE_TEAM_COST_QUERY, FULL_PLAYERS_COSTS_QUERY, LEGIONNAIRES_TOTAL_AMOUNT_QUERY,
+    NATIONAL_TEAMS_PLAYERS_TOTAL_AMOUNT_QUERY, TOTAL_AVERAGE_AGE_QUERY
+)
+
+COUNTRY_JOIN = """
+    FROM teams t
+    JOIN team_yearly_stats tys ON t.team_id = tys.team_id
+    JOIN national_teams n ON t.national_team_id = n.national_team_id
+    GROUP BY n.national_team_id, tys.year
+"""
+
+# Queries of the heatmap endpoints before they were served from country_yearly_stats
+BASELINES = {
+    'total_country_cost': (FULL_PLAYERS_COSTS_QUERY, f"""
+        SELECT n.national_team_id, tys.year, SUM(tys.team_cost) {COUNTRY_JOIN}
+    """),
+    'team_cost': (AVERAGE_TEAM_COST_QUERY, f"""
+        SELECT n.national_team_id, tys.year, SUM(tys.team_cost) / COUNT(t.team_id) {COUNTRY_JOIN}
+    """),
+    'total_legionnaires_amount': (LEGIONNAIRES_TOTAL_AMOUNT_QUERY, f"""
+        SELECT n.national_team_id, tys.year, SUM(tys.legionnaires) {COUNTRY_JOIN}
+    """),
+    'average_age_among_clubs': (TOTAL_AVERAGE_AGE_QUERY, f"""
+        SELECT n.national_team_id, tys.year, SUM(tys.average_age) / COUNT(tys.average_age) {COUNTRY_JOIN}
+    """),
+    'national_players_count': (NATIONAL_TEAMS_PLAYERS_TOTAL_AMOUNT_QUERY, """
+        SELECT t.national_team_id, tys.year, SUM(tys.players_in_national_team)
+        FROM teams t
+        JOIN team_yearly_stats tys ON t.team_id = tys.team_id
+        WHERE t.national_team_id IS NOT NULL
+        GROUP BY t.national_team_id, tys.year
+    """),
+}
+
+
+@pytest.mark.parametrize('column', sorted(BASELINES))
+def test_endpoint_matches_its_baseline_query(embedded_database, column):
+    query, baseline = BASELINES[column]
+    rows, _ = embedded_database.execute(f"SELECT * FROM ({query.render()}) AS subquery", query.params)
+    expected, _ = embedded_database.execute(baseline, ())
+
+    assert sorted(rows) == sorted(expected)
+
+
+def test_countries_missing_from_national_teams():
+    # derived_tables.sql evaluated on a club of a country without a national_teams row
+    pytest.importorskip('duckdb')
+    from db.embedded import DERIVED_TABLES_SQL, _connect, _derived_table_statements
+
+    conn = _connect()
+    conn.execute("CREATE TABLE national_teams AS SELECT 1 AS national_team_id, 'A' AS national_team_name")
+    conn.execute(
+        "CREATE TABLE teams AS SELECT * FROM (VALUES (10, 1), (20, 2), (30, NULL)) AS t(team_id, national_team_id)"
+    )
+    conn.execute(
+        "CREATE TABLE team_yearly_stats AS SELECT * FROM (VALUES (10, 2020, 100, 4, 25.0, 3), "
+        "(20, 2020, 200, 6, 27.0, 5), (30, 2020, 300, 8, 29.0, 7)) "
+        "AS t(team_id, year, team_cost, legionnaires, average_age, players_in_national_team)"
+    )
+    with open(DERIVED_TABLES_SQL) as f:
+        statement = next(s for s in _derived_table_statements(f.read()) if 'country_yearly_stats AS' in s)
+    conn.execute(statement)
+
+    rows = conn.execute(
+        "SELECT national_team_id, in_national_teams, total_country_cost, national_players_count "
+        "FROM country_yearly_stats ORDER BY national_team_id"
+    ).fetchall()
+
+    # Counted by /national_teams_players_total_amount, left out of the other heatmap endpoints
+    assert rows == [(1, True, 100, 3), (2, False, 200, 5)]
@@ -0,0 +1,27 @@
+import db
+from config import Config
+from db import version
+from db.version import UNKNOWN_VERSION, DataVersion, get_data_version
+
+
+def _saturated_pool():
+    raise db.PoolTimeout("No database connection available")
+
+
+def test_pool_timeout_keeps_the_last_version(monkeypatch):
+    known = DataVersion(token='42', updated_at=None)
+    monkeypatch.setattr(Config, 'DB_BACKEND', 'postgres')
+    monkeypatch.setattr(Config, 'DATA_VERSION_CHECK_INTERVAL', 0)
+    monkeypatch.setattr(db, 'get_conn', _saturated_pool)
+    monkeypatch.setattr(version, '_current', known)
+
+    assert get_data_version() == known
+
+
+def test_pool_timeout_without_a_version_is_unknown(monkeypatch):
+    monkeypatch.setattr(Config, 'DB_BACKEND', 'postgres')
+    monkeypatch.setattr(Config, 'DATA_VERSION_CHECK_INTERVAL', 0)
+    monkeypatch.setattr(db, 'get_conn', _saturated_pool)
+    monkeypatch.setattr(version, '_current', None)
+
+    assert get_data_version() == UNKNOWN_VERSION
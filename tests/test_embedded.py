@@ -0,0 +1,10 @@
+def test_queries_divide_integers_like_postgres(embedded_database):
+    rows, _ = embedded_database.execute("SELECT 7 / 2, -7 / 2", ())
+
+    assert rows == [(3, -3)]
+
+
+def test_nulls_sort_like_postgres(embedded_database):
+    rows, _ = embedded_database.execute("SELECT x FROM (VALUES (1), (NULL)) AS t(x) ORDER BY x DESC", ())
+
+    assert rows == [(None,), (1,)]
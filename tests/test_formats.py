@@ -0,0 +1,18 @@
+import pytest
+
+import formats
+from formats.rows import NUMERIC_TYPE, RowEncoder
+
+DESCRIPTION = (('team_id', 23), ('team_name', 25), ('average_points', NUMERIC_TYPE))
+ROWS = [(3, 'Кёльн', None), (98841, 'FK TransINVEST "Vilnius"', None)]
+
+
+def test_fallback_encodes_like_orjson(monkeypatch):
+    pytest.importorskip('orjson')
+    encoder = RowEncoder(DESCRIPTION, {'team_id': 'TeamID', 'team_name': 'TeamName'})
+    expected = encoder.to_json_lines(ROWS), formats.encode_json(encoder.to_dicts(ROWS))
+
+    monkeypatch.setattr(formats, 'orjson', None)
+
+    assert (encoder.to_json_lines(ROWS), formats.encode_json(encoder.to_dicts(ROWS))) == expected
+    assert 'Кёльн'.encode() in expected[1]
@@ -0,0 +1,31 @@
+import os
+
+from db.admission import AdmissionControl
+from db.singleflight import SingleFlight
+
+
+def test_admission_rejects_a_directory_open_to_others(tmp_path):
+    lock_dir = tmp_path / 'admission'
+    lock_dir.mkdir(mode=0o777)
+    os.chmod(lock_dir, 0o777)
+
+    admission = AdmissionControl(str(lock_dir), max_concurrency=1, queue_size=0, queue_timeout=0)
+
+    assert admission.lock_dir is None
+    with admission.admit('api.get_club_info'), admission.admit('api.get_club_info'):
+        pass
+
+
+def test_admission_creates_a_private_directory(tmp_path):
+    lock_dir = tmp_path / 'admission'
+
+    admission = AdmissionControl(str(lock_dir), max_concurrency=1, queue_size=0, queue_timeout=0)
+
+    assert admission.lock_dir == str(lock_dir)
+    assert os.stat(lock_dir).st_mode & 0o777 == 0o700
+
+
+def test_single_flight_rejects_a_directory_open_to_others(tmp_path):
+    os.chmod(tmp_path, 0o755)
+
+    assert SingleFlight(str(tmp_path)).lock_dir is None
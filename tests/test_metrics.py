@@ -0,0 +1,27 @@
+import pytest
+
+import db
+from config import Config
+
+
+@pytest.fixture
+def client(monkeypatch):
+    from app import app
+
+    if not Config.METRICS:
+        pytest.skip('METRICS is disabled')
+    # No server listens on port 1, connecting fails immediately
+    monkeypatch.setattr(Config, 'DB_BACKEND', 'postgres')
+    monkeypatch.setattr(Config, 'DB_HOST', '127.0.0.1')
+    monkeypatch.setattr(Config, 'DB_PORT', '1')
+    monkeypatch.setattr(Config, 'CACHE_BACKEND', 'none')
+    monkeypatch.setattr(db, '_pool', None)
+    return app.test_client()
+
+
+def test_metrics_do_not_connect(client):
+    response = client.get('/api/club_info?sort_by=bad')
+
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Invalid sort parameters'}
+    assert db._pool is None
@@ -0,0 +1,45 @@
+import pytest
+
+import routes.api
+from cache import LRUCache, ResponseCache
+from config import Config
+from db import UNKNOWN_VERSION
+
+
+@pytest.fixture
+def response_cache(monkeypatch):
+    cache = ResponseCache(LRUCache(max_entries=16), ttl=3600)
+    monkeypatch.setattr(routes.api, 'get_response_cache', lambda: cache)
+    return cache
+
+
+def test_responses_are_cached_per_version(embedded_client, response_cache):
+    assert embedded_client.get('/api/country_info').status_code == 200
+    assert embedded_client.get('/api/country_info').status_code == 200
+
+    assert response_cache.hits == 1
+
+
+def test_unknown_version_bypasses_the_cache(embedded_client, response_cache, monkeypatch):
+    monkeypatch.setattr(routes.api, 'get_data_version', lambda: UNKNOWN_VERSION)
+
+    assert embedded_client.get('/api/country_info').status_code == 200
+    assert embedded_client.get('/api/country_info').status_code == 200
+
+    assert response_cache.hits == response_cache.misses == 0
+    assert len(response_cache.backend._entries) == 0
+
+
+def test_profiled_requests_run_the_query(embedded_client, response_cache, monkeypatch):
+    def single_flight():
+        raise AssertionError('profiled requests must not be coalesced')
+
+    assert embedded_client.get('/api/country_info').status_code == 200
+    monkeypatch.setattr(Config, 'PROFILING', True)
+    monkeypatch.setattr(routes.api, 'get_single_flight', single_flight)
+
+    response = embedded_client.get('/api/country_info?profile=1')
+
+    assert response.status_code == 200
+    assert 'X-Profile' in response.headers
+    assert response_cache.hits == 0
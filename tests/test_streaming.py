@@ -0,0 +1,19 @@
+import pytest
+
+URLS = [
+    '/api/total_team_cost?sort_by=team_cost&order=desc',
+    '/api/club_info',
+    '/api/country_info',
+    '/api/club_info?team_id=-1',
+]
+
+
+@pytest.mark.parametrize('url', URLS)
+def test_streamed_body_matches_buffered_body(embedded_client, url):
+    # Both responses carry the same strong ETag, so their bytes must be identical
+    buffered = embedded_client.get(url)
+    streamed = embedded_client.get(url + ('&' if '?' in url else '?') + 'stream=true')
+
+    assert buffered.status_code == streamed.status_code == 200
+    assert streamed.get_data() == buffered.get_data()
+    assert streamed.headers['ETag'] == buffered.headers['ETag']
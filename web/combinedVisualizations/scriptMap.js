@@ -188,6 +188,7 @@
     updateCountryInfoTable(
       document.getElementById("measure").options[document.getElementById("measure").selectedIndex].text,
       year,
+      nationalTeamID,
       countryClubs
     );
   };
@@ -443,13 +444,14 @@
     return clubNameMapping[clubName] || clubName;
   }
 
-  function updateCountryInfoTable(selectedMeasure, selectedYear, countryClubs) {
-    const dataFiles = {
-      "Average Team Cost": "api/total_team_cost",
-      "Full Players Cost": "api/total_team_cost",
-      "Legionnaires Total Amount": "api/legionnaires_per_team",
-      "National Team Players Total Amount": "api/clubs_and_national_players",
-      "Total Average Age": "api/average_age_per_team"
+  function updateCountryInfoTable(selectedMeasure, selectedYear, nationalTeamID, countryClubs) {
+    // Metric of the country's clubs endpoint for every measure
+    const metrics = {
+      "Average Team Cost": "team_cost",
+      "Full Players Cost": "team_cost",
+      "Legionnaires Total Amount": "legioners",
+      "National Team Players Total Amount": "players_in_national_team",
+      "Total Average Age": "average_age"
     };
 
     const measureKeys = {
@@ -468,10 +470,13 @@
       "Total Average Age": "Average Age"
     };
 
-    const dataFile = dataFiles[selectedMeasure];
+    const metric = metrics[selectedMeasure];
     const measureKey = measureKeys[selectedMeasure];
 
-    d3.json(dataFile).then(data => {
+    // Only the selected country's clubs for the selected year are requested
+    d3.json(`api/country/${nationalTeamID}/clubs?year=${selectedYear}&metrics=${metric}`).then(data => {
+      const clubsData = new Map(data.map(entry => [entry.TeamID, entry]));
+
       const table = d3.select("#country-info-table");
       table.html("");
 
@@ -482,8 +487,8 @@
 
       // Append table rows with club data
       countryClubs.forEach(club => {
-        const clubData = data.find(entry => entry.TeamID === club.TeamID && entry.Year === selectedYear);
-        const value = clubData ? clubData[measureKey] : "N/A";
+        const clubData = clubsData.get(club.TeamID);
+        let value = clubData ? clubData[measureKey] : "N/A";
         if (!value){
           value = "N/A";
         }
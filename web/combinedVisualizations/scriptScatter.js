@@ -76,15 +76,8 @@ function getEnglishCountryName(originalName) {
 Promise.all([
   d3.json("api/club_info"),
   d3.json("api/country_info"),
-  d3.json("api/average_age_per_team"),
-  d3.json("api/club_titles"),
-  d3.json("api/legionnaires_per_team"),
-  d3.json("api/clubs_and_national_players"), 
-  d3.json("api/team_size_ratio"),
-  d3.json("api/total_team_cost"),
-  d3.json("api/transfer_balance"),
-  d3.json("api/average_points_per_team"),
-]).then(([clubInfoData, countryInfoData, ...measureData]) => {
+  d3.json("api/team_yearly_stats"), // All per-club yearly metrics in one response
+]).then(([clubInfoData, countryInfoData, teamYearlyStats]) => {
   clubInfo = clubInfoData;
   countryInfo = countryInfoData;
 
@@ -115,19 +108,20 @@ Promise.all([
 
 
   const measureFiles = [
-    { key: "averageAge", data: measureData[0], field: "AverageAge" },
-    { key: "titles", data: measureData[1], field: "NumberOfTitlesThisYear" },
-    { key: "legioners", data: measureData[2], field: "Legioners" },
-    { key: "nationalPlayers", data: measureData[3], field: "PlayersInNationalTeam" },
-    { key: "teamSizeRatio", data: measureData[4], field: "TeamSizeRatio" },
-    { key: "teamCost", data: measureData[5], field: "TeamCost" },
-    { key: "transferBalance", data: measureData[6], field: "TransferBalance" },
-    { key: "averagePoints", data: measureData[7], field: "AveragePoints" },
+    { key: "averageAge", field: "AverageAge" },
+    { key: "titles", field: "NumberOfTitlesThisYear" },
+    { key: "legioners", field: "Legioners" },
+    { key: "nationalPlayers", field: "PlayersInNationalTeam" },
+    { key: "teamSizeRatio", field: "TeamSizeRatio" },
+    { key: "teamCost", field: "TeamCost" },
+    { key: "transferBalance", field: "TransferBalance" },
+    { key: "averagePoints", field: "AveragePoints" },
   ];
 
-  measureFiles.forEach(({ key, data, field }) => {
-    dataByMeasure[key] = d3.group(data, (d) => d.TeamID);
-    dataByMeasure[key].forEach((values, teamID) => {
+  const statsByTeam = d3.group(teamYearlyStats, (d) => d.TeamID);
+  measureFiles.forEach(({ key, field }) => {
+    dataByMeasure[key] = new Map();
+    statsByTeam.forEach((values, teamID) => {
       dataByMeasure[key].set(
         teamID,
         Object.fromEntries(values.map((d) => [d.Year, d[field]]))